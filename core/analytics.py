@@ -0,0 +1,265 @@
+"""Statistiques de présence des événements d'un organisateur (tableau de bord).
+
+Les participations sont lues en une requête ``values_list`` et rangées en
+colonnes (événement, participant, statut, présence) : tableaux NumPy si le
+package est installé, listes Python sinon. Les regroupements (par événement,
+par participant) sont des comptages sur ces colonnes (``bincount``), sans
+instance de modèle ni boucle par participation côté NumPy.
+
+Les colonnes sont gardées dans le cache ``analytics`` avec, pour chaque
+événement, le nombre de ses participations et leur dernière modification.
+À chaque affichage, une requête groupée compare ces empreintes à la base :
+seules les participations des événements modifiés depuis (inscription,
+changement de statut, scan de présence, suppression) sont relues. Les taux
+sont recalculés à chaque affichage à partir des colonnes, car un événement
+qui se termine fait apparaître ses absences sans aucune écriture en base.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import BooleanField, Count, ExpressionWrapper, Max, Q
+from django.utils import timezone
+
+from .models import Event, Participation
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+STATUS_CODES = {'pending': 0, 'accepted': 1, 'rejected': 2, 'cancelled': 3}
+ACCEPTED = STATUS_CODES['accepted']
+
+COLUMNS = ('event', 'participant', 'status', 'attended')
+
+# Statuts des événements pris en compte
+STATUSES = ('published', 'completed')
+
+
+def get_analytics_cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'analytics')]
+
+
+def _rate(part, total):
+    return part / total if total else None
+
+
+def load_columns(participations):
+    """Colonnes des participations du queryset (une requête)"""
+    rows = participations.values_list(
+        'event_id',
+        'participant_id',
+        'status',
+        ExpressionWrapper(Q(checked_in_at__isnull=False), output_field=BooleanField()),
+    )
+    rows = list(rows)
+    event, participant, status, attended = zip(*rows) if rows else ((), (), (), ())
+    status = map(STATUS_CODES.__getitem__, status)
+    if NUMPY_AVAILABLE:
+        return {
+            'event': np.array(event, dtype=np.int64),
+            'participant': np.array(participant, dtype=np.int64),
+            'status': np.fromiter(status, dtype=np.int8, count=len(event)),
+            'attended': np.array(attended, dtype=bool),
+        }
+    return {
+        'event': list(event),
+        'participant': list(participant),
+        'status': list(status),
+        'attended': [bool(value) for value in attended],
+    }
+
+
+def merge_columns(columns, fresh, replaced):
+    """Remplace dans `columns` les lignes des événements `replaced` par celles de `fresh`"""
+    if NUMPY_AVAILABLE:
+        keep = ~np.isin(columns['event'], np.fromiter(replaced, dtype=np.int64, count=len(replaced)))
+        return {name: np.concatenate([columns[name][keep], fresh[name]]) for name in COLUMNS}
+    keep = [i for i, event_id in enumerate(columns['event']) if event_id not in replaced]
+    return {name: [columns[name][i] for i in keep] + fresh[name] for name in COLUMNS}
+
+
+def organizer_columns(organizer, events):
+    """Colonnes des participations aux événements du queryset `events`, rafraîchies depuis le cache.
+
+    Retourne ``(colonnes, nombre d'événements relus)``.
+    """
+    cache = get_analytics_cache()
+    key = f'analytics:{organizer.pk}'
+    cached = cache.get(key)
+
+    # Empreinte de chaque événement : une ligne par événement ayant des participations
+    stamps = {
+        event_id: (count, last)
+        for event_id, count, last in Participation.objects.filter(event__in=events)
+        .order_by()
+        .values('event_id')
+        .annotate(count=Count('id'), last=Max('updated_at'))
+        .values_list('event_id', 'count', 'last')
+    }
+    participations = Participation.objects.filter(event__in=events)
+    if cached is None:
+        changed = set(stamps)
+        columns = load_columns(participations)
+    else:
+        previous, columns = cached
+        # Événements modifiés, nouveaux, ou qui ne sont plus affichés (supprimés, dépubliés)
+        changed = {event_id for event_id, stamp in stamps.items() if previous.get(event_id) != stamp}
+        changed |= set(previous) - set(stamps)
+        if len(changed) > settings.ANALYTICS_MAX_PARTIAL_REFRESH:
+            # Beaucoup d'événements modifiés (import...) : une relecture complète est plus simple
+            columns = load_columns(participations)
+        elif changed:
+            fresh = load_columns(participations.filter(event__in=changed & set(stamps)))
+            columns = merge_columns(columns, fresh, changed)
+    if changed or cached is None:
+        cache.set(key, (stamps, columns))
+    return columns, len(changed)
+
+
+def _event_counts(columns, event_ids):
+    """Participations par événement et par statut, et présences : ``(comptes, présences)``"""
+    size = len(event_ids)
+    if NUMPY_AVAILABLE:
+        ids = np.array(event_ids, dtype=np.int64)
+        # Lignes d'un événement créé entre deux lectures : ignorées jusqu'au prochain affichage
+        known = np.isin(columns['event'], ids)
+        status = columns['status'][known]
+        order = np.argsort(ids)
+        position = order[np.searchsorted(ids, columns['event'][known], sorter=order)]
+        counts = np.bincount(
+            position * len(STATUS_CODES) + status, minlength=size * len(STATUS_CODES)
+        ).reshape(size, len(STATUS_CODES))
+        attended = np.bincount(
+            position, weights=columns['attended'][known] & (status == ACCEPTED), minlength=size
+        )
+        return counts.tolist(), attended.astype(np.int64).tolist()
+    position = {event_id: i for i, event_id in enumerate(event_ids)}
+    counts = [[0] * len(STATUS_CODES) for _ in range(size)]
+    attended = [0] * size
+    for event_id, status, present in zip(columns['event'], columns['status'], columns['attended']):
+        i = position.get(event_id)
+        if i is None:
+            continue
+        counts[i][status] += 1
+        if present and status == ACCEPTED:
+            attended[i] += 1
+    return counts, attended
+
+
+def _participant_counts(columns, past_event_ids):
+    """Par participant, inscriptions acceptées aux événements terminés et présences"""
+    if NUMPY_AVAILABLE:
+        past = np.fromiter(past_event_ids, dtype=np.int64, count=len(past_event_ids))
+        mask = (columns['status'] == ACCEPTED) & np.isin(columns['event'], past)
+        participants, inverse = np.unique(columns['participant'][mask], return_inverse=True)
+        accepted = np.bincount(inverse, minlength=len(participants))
+        attended = np.bincount(inverse, weights=columns['attended'][mask], minlength=len(participants))
+        return dict(zip(participants.tolist(), zip(accepted.tolist(), attended.astype(np.int64).tolist())))
+    counts = {}
+    for event_id, participant_id, status, present in zip(*(columns[name] for name in COLUMNS)):
+        if status == ACCEPTED and event_id in past_event_ids:
+            accepted, attended = counts.get(participant_id, (0, 0))
+            counts[participant_id] = (accepted + 1, attended + int(present))
+    return counts
+
+
+def organizer_dashboard(organizer, weeks=12, top=10):
+    """Statistiques de présence des événements de `organizer`.
+
+    Taux de présence : présents / acceptés, sur les événements terminés.
+    Absences (« no-shows ») : participants acceptés non pointés d'un
+    événement terminé.
+    """
+    now = timezone.now()
+    queryset = Event.objects.filter(organizer=organizer, status__in=STATUSES, recurrence__isnull=True)
+    events = list(
+        queryset.order_by('start_datetime', 'id').values_list('id', 'title', 'start_datetime', 'end_datetime')
+    )
+    event_ids = [event[0] for event in events]
+    columns, refreshed = organizer_columns(organizer, queryset.values('id'))
+    counts, attended = _event_counts(columns, event_ids)
+
+    per_event = []
+    for (event_id, title, start, end), event_counts, present in zip(events, counts, attended):
+        accepted = event_counts[ACCEPTED]
+        past = end < now
+        per_event.append({
+            'id': event_id,
+            'title': title,
+            'start': start,
+            'past': past,
+            'registrations': sum(event_counts),
+            'accepted': accepted,
+            'pending': event_counts[STATUS_CODES['pending']],
+            'cancelled': event_counts[STATUS_CODES['cancelled']],
+            'attended': present,
+            'no_shows': accepted - present if past else 0,
+            'attendance_rate': _rate(present, accepted) if past else None,
+        })
+    past_events = [event for event in per_event if event['past']]
+
+    # Semaines (lundi, heure locale) des événements terminés
+    by_week = {}
+    for event in past_events:
+        day = timezone.localtime(event['start']).date()
+        week = by_week.setdefault(day - timedelta(days=day.weekday()), {'events': 0, 'accepted': 0, 'attended': 0})
+        week['events'] += 1
+        week['accepted'] += event['accepted']
+        week['attended'] += event['attended']
+    per_week = []
+    for monday in sorted(by_week)[-weeks:]:
+        week = by_week[monday]
+        per_week.append({
+            'week': monday,
+            **week,
+            'no_shows': week['accepted'] - week['attended'],
+            'attendance_rate': _rate(week['attended'], week['accepted']),
+            'no_show_rate': _rate(week['accepted'] - week['attended'], week['accepted']),
+        })
+
+    participants = _participant_counts(columns, {event['id'] for event in past_events})
+    ranked = sorted(
+        participants.items(),
+        key=lambda item: (item[1][0] - item[1][1], item[1][0]),
+        reverse=True,
+    )[:top]
+    names = dict(
+        get_user_model().objects.filter(pk__in=[participant_id for participant_id, _ in ranked])
+        .values_list('pk', 'username')
+    )
+    per_participant = [
+        {
+            'id': participant_id,
+            'username': names.get(participant_id, ''),
+            'accepted': accepted,
+            'attended': present,
+            'no_shows': accepted - present,
+            'attendance_rate': _rate(present, accepted),
+        }
+        for participant_id, (accepted, present) in ranked
+        if accepted > present
+    ]
+
+    accepted = sum(event['accepted'] for event in past_events)
+    present = sum(event['attended'] for event in past_events)
+    return {
+        'totals': {
+            'events': len(per_event),
+            'past_events': len(past_events),
+            'registrations': sum(event['registrations'] for event in per_event),
+            'accepted': accepted,
+            'attended': present,
+            'no_shows': accepted - present,
+            'attendance_rate': _rate(present, accepted),
+            'no_show_rate': _rate(accepted - present, accepted),
+            'participants': len(participants),
+        },
+        'per_event': per_event,
+        'per_week': per_week,
+        'per_participant': per_participant,
+        'refreshed_events': refreshed,
+    }
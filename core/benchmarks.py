@@ -0,0 +1,82 @@
+"""Outils communs aux commandes de benchmark (``bench_*``)"""
+import json
+import statistics
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+def benchmark_client(user=None):
+    """Client de test utilisable hors de la suite de tests (hôte autorisé, utilisateur connecté)"""
+    client = Client(HTTP_HOST='localhost')
+    if user is not None:
+        client.force_login(user)
+    return client
+
+
+def percentile(values, pct):
+    """Percentile par interpolation linéaire d'une liste de valeurs"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class Recorder:
+    """Accumule la latence, la taille et le nombre de requêtes SQL de chaque appel"""
+
+    def __init__(self):
+        self.durations = []
+        self.sizes = []
+        self.queries = []
+        self.statuses = {}
+        self.elapsed = 0.0
+
+    def request(self, client, url, **extra):
+        """Exécute une requête GET chronométrée et retourne la réponse"""
+        return self.call(client.get, url, **extra)
+
+    def call(self, method, *args, **kwargs):
+        """Chronomètre un appel du client de test (get, post...)"""
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = method(*args, **kwargs)
+            if getattr(response, 'streaming', False):
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            duration = time.perf_counter() - started
+        self.durations.append(duration)
+        self.sizes.append(size)
+        self.queries.append(len(ctx.captured_queries))
+        self.statuses[response.status_code] = self.statuses.get(response.status_code, 0) + 1
+        self.elapsed += duration
+        return response
+
+    def summary(self):
+        """Résumé statistique des appels enregistrés"""
+        durations_ms = [duration * 1000 for duration in self.durations]
+        return {
+            'requests': len(self.durations),
+            'mean_ms': round(statistics.fmean(durations_ms), 3) if durations_ms else 0.0,
+            'p50_ms': round(percentile(durations_ms, 50), 3),
+            'p95_ms': round(percentile(durations_ms, 95), 3),
+            'p99_ms': round(percentile(durations_ms, 99), 3),
+            'max_ms': round(max(durations_ms, default=0.0), 3),
+            'throughput_rps': round(len(self.durations) / self.elapsed, 1) if self.elapsed else 0.0,
+            'bytes_total': sum(self.sizes),
+            'queries_mean': round(statistics.fmean(self.queries), 2) if self.queries else 0.0,
+            'queries_max': max(self.queries, default=0),
+            'statuses': {str(code): count for code, count in sorted(self.statuses.items())},
+        }
+
+
+def write_results(path, results):
+    """Écrit les résultats au format JSON"""
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
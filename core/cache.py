@@ -0,0 +1,62 @@
+"""Cache versionné du flux JSON des événements (FullCalendar).
+
+Chaque entrée est indexée par le numéro de version courant : les signaux de
+``core.signals`` incrémentent ce numéro dès qu'un ``Event`` ou une
+``Participation`` change, ce qui rend toutes les anciennes entrées
+inaccessibles sans avoir à les supprimer une par une. La taille est bornée par
+les options ``MAX_ENTRIES`` / ``CULL_FREQUENCY`` du backend configuré.
+
+En production avec plusieurs workers, configurer l'alias ``events_feed`` sur un
+backend partagé (Redis, base de données...) pour que l'invalidation soit vue
+par tous les processus ; avec ``LocMemCache`` la durée d'expiration borne le
+retard d'un worker qui n'a pas reçu le signal.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = 'events_feed:version'
+
+
+def get_feed_cache():
+    """Retourne le backend de cache utilisé pour le flux d'événements"""
+    return caches[getattr(settings, 'EVENTS_FEED_CACHE_ALIAS', 'events_feed')]
+
+
+def feed_version():
+    """Retourne la version courante du flux, en l'initialisant si besoin"""
+    cache = get_feed_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Une valeur dérivée de l'horloge évite de retomber sur une ancienne
+        # version si la clé a été évincée du cache
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_feed_version():
+    """Invalide toutes les entrées du flux en incrémentant la version"""
+    cache = get_feed_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def user_bucket(user):
+    """Identifie la population d'utilisateurs partageant les mêmes couleurs"""
+    if user.is_authenticated:
+        return f'u{user.pk}'
+    return 'anon'
+
+
+def feed_cache_key(request):
+    """Construit la clé de cache d'une requête sur le flux d'événements"""
+    params = '|'.join(
+        request.GET.get(name, '') for name in ('start', 'end', 'filter', 'upcoming', 'format')
+    )
+    digest = hashlib.md5(params.encode('utf-8')).hexdigest()
+    return f'events_feed:{feed_version()}:{user_bucket(request.user)}:{digest}'
@@ -0,0 +1,92 @@
+"""Enregistrement des présences par QR code.
+
+Chaque participation acceptée reçoit un jeton signé (``Signer`` de Django)
+contenant les identifiants de la participation, de l'événement et de
+l'organisateur : la signature et le droit de pointer sont vérifiés sans
+accès à la base. La présence est ensuite enregistrée par un unique UPDATE
+conditionnel (``checked_in_at IS NULL``), ce qui rend les scans répétés
+idempotents et sans verrou sur les lignes déjà pointées. Seul le premier
+scan réussi met aussi à jour les statistiques du participant.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Subquery
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Participation
+from .stats import add_attendance
+
+SALT = 'core.checkin'
+
+# Résultats possibles d'un scan
+CHECKED_IN = 'checked_in'
+ALREADY_CHECKED_IN = 'already_checked_in'
+INVALID_TOKEN = 'invalid_token'
+FORBIDDEN = 'forbidden'
+NOT_REGISTERED = 'not_registered'
+OUTSIDE_WINDOW = 'outside_window'
+
+
+def make_token(participation_id, event_id, organizer_id):
+    """Jeton de présence signé d'une participation"""
+    return signing.Signer(salt=SALT).sign(f'{participation_id}.{event_id}.{organizer_id}')
+
+
+def participation_token(participation):
+    """Jeton de présence d'une participation dont l'événement est chargé"""
+    return make_token(participation.id, participation.event_id, participation.event.organizer_id)
+
+
+def checkin_url(base_url, token):
+    """URL complète encodée dans le QR code du participant"""
+    return base_url + reverse('event_checkin', args=[token])
+
+
+def read_token(token):
+    """Vérifie la signature et retourne ``(participation_id, event_id, organizer_id)`` ou None"""
+    try:
+        value = signing.Signer(salt=SALT).unsign(token)
+        participation_id, event_id, organizer_id = (int(part) for part in value.split('.'))
+    except (signing.BadSignature, ValueError):
+        return None
+    return participation_id, event_id, organizer_id
+
+
+def record_checkin(token, scanner):
+    """Enregistre la présence correspondant au jeton scanné par ``scanner``"""
+    payload = read_token(token)
+    if payload is None:
+        return INVALID_TOKEN, None
+    participation_id, event_id, organizer_id = payload
+    if scanner.pk != organizer_id and not scanner.is_staff:
+        return FORBIDDEN, participation_id
+
+    # Une seule écriture : ne modifie que les participations acceptées, pas encore
+    # pointées, pendant la période d'ouverture du contrôle d'accès
+    now = timezone.now()
+    opens_before = timedelta(minutes=getattr(settings, 'CHECKIN_OPENS_MINUTES_BEFORE', 60))
+    updated = Participation.objects.filter(
+        pk=participation_id,
+        event_id=event_id,
+        status='accepted',
+        checked_in_at__isnull=True,
+        event__start_datetime__lte=now + opens_before,
+        event__end_datetime__gte=now,
+    ).update(checked_in_at=now, updated_at=now)
+    if updated:
+        # Premier scan uniquement : présence et durée reportées sur les statistiques du participant
+        add_attendance(Subquery(Participation.objects.filter(pk=participation_id).values('participant_id')), event_id)
+        return CHECKED_IN, participation_id
+
+    # Scan refusé ou répété : une lecture pour en donner la raison
+    participation = Participation.objects.filter(
+        pk=participation_id, event_id=event_id
+    ).values('status', 'checked_in_at', 'event__start_datetime', 'event__end_datetime').first()
+    if participation is None or participation['status'] != 'accepted':
+        return NOT_REGISTERED, participation_id
+    if participation['checked_in_at']:
+        return ALREADY_CHECKED_IN, participation_id
+    return OUTSIDE_WINDOW, participation_id
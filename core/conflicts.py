@@ -0,0 +1,172 @@
+"""Conflits d'horaires : inscriptions qui se chevauchent, lieu réservé deux fois.
+
+Deux créneaux ``[début, fin)`` se chevauchent si chacun commence avant la fin
+de l'autre : ``start_datetime < fin`` et ``end_datetime > début``. Chaque
+contrôle est une seule requête indexée :
+
+- inscriptions d'un utilisateur : ses participations sont lues par l'index
+  ``participation_user_status_idx`` (participant, statut, événement) et
+  jointes aux événements par clé primaire, le créneau étant filtré dans la
+  jointure ; aucune inscription n'est chargée, même pour des milliers ;
+- lieu (``Event.location``) : l'index ``event_location_window_idx`` (lieu,
+  fin, début) ne lit que les événements du lieu non terminés au début du
+  créneau, comme l'index du calendrier. Les séries récurrentes du lieu sont
+  lues dans la même requête (UNION) par l'index partiel
+  ``event_location_series_idx``, sans celles terminées avant le créneau, et
+  leurs occurrences calculées sur le créneau. Le statut est filtré dans la
+  requête pour les deux parties.
+
+Une nouvelle série occupe son lieu à chacune de ses occurrences : toutes
+sont contrôlées, jusqu'à ``recurrence_until`` ou, pour une série sans fin,
+sur ``EVENTS_SERIES_CHECK_DAYS`` jours (``event_slots``).
+
+Pour valider un import ou une série, ``IntervalIndex`` garde en mémoire les
+créneaux occupés de chaque lieu : une requête pour l'intervalle couvert,
+puis une recherche par dichotomie par créneau.
+"""
+import bisect
+from datetime import timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.db.models import DateTimeField, ExpressionWrapper, F, Q
+from django.utils import timezone
+
+from . import recurrence
+from .models import Event
+
+# Statuts d'événement qui occupent un lieu
+ROOM_STATUSES = ('draft', 'published')
+# Participations qui engagent l'utilisateur sur le créneau (liste d'attente comprise)
+PARTICIPANT_STATUSES = ('accepted', 'pending')
+
+# Événements cités dans un message de conflit
+MAX_DESCRIBED = 3
+
+
+class IntervalIndex:
+    """Créneaux triés par début, pour trouver ceux qui chevauchent un créneau donné.
+
+    Un créneau qui chevauche ``[start, end)`` commence avant `end`, et au plus
+    tôt une durée maximale avant `start` : seule cette tranche de la liste
+    triée est parcourue.
+    """
+
+    def __init__(self, slots=()):
+        self._starts = []
+        self._slots = []
+        self._longest = timedelta(0)
+        for start, end, item in slots:
+            self.add(start, end, item)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def add(self, start, end, item):
+        i = bisect.bisect_right(self._starts, start)
+        self._starts.insert(i, start)
+        self._slots.insert(i, (end, item))
+        self._longest = max(self._longest, end - start)
+
+    def overlapping(self, start, end):
+        """Éléments dont le créneau chevauche ``[start, end)``, par début croissant"""
+        first = bisect.bisect_right(self._starts, start - self._longest)
+        last = bisect.bisect_left(self._starts, end)
+        return [item for slot_end, item in self._slots[first:last] if slot_end > start]
+
+
+def participant_conflicts(user, start, end, exclude=None):
+    """Événements publiés sur ``[start, end)`` auxquels `user` est inscrit ou en attente (queryset)"""
+    events = Event.objects.filter(
+        participations__participant=user,
+        participations__status__in=PARTICIPANT_STATUSES,
+        status='published',
+        start_datetime__lt=end,
+        end_datetime__gt=start,
+    )
+    if exclude is not None:
+        events = events.exclude(pk=exclude)
+    return events.order_by('start_datetime', 'id')
+
+
+def room_events(locations, start, end):
+    """Événements et occurrences calculées occupant l'un des `locations` sur ``[start, end)``"""
+    # UNION plutôt que OR : chaque partie garde sa plage sur l'index du lieu. Le statut
+    # n'est qu'un filtre résiduel : la plage sur le lieu reste la plus sélective
+    occupied = Event.objects.filter(location__in=locations, status__in=ROOM_STATUSES).order_by()
+    rows = occupied.filter(recurrence__isnull=True, end_datetime__gt=start, start_datetime__lt=end).union(
+        # Séries terminées avant le créneau écartées : la dernière occurrence finit au plus
+        # tard une durée après `recurrence_until`
+        occupied.alias(
+            last_end=ExpressionWrapper(
+                F('recurrence_until') + (F('end_datetime') - F('start_datetime')),
+                output_field=DateTimeField(),
+            ),
+        ).filter(
+            Q(recurrence_until__isnull=True) | Q(last_end__gt=start),
+            recurrence__isnull=False,
+            start_datetime__lt=end,
+        ),
+        all=True,
+    )
+    events, series = [], []
+    for event in rows:
+        (series if event.recurrence else events).append(event)
+    # Occurrences enregistrées (modifiées, annulées) déjà lues ou exclues par leur statut
+    events.extend(recurrence.expand(series, start, end))
+    events.sort(key=lambda event: event.start_datetime)
+    return events
+
+
+def room_conflicts(location, start, end):
+    """Événements qui occupent déjà `location` sur ``[start, end)`` (aucun sans lieu)"""
+    if not location.strip():
+        return []
+    return room_events([location], start, end)
+
+
+def event_slots(event):
+    """Créneaux ``(début, fin)`` occupés par `event` (enregistré ou non), un par occurrence pour une série"""
+    if not event.recurrence:
+        return [(event.start_datetime, event.end_datetime)]
+    duration = event.end_datetime - event.start_datetime
+    end = None
+    if event.recurrence_until is None:
+        end = event.start_datetime + timedelta(days=settings.EVENTS_SERIES_CHECK_DAYS)
+    return [
+        (start, start + duration)
+        for start in recurrence.iter_occurrence_starts(event, event.start_datetime, end)
+    ]
+
+
+def slots_room_conflicts(location, slots):
+    """Événements qui occupent déjà `location` sur l'un des créneaux `slots` (une requête)"""
+    if not location.strip() or not slots:
+        return []
+    index = room_index([location], min(start for start, _ in slots), max(end for _, end in slots))[location]
+    # Une occurrence calculée n'a pas de clé primaire : dédoublonnage par objet
+    taken = {}
+    for start, end in slots:
+        for event in index.overlapping(start, end):
+            taken[id(event)] = event
+    return sorted(taken.values(), key=attrgetter('start_datetime'))
+
+
+def room_index(locations, start, end):
+    """Créneaux occupés de chaque lieu entre `start` et `end`, par lieu"""
+    index = {location: IntervalIndex() for location in locations}
+    for event in room_events(locations, start, end):
+        index[event.location].add(event.start_datetime, event.end_datetime, event)
+    return index
+
+
+def describe(events):
+    """Liste lisible des événements en conflit (titre et date)"""
+    events = list(events)
+    text = ', '.join(
+        f"« {event.title} » ({timezone.localtime(event.start_datetime):%d/%m/%Y %H:%M})"
+        for event in events[:MAX_DESCRIBED]
+    )
+    if len(events) > MAX_DESCRIBED:
+        text += f" et {len(events) - MAX_DESCRIBED} autres"
+    return text
@@ -0,0 +1,245 @@
+"""Exports des participations (présences) en CSV et en XLSX.
+
+Les participations sont lues par ``values_list`` avec l'utilisateur et
+l'événement joints, par paquets de ``EXPORT_CHUNK_SIZE`` lignes (curseur
+côté serveur sous PostgreSQL) : aucune instance de modèle n'est créée et
+seul le paquet en cours est en mémoire.
+
+Le CSV est encodé et envoyé au fil de la lecture. Le XLSX aussi : c'est
+une archive ZIP (voir core/zipstream.py) dont les parties fixes (types,
+relations, styles, classeur) sont écrites d'emblée, puis la feuille est
+compressée et envoyée par paquets de lignes. Les textes y sont écrits en
+ligne (``inlineStr``) plutôt que dans la table des chaînes partagées, qui ne
+pourrait être écrite qu'après la dernière ligne ; aucune cellule n'est une
+formule. Le premier octet part avant la lecture de la première ligne.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from django.utils import timezone
+
+from .zipstream import StreamBuffer
+
+CSV, XLSX = 'csv', 'xlsx'
+
+CONTENT_TYPES = {
+    CSV: 'text/csv; charset=utf-8',
+    XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# (en-tête, champ lu par values_list)
+COLUMNS = [
+    ("Événement", 'event__title'),
+    ("Début", 'event__start_datetime'),
+    ("Fin", 'event__end_datetime'),
+    ("Identifiant", 'participant__username'),
+    ("Prénom", 'participant__first_name'),
+    ("Nom", 'participant__last_name'),
+    ("E-mail", 'participant__email'),
+    ("Statut", 'status'),
+    ("Inscription", 'created_at'),
+    ("Dernière modification", 'updated_at'),
+    ("Présence enregistrée le", 'checked_in_at'),
+]
+HEADERS = [header for header, _ in COLUMNS] + ["Présent"]
+
+STATUS_LABELS = {
+    'pending': 'En attente',
+    'accepted': 'Accepté',
+    'rejected': 'Rejeté',
+    'cancelled': 'Annulé',
+}
+
+DATETIME_COLUMNS = [i for i, (_, field) in enumerate(COLUMNS) if field.endswith(('_datetime', '_at'))]
+STATUS_COLUMN = next(i for i, (_, field) in enumerate(COLUMNS) if field == 'status')
+CHECKED_IN_COLUMN = len(COLUMNS) - 1
+
+# Début de cellule interprété comme une formule par les tableurs
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Caractères interdits dans un nom de feuille Excel
+SHEET_NAME_FORBIDDEN = str.maketrans('', '', '[]:*?/\\')
+
+# Lignes encodées par morceau CSV ou XLSX envoyé
+CSV_BATCH_SIZE = 500
+XLSX_BATCH_SIZE = 500
+
+# Caractères de contrôle interdits en XML 1.0
+XML_FORBIDDEN = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+# Origine des numéros de série des dates Excel
+EXCEL_EPOCH = datetime(1899, 12, 30)
+# Styles de cellule de xl/styles.xml : date, en-tête en gras
+XLSX_DATE_STYLE, XLSX_HEADER_STYLE = 1, 2
+XLSX_DATE_WIDTH = 17
+
+XLSX_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+XLSX_RELATIONSHIPS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{XLSX_RELATIONSHIPS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{XLSX_RELATIONSHIPS}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{XLSX_RELATIONSHIPS}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        f'<styleSheet xmlns="{XLSX_MAIN_NS}">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+        '<fonts count="2">'
+        '<font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font>'
+        '</fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+
+def iter_rows(participations, chunk_size):
+    """Lignes de l'export : dates en heure locale (sans fuseau), statut en clair, présence"""
+    tz = timezone.get_current_timezone()
+    rows = participations.values_list(*(field for _, field in COLUMNS)).iterator(chunk_size=chunk_size)
+    for row in rows:
+        row = list(row)
+        for i in DATETIME_COLUMNS:
+            if row[i] is not None:
+                row[i] = row[i].astimezone(tz).replace(tzinfo=None, microsecond=0)
+        row[STATUS_COLUMN] = STATUS_LABELS.get(row[STATUS_COLUMN], row[STATUS_COLUMN])
+        row.append("Oui" if row[CHECKED_IN_COLUMN] is not None else "Non")
+        yield row
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    # Un nom ou un titre commençant par "=" ne doit pas s'exécuter à l'ouverture
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(rows):
+    """Produit le CSV (UTF-8 avec BOM, lisible par Excel) par paquets de CSV_BATCH_SIZE lignes"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(HEADERS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_value(value) for value in row])
+        if count % CSV_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+COLUMN_LETTERS = [_column_letter(i) for i in range(len(HEADERS))]
+
+
+def _xlsx_cell(reference, value, style=0):
+    """Cellule SpreadsheetML : texte en ligne, date en numéro de série, nombre"""
+    style = f' s="{style}"' if style else ''
+    if isinstance(value, datetime):
+        serial = (value - EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c r="{reference}" s="{XLSX_DATE_STYLE}"><v>{serial!r}</v></c>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{reference}"{style}><v>{value!r}</v></c>'
+    text = escape(XML_FORBIDDEN.sub('', str(value)))
+    return f'<c r="{reference}"{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(number, values, style=0):
+    cells = ''.join(
+        _xlsx_cell(f'{letter}{number}', value, style)
+        for letter, value in zip(COLUMN_LETTERS, values)
+        if value is not None
+    )
+    return f'<row r="{number}">{cells}</row>'
+
+
+def iter_xlsx(rows, title="Participations"):
+    """Produit le classeur morceau par morceau, la feuille étant compressée au fil des lignes"""
+    sheet_name = XML_FORBIDDEN.sub('', title.translate(SHEET_NAME_FORBIDDEN))[:31].strip() or "Feuille1"
+    workbook = (
+        f'<workbook xmlns="{XLSX_MAIN_NS}" xmlns:r="{XLSX_RELATIONSHIPS}">'
+        f'<sheets><sheet name={quoteattr(sheet_name)} sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+    columns = ''.join(
+        f'<col min="{i + 1}" max="{i + 1}" width="{XLSX_DATE_WIDTH}" customWidth="1"/>' for i in DATETIME_COLUMNS
+    )
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in {**XLSX_PARTS, 'xl/workbook.xml': workbook}.items():
+            archive.writestr(name, XML_DECLARATION + content)
+        yield buffer.pop()
+
+        # Taille finale inconnue : en-têtes ZIP64 au cas où la feuille dépasserait 4 Go
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            batch = [
+                XML_DECLARATION,
+                f'<worksheet xmlns="{XLSX_MAIN_NS}">',
+                # En-tête figé
+                '<sheetViews><sheetView workbookViewId="0">'
+                '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+                '</sheetView></sheetViews>',
+                f'<cols>{columns}</cols>' if columns else '',
+                '<sheetData>',
+                _xlsx_row(1, HEADERS, XLSX_HEADER_STYLE),
+            ]
+            for number, row in enumerate(rows, 2):
+                batch.append(_xlsx_row(number, row))
+                if len(batch) >= XLSX_BATCH_SIZE:
+                    sheet.write(''.join(batch).encode('utf-8'))
+                    batch.clear()
+                    yield buffer.pop()
+            batch.append('</sheetData></worksheet>')
+            sheet.write(''.join(batch).encode('utf-8'))
+        yield buffer.pop()
+    yield buffer.pop()
+
+
+def render(participations, fmt, chunk_size, title="Participations"):
+    """Morceaux de l'export de `participations` au format `fmt`"""
+    rows = iter_rows(participations, chunk_size)
+    if fmt == XLSX:
+        return iter_xlsx(rows, title)
+    return iter_csv(rows)
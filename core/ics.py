@@ -0,0 +1,250 @@
+"""Flux d'abonnement iCalendar (RFC 5545) par utilisateur.
+
+Chaque utilisateur dispose de trois flux (``mine``, ``participating``, ``all``)
+accessibles sans session par un jeton signé : les applications de calendrier
+ne transmettent pas de cookies. Le jeton contient la version des adresses de
+l'utilisateur (``FeedToken``) : en régénérer depuis le profil invalide toutes
+les adresses précédentes. Le flux est produit en continu à partir des
+mêmes requêtes que le calendrier JSON ; le bloc VEVENT de chaque événement ne
+dépend que de l'événement, de son organisateur (et de l'hôte) et il est gardé
+dans le cache ``ics_fragments`` sous une clé contenant sa date de
+modification et la version des noms d'organisateurs, incrémentée à chaque
+modification d'un utilisateur (voir core/signals.py) : un flux de
+milliers d'événements s'assemble par concaténation : une lecture groupée du
+cache par lot d'événements, sans charger les lignes dont le bloc est connu.
+"""
+import time
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db.models import F
+from django.urls import reverse
+
+from .models import FeedToken
+
+SALT = 'core.ics'
+ORGANIZERS_VERSION_KEY = 'ics:organizers'
+
+SCOPES = {
+    'mine': "Mes événements",
+    'participating': "Mes participations",
+    'all': "Tous les événements",
+}
+
+PRODID = '-//teamProject//Calendrier//FR'
+
+# Version du format des blocs VEVENT (à incrémenter si leur contenu change)
+FRAGMENT_VERSION = 1
+
+
+def get_fragment_cache():
+    return caches[getattr(settings, 'ICS_FRAGMENT_CACHE_ALIAS', 'ics_fragments')]
+
+
+def make_token(user_id, scope, version=0):
+    """Jeton d'accès au flux `scope` de l'utilisateur, pour la version `version` de ses adresses"""
+    # Version 0 : format d'origine, les abonnements existants restent valides
+    value = f'{user_id}.{scope}' if not version else f'{user_id}.{scope}.{version}'
+    return signing.Signer(salt=SALT).sign(value)
+
+
+def read_token(token):
+    """Retourne ``(identifiant utilisateur, flux, version)`` ou None si le jeton est invalide"""
+    try:
+        user_id, scope, *version = signing.Signer(salt=SALT).unsign(token).split('.')
+        user_id = int(user_id)
+        version = int(version[0]) if version else 0
+    except (signing.BadSignature, ValueError, IndexError):
+        return None
+    if scope not in SCOPES:
+        return None
+    return user_id, scope, version
+
+
+def token_version(user):
+    """Version courante des adresses d'abonnement de `user`"""
+    return FeedToken.objects.filter(user=user).values_list('version', flat=True).first() or 0
+
+
+def regenerate_tokens(user):
+    """Invalide les adresses d'abonnement de `user` en passant à la version suivante"""
+    if not FeedToken.objects.filter(user=user).update(version=F('version') + 1):
+        FeedToken.objects.get_or_create(user=user, defaults={'version': 1})
+
+
+def feed_urls(request, user):
+    """Adresses absolues des flux de l'utilisateur, par libellé"""
+    version = token_version(user)
+    return [
+        (label, request.build_absolute_uri(reverse('events_ics', args=[make_token(user.pk, scope, version)])))
+        for scope, label in SCOPES.items()
+    ]
+
+
+def organizers_version():
+    """Version des noms d'organisateurs contenus dans les blocs VEVENT"""
+    cache = get_fragment_cache()
+    version = cache.get(ORGANIZERS_VERSION_KEY)
+    if version is None:
+        # Dérivée de l'horloge, comme la version du flux (voir core/cache.py)
+        cache.add(ORGANIZERS_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(ORGANIZERS_VERSION_KEY)
+    return version
+
+
+def bump_organizers_version():
+    """Invalide les blocs VEVENT en cache après la modification d'un utilisateur"""
+    cache = get_fragment_cache()
+    try:
+        cache.incr(ORGANIZERS_VERSION_KEY)
+    except ValueError:
+        cache.add(ORGANIZERS_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def escape_text(value):
+    """Échappe une valeur TEXT (RFC 5545, 3.3.11)"""
+    return (
+        value.replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Replie une ligne de contenu à 75 octets (RFC 5545, 3.1)"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # Ne pas couper au milieu d'un caractère UTF-8
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def key_prefix(base_url):
+    """Début commun des clés de blocs : format, noms d'organisateurs et hôte"""
+    return f'ics:{FRAGMENT_VERSION}:{organizers_version()}:{base_url}'
+
+
+def fragment_key(event, prefix):
+    if event.pk is None:
+        # Occurrence calculée : dépend de la série et de son début
+        return f'{prefix}:s{event.series_id}:{event.occurrence_timestamp}:{event.series.updated_at.timestamp()}'
+    return event_key(event.pk, event.updated_at, prefix)
+
+
+def event_key(pk, updated_at, prefix):
+    return f'{prefix}:{pk}:{updated_at.timestamp()}'
+
+
+def render_vevent(event, base_url):
+    """Bloc VEVENT d'un événement (ou d'une occurrence calculée)"""
+    if event.pk is None:
+        uid = f'event-{event.series_id}-{event.occurrence_timestamp}'
+        path = reverse('event_occurrence', args=[event.series_id, event.occurrence_timestamp])
+        stamp = event.series.updated_at
+    else:
+        uid = f'event-{event.pk}'
+        path = reverse('event_detail', args=[event.pk])
+        stamp = event.updated_at
+    # Nom de l'organisateur dans la description : pas d'adresse e-mail dans un flux partageable
+    organizer = event.organizer.get_full_name() or event.organizer.username
+    description = f'Organisé par {organizer}'
+    if event.description:
+        description += f'\n\n{event.description}'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}@{base_url.split("://", 1)[-1]}',
+        f'DTSTAMP:{format_datetime(stamp)}',
+        f'DTSTART:{format_datetime(event.start_datetime)}',
+        f'DTEND:{format_datetime(event.end_datetime)}',
+        f'SUMMARY:{escape_text(event.title)}',
+        f'URL:{base_url}{path}',
+        f'DESCRIPTION:{escape_text(description)}',
+    ]
+    if event.location:
+        lines.append(f'LOCATION:{escape_text(event.location)}')
+    if event.occurrence_start is not None:
+        lines.append(f'RELATED-TO:event-{event.series_id}')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines).encode('utf-8')
+
+
+def _batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_event_fragments(events, base_url, batch_size):
+    """Blocs VEVENT d'un queryset d'événements, concaténés par lots de `batch_size`.
+
+    Seules les clés (identifiant, date de modification) sont lues pour tout le
+    queryset ; les lignes complètes ne sont chargées que pour les blocs absents
+    du cache.
+    """
+    cache = get_fragment_cache()
+    prefix = key_prefix(base_url)
+    rows = events.values_list('pk', 'updated_at').iterator(chunk_size=batch_size)
+    for batch in _batches(rows, batch_size):
+        keys = [event_key(pk, updated_at, prefix) for pk, updated_at in batch]
+        cached = cache.get_many(keys)
+        missing = [pk for (pk, _), key in zip(batch, keys) if key not in cached]
+        rendered = {}
+        if missing:
+            fresh = {}
+            for event in events.model.objects.filter(pk__in=missing).select_related('organizer'):
+                rendered[event.pk] = fresh[event_key(event.pk, event.updated_at, prefix)] = render_vevent(event, base_url)
+            cache.set_many(fresh)
+        # Un événement supprimé entre les deux lectures est simplement omis
+        yield b''.join(cached.get(key) or rendered.get(pk, b'') for (pk, _), key in zip(batch, keys))
+
+
+def iter_fragments(events, base_url, batch_size):
+    """Blocs VEVENT d'événements déjà chargés (occurrences calculées), par lots de `batch_size`"""
+    cache = get_fragment_cache()
+    prefix = key_prefix(base_url)
+    for batch in _batches(events, batch_size):
+        keys = [fragment_key(event, prefix) for event in batch]
+        cached = cache.get_many(keys)
+        missing = {}
+        for key, event in zip(keys, batch):
+            if key not in cached:
+                missing[key] = render_vevent(event, base_url)
+        if missing:
+            cache.set_many(missing)
+        yield b''.join(cached.get(key) or missing[key] for key in keys)
+
+
+def iter_calendar(name, events, occurrences, base_url, batch_size):
+    """Produit le VCALENDAR complet, morceau par morceau"""
+    yield ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+    )).encode('utf-8')
+    yield from iter_event_fragments(events, base_url, batch_size)
+    yield from iter_fragments(occurrences, base_url, batch_size)
+    yield b'END:VCALENDAR\r\n'
@@ -0,0 +1,379 @@
+"""Import en masse d'événements depuis un fichier CSV ou iCalendar.
+
+Le fichier est lu en continu, ligne par ligne ou VEVENT par VEVENT, et
+converti en dictionnaires aux mêmes clés (``title``, ``start``, ``end``...).
+Les lignes sont validées par lots, sans requête SQL : les contrôles de
+``Event.save`` (dates cohérentes) et des champs du modèle (longueurs, statut,
+capacité, récurrence) sont appliqués sur des tuples Python, puis chaque lot
+valide est inséré par un seul ``executemany`` dans sa propre transaction,
+comme les données de ``seed_events`` (``bulk_create`` passerait encore chaque
+champ de chaque instance par la préparation de l'ORM). Les lignes invalides
+sont écartées et signalées avec leur numéro de ligne.
+
+Une ligne qui réserve un lieu déjà occupé sur son créneau (sur l'une de ses
+occurrences pour une série), par un événement existant ou une ligne
+précédente du fichier, est écartée de la même façon :
+les créneaux des lieux du lot sont lus en une requête et rangés dans un
+``IntervalIndex`` par lieu (voir core/conflicts.py). En simulation, rien
+n'étant enregistré, seuls les conflits internes à un lot sont détectés.
+
+Aucun signal n'est envoyé : le cache du calendrier et le compteur
+d'événements organisés sont mis à jour une fois en fin d'import.
+"""
+import csv
+import io
+from collections import namedtuple
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import islice
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import conflicts
+from .cache import bump_feed_version
+from .models import Event
+from .stats import add_to_stats
+
+CSV, ICS = 'csv', 'ics'
+
+# Colonnes reconnues dans un fichier CSV (title, start et end obligatoires)
+COLUMNS = (
+    'title', 'start', 'end', 'location', 'description', 'max_participants', 'status',
+    'recurrence', 'recurrence_interval', 'recurrence_until',
+)
+
+# Colonnes renseignées à l'insertion (les autres sont NULL)
+EVENT_COLUMNS = [
+    'title', 'description', 'location', 'start_datetime', 'end_datetime', 'max_participants',
+    'accepted_count', 'waitlist_tail', 'organizer', 'status', 'recurrence', 'recurrence_interval',
+    'recurrence_until', 'created_at', 'updated_at',
+]
+
+DEFAULT_BATCH_SIZE = 1000
+
+RowError = namedtuple('RowError', 'line message')
+ImportResult = namedtuple('ImportResult', 'created errors')
+# Ligne importée dans l'index des lieux occupés (mêmes attributs qu'un Event)
+ImportedEvent = namedtuple('ImportedEvent', 'title start_datetime end_datetime')
+
+TITLE_LENGTH = Event._meta.get_field('title').max_length
+LOCATION_LENGTH = Event._meta.get_field('location').max_length
+STATUSES = frozenset(dict(Event.STATUS_CHOICES))
+RECURRENCES = frozenset(dict(Event.RECURRENCE_CHOICES))
+
+
+class InvalidRow(ValueError):
+    """Ligne du fichier impossible à importer"""
+
+
+def guess_format(filename):
+    """Format d'après l'extension du fichier (CSV par défaut)"""
+    return ICS if filename.lower().endswith(('.ics', '.ical', '.ifb')) else CSV
+
+
+def text_stream(file):
+    """Flux texte UTF-8 sur un fichier ouvert en binaire (fichier envoyé, ouvert en 'rb'...)"""
+    if isinstance(file, io.TextIOBase):
+        return file
+    return io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+
+
+def iter_csv_rows(file):
+    """Produit ``(numéro de ligne, dictionnaire)`` pour chaque ligne d'un CSV à en-tête.
+
+    Le séparateur (virgule ou point-virgule) est déduit de l'en-tête.
+    """
+    stream = text_stream(file)
+    header = stream.readline()
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    fields = [name.strip().lower() for name in next(csv.reader([header], delimiter=delimiter), [])]
+    missing = {'title', 'start', 'end'} - set(fields)
+    if missing:
+        raise InvalidRow(f"Colonnes obligatoires absentes de l'en-tête : {', '.join(sorted(missing))}.")
+    reader = csv.DictReader(stream, fieldnames=fields, delimiter=delimiter)
+    for row in reader:
+        # Numéro de la dernière ligne lue (une valeur entre guillemets peut en couvrir plusieurs)
+        yield reader.line_num + 1, row
+
+
+def unescape_text(value):
+    """Inverse de core.ics.escape_text"""
+    out = []
+    chars = iter(value)
+    for char in chars:
+        if char == '\\':
+            char = next(chars, '')
+            out.append('\n' if char in 'nN' else char)
+        else:
+            out.append(char)
+    return ''.join(out)
+
+
+def parse_ics_datetime(value, params):
+    """Date d'une propriété DTSTART/DTEND : UTC (suffixe Z), TZID, heure locale ou journée entière"""
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return timezone.make_aware(datetime.combine(datetime.strptime(value, '%Y%m%d').date(), time.min))
+    if value.endswith('Z'):
+        return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=dt_timezone.utc)
+    naive = datetime.strptime(value, '%Y%m%dT%H%M%S')
+    if 'TZID' in params:
+        try:
+            return naive.replace(tzinfo=ZoneInfo(params['TZID'].strip('"')))
+        except (ZoneInfoNotFoundError, ValueError):
+            raise InvalidRow(f"Fuseau horaire inconnu : {params['TZID']}.")
+    return timezone.make_aware(naive)
+
+
+def parse_rrule(value):
+    """Règle RRULE ramenée aux champs de récurrence d'Event (FREQ, INTERVAL, UNTIL)"""
+    parts = dict(part.split('=', 1) for part in value.split(';') if '=' in part)
+    frequency = parts.pop('FREQ', '').lower()
+    if frequency not in RECURRENCES:
+        raise InvalidRow(f"Récurrence non prise en charge : FREQ={frequency.upper()}.")
+    unsupported = set(parts) - {'INTERVAL', 'UNTIL', 'WKST'}
+    if unsupported:
+        raise InvalidRow(f"Règle de récurrence non prise en charge : {', '.join(sorted(unsupported))}.")
+    rule = {'recurrence': frequency, 'recurrence_interval': parts.get('INTERVAL', '')}
+    if 'UNTIL' in parts:
+        until = parse_ics_datetime(parts['UNTIL'], {})
+        # Date seule : jour inclus
+        rule['recurrence_until'] = until + timedelta(days=1, microseconds=-1) if len(parts['UNTIL']) == 8 else until
+    return rule
+
+
+def iter_content_lines(stream):
+    """Lignes de contenu dépliées (RFC 5545, 3.1) avec le numéro de leur première ligne"""
+    pending, pending_line = None, 0
+    for number, line in enumerate(stream, 1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending_line, pending
+        pending, pending_line = line, number
+    if pending is not None:
+        yield pending_line, pending
+
+
+def iter_ics_rows(file):
+    """Produit ``(numéro de ligne, dictionnaire)`` pour chaque VEVENT d'un fichier iCalendar"""
+    row, line_number, error, all_day = None, 0, None, False
+    for number, line in iter_content_lines(text_stream(file)):
+        name, _, value = line.partition(':')
+        name, *raw_params = name.split(';')
+        name = name.upper()
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            row, line_number, error, all_day = {}, number, None, False
+            continue
+        if row is None:
+            continue
+        if name == 'END' and value.upper() == 'VEVENT':
+            if error is None and 'end' not in row and all_day:
+                # Journée entière sans DTEND : dure la journée (RFC 5545, 3.6.1)
+                row['end'] = row['start'] + timedelta(days=1)
+            yield line_number, (error if error is not None else row)
+            row = None
+            continue
+        params = dict(param.split('=', 1) for param in raw_params if '=' in param)
+        try:
+            if name == 'SUMMARY':
+                row['title'] = unescape_text(value)
+            elif name == 'DESCRIPTION':
+                row['description'] = unescape_text(value)
+            elif name == 'LOCATION':
+                row['location'] = unescape_text(value)
+            elif name == 'DTSTART':
+                row['start'] = parse_ics_datetime(value, params)
+                all_day = params.get('VALUE') == 'DATE' or len(value) == 8
+            elif name == 'DTEND':
+                row['end'] = parse_ics_datetime(value, params)
+            elif name == 'RRULE':
+                row.update(parse_rrule(value))
+        except InvalidRow as e:
+            error = e
+        except ValueError:
+            error = InvalidRow(f"Valeur invalide pour {name} : {value}.")
+
+
+def iter_rows(file, format):
+    """Lignes d'un fichier du format donné"""
+    return iter_ics_rows(file) if format == ICS else iter_csv_rows(file)
+
+
+def parse_datetime(value, tz):
+    """Date ISO 8601 d'une cellule CSV (heure locale `tz` si sans décalage), ou date déjà convertie (iCalendar)"""
+    if isinstance(value, datetime):
+        return value
+    value = (value or '').strip()
+    if not value:
+        raise InvalidRow("Date manquante.")
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidRow(f"Date invalide : {value}.")
+    return parsed.replace(tzinfo=tz) if parsed.tzinfo is None else parsed
+
+
+def clean_row(row, organizer_id, default_status, tz):
+    """Valeurs validées d'une ligne, dans l'ordre de EVENT_COLUMNS (sans les dates de création)"""
+    if isinstance(row, InvalidRow):
+        raise row
+    title = (row.get('title') or '').strip()
+    if not title:
+        raise InvalidRow("Titre manquant.")
+    if len(title) > TITLE_LENGTH:
+        raise InvalidRow(f"Titre trop long (plus de {TITLE_LENGTH} caractères).")
+    location = (row.get('location') or '').strip()
+    if len(location) > LOCATION_LENGTH:
+        raise InvalidRow(f"Lieu trop long (plus de {LOCATION_LENGTH} caractères).")
+
+    # Même contrôle que Event.save, que l'insertion en masse n'appelle pas
+    start = parse_datetime(row.get('start'), tz)
+    end = parse_datetime(row.get('end'), tz)
+    if end <= start:
+        raise InvalidRow("La date de fin doit être après la date de début.")
+
+    try:
+        max_participants = int(row.get('max_participants') or 20)
+        interval = int(row.get('recurrence_interval') or 1)
+    except ValueError:
+        raise InvalidRow("Nombre de participants ou intervalle de récurrence invalide.")
+    if max_participants < 1:
+        raise InvalidRow("Le nombre maximum de participants doit être au moins 1.")
+
+    status = (row.get('status') or default_status).strip()
+    if status not in STATUSES:
+        raise InvalidRow(f"Statut inconnu : {status}.")
+
+    recurrence = (row.get('recurrence') or '').strip().lower() or None
+    until = row.get('recurrence_until') or None
+    if recurrence is not None:
+        if recurrence not in RECURRENCES or interval < 1:
+            raise InvalidRow("Règle de récurrence invalide.")
+        if isinstance(until, str):
+            until = until.strip()
+            # Date seule : jour inclus, comme dans le formulaire de création
+            until = (
+                parse_datetime(until, tz) + timedelta(days=1) - timedelta(microseconds=1)
+                if len(until) == 10 else parse_datetime(until, tz)
+            )
+    else:
+        interval, until = 1, None
+
+    return (
+        title, row.get('description') or '', location, start, end, max_participants, 0, 0,
+        organizer_id, status, recurrence, interval, until,
+    )
+
+
+def row_slots(row):
+    """Créneaux occupés par une ligne validée : chaque occurrence pour une série"""
+    start, end, recurrence, interval, until = row[3], row[4], row[10], row[11], row[12]
+    if recurrence is None:
+        return [(start, end)]
+    return conflicts.event_slots(Event(
+        start_datetime=start, end_datetime=end,
+        recurrence=recurrence, recurrence_interval=interval, recurrence_until=until,
+    ))
+
+
+def without_room_conflicts(cleaned):
+    """Écarte les lignes validées qui réservent un lieu déjà occupé : ``(lignes gardées, erreurs)``"""
+    booked = {
+        line: row_slots(row) for line, row in cleaned if row[2] and row[9] in conflicts.ROOM_STATUSES
+    }
+    slots = [slot for occupied in booked.values() for slot in occupied]
+    if not slots:
+        return cleaned, []
+    # Une requête pour tous les lieux du lot, sur l'intervalle couvert par le lot (séries comprises)
+    index = conflicts.room_index(
+        {row[2] for line, row in cleaned if line in booked},
+        min(start for start, _ in slots),
+        max(end for _, end in slots),
+    )
+    kept, errors = [], []
+    for line, row in cleaned:
+        if line in booked:
+            title, location = row[0], row[2]
+            taken = {}
+            for start, end in booked[line]:
+                for event in index[location].overlapping(start, end):
+                    taken[id(event)] = event
+            if taken:
+                taken = sorted(taken.values(), key=lambda event: event.start_datetime)
+                errors.append(RowError(line, f"Lieu déjà réservé sur ce créneau : {conflicts.describe(taken)}."))
+                continue
+            for start, end in booked[line]:
+                index[location].add(start, end, ImportedEvent(title, start, end))
+        kept.append((line, row))
+    return kept, errors
+
+
+def validate_batch(rows, organizer_id, default_status, check_conflicts=True):
+    """Valide un lot de lignes : ``(valeurs prêtes pour l'INSERT, erreurs)``"""
+    adapt = connection.ops.adapt_datetimefield_value
+    now = adapt(timezone.now())
+    # Fuseau résolu une fois par lot plutôt qu'à chaque date
+    tz = timezone.get_current_timezone()
+    cleaned, errors = [], []
+    for line, row in rows:
+        try:
+            cleaned.append((line, clean_row(row, organizer_id, default_status, tz)))
+        except InvalidRow as e:
+            errors.append(RowError(line, str(e)))
+    if check_conflicts:
+        cleaned, conflict_errors = without_room_conflicts(cleaned)
+        if conflict_errors:
+            errors = sorted(errors + conflict_errors, key=lambda error: error.line)
+    values = []
+    for line, row in cleaned:
+        (*fields, start, end, max_participants, accepted, tail, organizer,
+         status, recurrence, interval, until) = row
+        values.append((
+            *fields, adapt(start), adapt(end), max_participants, accepted, tail, organizer,
+            status, recurrence, interval, adapt(until) if until is not None else None, now, now,
+        ))
+    return values, errors
+
+
+def insert_rows(model, fields, rows, batch_size):
+    """INSERT en masse par executemany, sans instancier ni préparer de modèles champ par champ"""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})'
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
+
+
+def import_events(rows, organizer, default_status='published', batch_size=DEFAULT_BATCH_SIZE, dry_run=False,
+                  check_conflicts=True):
+    """Importe les lignes ``(numéro, dictionnaire)`` pour `organizer`, un lot par transaction.
+
+    Retourne ``ImportResult(created, errors)`` ; avec `dry_run`, les lignes
+    sont seulement validées et `created` compte les lignes valides. Sans
+    `check_conflicts`, un lieu peut être réservé plusieurs fois.
+    """
+    created, errors = 0, []
+    rows = iter(rows)
+    try:
+        while batch := list(islice(rows, batch_size)):
+            values, batch_errors = validate_batch(batch, organizer.pk, default_status, check_conflicts)
+            errors.extend(batch_errors)
+            if values and not dry_run:
+                with transaction.atomic():
+                    insert_rows(Event, EVENT_COLUMNS, values, batch_size)
+            created += len(values)
+    except (InvalidRow, csv.Error, UnicodeDecodeError) as e:
+        # Fichier illisible au-delà de ce point : les lots précédents restent importés
+        errors.append(RowError(0, str(e) if isinstance(e, InvalidRow) else f"Fichier illisible : {e}"))
+    finally:
+        # Aucun signal n'est envoyé pour les lignes insérées
+        if created and not dry_run:
+            bump_feed_version()
+            add_to_stats(organizer.pk, events_organized=created)
+    return ImportResult(created, errors)
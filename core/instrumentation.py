@@ -0,0 +1,194 @@
+"""Instrumentation des requêtes : SQL, templates, QR codes.
+
+Pour une fraction des requêtes (``INSTRUMENTATION_SAMPLE_RATE``), le
+middleware mesure le nombre et la durée des requêtes SQL (via
+``connection.execute_wrapper``), repère les requêtes répétées à l'identique
+au paramètre près (signature d'un N+1), et chronomètre la vue, le rendu des
+templates et les sections marquées par ``span()``. Les mesures sont renvoyées
+dans l'en-tête ``Server-Timing`` et écrites en une ligne JSON dans le logger
+``core.instrumentation``. Hors échantillon, seul un tirage aléatoire est fait.
+
+Pour une réponse diffusée (``StreamingHttpResponse``), l'essentiel du travail
+a lieu pendant l'envoi du corps : les requêtes SQL restent comptées pendant
+la production de chaque morceau et la ligne de log n'est écrite qu'à la
+fermeture de la réponse. L'en-tête, envoyé avant le corps, ne couvre que la
+vue.
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('core.instrumentation')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Mesures accumulées pendant une requête échantillonnée"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.signatures = Counter()
+        self.spans = defaultdict(float)
+        self.view_started = None
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        # Le SQL reçu contient des marqueurs à la place des paramètres : même texte, même signature
+        self.signatures[sql] += 1
+
+    def duplicates(self):
+        """Requêtes exécutées plusieurs fois, de la plus répétée à la moins répétée"""
+        return [(sql, count) for sql, count in self.signatures.most_common() if count > 1]
+
+    def duplicate_count(self):
+        return sum(count - 1 for _, count in self.duplicates())
+
+
+@contextmanager
+def span(name):
+    """Chronomètre une section de code pour la requête en cours (sans effet hors échantillon)"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.spans[name] += time.perf_counter() - started
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started)
+
+
+class InstrumentedTemplate(Template):
+    """Template dont le rendu est chronométré (les inclusions sont comptées dans le parent)"""
+
+    def render(self, context=None, request=None):
+        with span('template'):
+            return super().render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Moteur de templates Django standard, rendu chronométré"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            # Même exception, attribuée à ce moteur (comme le fait DjangoTemplates)
+            raise TemplateDoesNotExist(*exc.args, tried=exc.tried, backend=self, chain=exc.chain) from exc
+
+
+def _measured(metrics, func, *args):
+    """Appelle `func` avec le comptage des requêtes SQL de `metrics` actif"""
+    token = _current.set(metrics)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_record_query))
+            return func(*args)
+    finally:
+        _current.reset(token)
+
+
+def _milliseconds(seconds):
+    return round(seconds * 1000, 2)
+
+
+class InstrumentationMiddleware:
+    """Mesure un échantillon des requêtes : en-tête Server-Timing et ligne de log JSON"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0.0)
+        if rate <= 0 or random.random() >= rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        response = _measured(metrics, self.get_response, request)
+
+        finished = time.perf_counter()
+        total = finished - metrics.started
+        if metrics.view_started is not None:
+            metrics.spans['view'] = finished - metrics.view_started
+        self.add_server_timing(response, metrics, total)
+        if response.streaming and not getattr(response, 'is_async', False):
+            response.streaming_content = self.measure_stream(request, response, metrics, response.streaming_content)
+        else:
+            self.log(request, response, metrics, total)
+        return response
+
+    def measure_stream(self, request, response, metrics, content):
+        """Corps de la réponse diffusée, mesuré morceau par morceau jusqu'à sa fermeture"""
+        chunks = iter(content)
+        started = time.perf_counter()
+        try:
+            while True:
+                try:
+                    chunk = _measured(metrics, next, chunks)
+                except StopIteration:
+                    break
+                yield chunk
+        finally:
+            metrics.spans['stream'] = time.perf_counter() - started
+            self.log(request, response, metrics, time.perf_counter() - metrics.started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+    def add_server_timing(self, response, metrics, total):
+        entries = [
+            f'total;dur={_milliseconds(total)}',
+            f'db;dur={_milliseconds(metrics.db_time)};desc="{metrics.queries} queries"',
+        ]
+        if metrics.duplicates():
+            entries.append(f'dup;desc="{metrics.duplicate_count()} duplicate queries"')
+        for name, duration in sorted(metrics.spans.items()):
+            entries.append(f'{name};dur={_milliseconds(duration)}')
+        response['Server-Timing'] = ', '.join(entries)
+
+    def log(self, request, response, metrics, total):
+        duplicates = metrics.duplicates()
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': _milliseconds(total),
+            'db_ms': _milliseconds(metrics.db_time),
+            'queries': metrics.queries,
+            'duplicate_queries': metrics.duplicate_count(),
+            'spans_ms': {name: _milliseconds(duration) for name, duration in sorted(metrics.spans.items())},
+            'top_duplicates': [{'sql': sql[:300], 'count': count} for sql, count in duplicates[:3]],
+        }
+        threshold = getattr(settings, 'INSTRUMENTATION_DUPLICATE_THRESHOLD', 5)
+        level = logging.WARNING if metrics.duplicate_count() >= threshold else logging.INFO
+        logger.log(level, json.dumps(record, ensure_ascii=False))
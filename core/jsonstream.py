@@ -0,0 +1,40 @@
+"""Encodage JSON rapide et réponses JSON diffusées morceau par morceau.
+
+``orjson`` est utilisé s'il est installé (encodage en C, sortie directement en
+octets), sinon le module ``json`` de la bibliothèque standard, avec la même
+sortie compacte. ``iter_json_array`` produit un tableau JSON par paquets à
+partir d'un itérable : seuls les éléments du paquet en cours sont en mémoire.
+"""
+import json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Éléments encodés par morceau envoyé au client
+DEFAULT_BATCH_SIZE = 500
+
+
+def dumps(value):
+    """Encode `value` en JSON compact (octets UTF-8)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def iter_json_array(items, batch_size=DEFAULT_BATCH_SIZE):
+    """Produit le tableau JSON des éléments de `items` par morceaux de `batch_size` éléments"""
+    yield b'['
+    separator = b''
+    batch = []
+    for item in items:
+        batch.append(dumps(item))
+        if len(batch) >= batch_size:
+            yield separator + b','.join(batch)
+            separator = b','
+            batch = []
+    if batch:
+        yield separator + b','.join(batch)
+    yield b']'
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from core.benchmarks import Recorder, benchmark_client, write_results
+from core.cache import get_feed_cache
+
+User = get_user_model()
+
+FILTERS = ['all', 'mine', 'participating', 'upcoming']
+
+
+class Command(BaseCommand):
+    help = "Rejoue une navigation dans le calendrier et compare les réponses complètes, le cache serveur et les réponses 304"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='testuser', help="Utilisateur connecté pendant la navigation")
+        parser.add_argument('--months', type=int, default=6, help="Nombre de mois parcourus (aller puis retour)")
+        parser.add_argument('--rounds', type=int, default=5, help="Nombre de répétitions de la navigation")
+        parser.add_argument('--output', help="Fichier JSON où écrire les résultats")
+
+    def navigation(self, months):
+        """Fenêtres (start, end) parcourues : mois suivants puis retour au mois courant"""
+        first_day = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        windows = []
+        for offset in list(range(months)) + list(range(months - 2, -1, -1)):
+            start = first_day + timedelta(days=31 * offset)
+            start = start.replace(day=1)
+            # FullCalendar affiche six semaines autour du mois
+            windows.append((start - timedelta(days=7), start + timedelta(days=35)))
+        return windows
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"Utilisateur '{options['username']}' introuvable (lancer seed_events).")
+
+        client = benchmark_client(user)
+        url = reverse('events_json')
+        windows = self.navigation(options['months'])
+        feed_cache = get_feed_cache()
+        recorders = {mode: Recorder() for mode in ('full', 'server_cache', 'conditional')}
+        etags = {}
+
+        for _ in range(options['rounds']):
+            for filter_type in FILTERS:
+                for start, end in windows:
+                    params = {'start': start.isoformat(), 'end': end.isoformat(), 'filter': filter_type}
+
+                    # Comportement d'origine : tout est recalculé à chaque navigation
+                    feed_cache.clear()
+                    response = recorders['full'].request(client, url, data=params)
+
+                    # Cache serveur chaud, sans validateurs côté navigateur
+                    recorders['server_cache'].request(client, url, data=params)
+
+                    # Le navigateur renvoie l'ETag obtenu lors de la visite précédente
+                    key = (filter_type, start)
+                    etag = etags.get(key, response['ETag'])
+                    response = recorders['conditional'].request(client, url, data=params, HTTP_IF_NONE_MATCH=etag)
+                    etags[key] = response.get('ETag', etag)
+
+        results = {mode: recorder.summary() for mode, recorder in recorders.items()}
+        for mode, summary in results.items():
+            self.stdout.write(
+                f"{mode:<14} {summary['requests']:>5} req  "
+                f"p50 {summary['p50_ms']:>8.2f} ms  p95 {summary['p95_ms']:>8.2f} ms  "
+                f"{summary['throughput_rps']:>8.1f} req/s  "
+                f"{summary['bytes_total']:>10} octets  {summary['queries_mean']:>5.1f} requêtes SQL"
+            )
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['output']}"))
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from core import checkin
+from core.benchmarks import Recorder, benchmark_client, write_results
+from core.models import Event, Participation
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Test de charge du scan de présence : premiers passages, scans répétés et jetons invalides"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participants', type=int, default=500, help="Participants acceptés de l'événement")
+        parser.add_argument('--repeats', type=int, default=2, help="Scans répétés de chaque badge après le premier")
+        parser.add_argument('--output', help="Fichier JSON où écrire les résultats")
+
+    def handle(self, *args, **options):
+        # Données créées puis annulées : la base n'est pas modifiée
+        with transaction.atomic():
+            results = self.run(options['participants'], options['repeats'])
+            transaction.set_rollback(True)
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<10} {result['throughput_rps']:>8.1f} scans/s  "
+                f"p95 {result['p95_ms']:>7.2f} ms  {result['queries_mean']:.1f} requêtes SQL"
+            )
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['output']}"))
+
+    def run(self, count, repeats):
+        organizer = User.objects.create_user(username='bench-checkin-organizer')
+        User.objects.bulk_create([User(username=f'bench-checkin-{i}') for i in range(count)])
+        participants = User.objects.filter(username__startswith='bench-checkin-').exclude(pk=organizer.pk)
+        now = timezone.now()
+        event = Event.objects.create(
+            title='Bench check-in',
+            start_datetime=now,
+            end_datetime=now + timedelta(hours=2),
+            organizer=organizer,
+            max_participants=count,
+        )
+        Participation.objects.bulk_create([
+            Participation(event=event, participant=participant, status='accepted')
+            for participant in participants
+        ])
+        Event.objects.filter(pk=event.pk).update(accepted_count=count)
+
+        tokens = [
+            checkin.make_token(participation_id, event.id, organizer.id)
+            for participation_id in event.participations.values_list('id', flat=True)
+        ]
+        urls = [reverse('event_checkin', args=[token]) for token in tokens]
+        client = benchmark_client(organizer)
+        recorders = {name: Recorder() for name in ('first', 'repeated', 'invalid')}
+        for url in urls:
+            recorders['first'].request(client, url)
+        for _ in range(repeats):
+            for url in urls:
+                recorders['repeated'].request(client, url)
+        for token in tokens:
+            recorders['invalid'].request(client, reverse('event_checkin', args=[token + 'x']))
+        return {name: recorder.summary() for name, recorder in recorders.items()}
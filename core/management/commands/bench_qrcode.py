@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core import qrcodes
+from core.benchmarks import Recorder, benchmark_client, write_results
+from core.models import Event
+
+
+class Command(BaseCommand):
+    help = "Compare le débit de génération des QR codes à froid (sans cache) et à chaud (cache LRU)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help="Nombre de QR codes générés par scénario")
+        parser.add_argument('--events', type=int, default=20, help="Nombre d'événements distincts utilisés")
+        parser.add_argument('--output', help="Fichier JSON où écrire les résultats")
+
+    def throughput(self, func, payloads):
+        started = time.perf_counter()
+        for payload in payloads:
+            func(*payload)
+        elapsed = time.perf_counter() - started
+        return {
+            'count': len(payloads),
+            'seconds': round(elapsed, 4),
+            'per_second': round(len(payloads) / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def handle(self, *args, **options):
+        event_ids = list(
+            Event.objects.filter(status='published').values_list('id', flat=True)[:options['events']]
+        )
+        if not event_ids:
+            raise CommandError("Aucun événement publié (lancer seed_events).")
+
+        iterations = options['iterations']
+        urls = [f"http://localhost/core/events/{event_ids[i % len(event_ids)]}/" for i in range(iterations)]
+        results = {}
+
+        # Génération directe : coût d'origine de chaque requête
+        for fmt in ('png', 'svg'):
+            results[f'cold_{fmt}'] = self.throughput(qrcodes.render_qrcode, [(url, fmt) for url in urls])
+
+        # Cache LRU chaud
+        qrcodes.memory_cache.clear()
+        for fmt in ('png', 'svg'):
+            for url in set(urls):
+                qrcodes.get_qrcode(url, fmt)
+            results[f'warm_{fmt}'] = self.throughput(qrcodes.get_qrcode, [(url, fmt) for url in urls])
+
+        # Bout en bout à travers la vue (résolution d'URL, requête SQL, en-têtes)
+        client = benchmark_client()
+        for fmt in ('png', 'svg'):
+            recorder = Recorder()
+            for i in range(iterations):
+                url = reverse('event_qrcode', args=[event_ids[i % len(event_ids)]])
+                recorder.request(client, url, data={'format': fmt})
+            results[f'view_{fmt}'] = recorder.summary()
+
+        for name, result in results.items():
+            per_second = result.get('per_second', result.get('throughput_rps'))
+            self.stdout.write(f"{name:<10} {per_second:>10.1f} QR codes/s")
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['output']}"))
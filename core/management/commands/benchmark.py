@@ -0,0 +1,177 @@
+import json
+import platform
+import random
+from datetime import timedelta
+from io import StringIO
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from core import qrcodes
+from core.benchmarks import Recorder, benchmark_client, write_results
+from core.cache import get_feed_cache
+from core.models import Event
+
+User = get_user_model()
+
+FILTERS = ['all', 'mine', 'participating', 'upcoming']
+
+# Indicateurs comparés à une exécution de référence (plus grand = moins bon)
+COMPARED_METRICS = ['p95_ms', 'queries_mean']
+
+
+class Command(BaseCommand):
+    help = (
+        "Suite de benchmarks des vues principales (calendrier, détail, inscription, QR code, profil) "
+        "sur une base de test jetable remplie par seed_events"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help="Utilisateurs générés")
+        parser.add_argument('--events', type=int, default=2000, help="Événements générés")
+        parser.add_argument('--density', type=float, default=0.02, help="Densité d'inscription (voir seed_events)")
+        parser.add_argument('--seed', type=int, default=42, help="Graine des données et des requêtes")
+        parser.add_argument('--requests', type=int, default=200, help="Requêtes par scénario")
+        parser.add_argument('--output', help="Fichier JSON où écrire les résultats")
+        parser.add_argument('--compare', help="Résultats JSON de référence : échec en cas de régression")
+        parser.add_argument('--tolerance', type=float, default=0.2, help="Dégradation tolérée par rapport à la référence (0.2 = 20 %%)")
+        parser.add_argument('--keepdb', action='store_true', help="Conserver la base de test après l'exécution")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as handle:
+                baseline = json.load(handle)
+
+        # Base jetable, comme pour les tests : la base de développement n'est jamais touchée
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            call_command(
+                'seed_events',
+                users=options['users'],
+                events=options['events'],
+                density=options['density'],
+                seed=options['seed'],
+                stdout=self.stdout if options['verbosity'] > 1 else StringIO(),
+            )
+            results = self.run_scenarios(random.Random(options['seed']), options['requests'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'options': {name: options[name] for name in ('users', 'events', 'density', 'seed', 'requests')},
+            },
+            'results': results,
+        }
+
+        for name, summary in results.items():
+            self.stdout.write(
+                f"{name:<28} p50 {summary['p50_ms']:>8.2f} ms  p95 {summary['p95_ms']:>8.2f} ms  "
+                f"p99 {summary['p99_ms']:>8.2f} ms  {summary['throughput_rps']:>8.1f} req/s  "
+                f"{summary['queries_mean']:>5.1f} requêtes SQL"
+            )
+        if options['output']:
+            write_results(options['output'], report)
+            self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['output']}"))
+
+        if baseline is not None:
+            regressions = compare_results(baseline.get('results', {}), results, options['tolerance'])
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            if regressions:
+                raise CommandError(f"{len(regressions)} régression(s) par rapport à {options['compare']}")
+            self.stdout.write(self.style.SUCCESS("Aucune régression par rapport à la référence."))
+
+    def run_scenarios(self, rng, count):
+        """Exécute chaque scénario et retourne le résumé de chacun"""
+        testuser = User.objects.get(username='testuser')
+        users = list(User.objects.exclude(pk=testuser.pk).order_by('pk')[:50])
+        clients = [benchmark_client(user) for user in users]
+        testuser_client = benchmark_client(testuser)
+        anonymous = benchmark_client()
+        event_ids = list(Event.objects.filter(status='published').order_by('pk').values_list('pk', flat=True))
+        if not event_ids:
+            raise CommandError("Aucun événement généré (augmenter --events).")
+
+        feed_cache = get_feed_cache()
+        results = {}
+
+        # Calendrier : un mois autour d'aujourd'hui, cache serveur vidé (coût des requêtes SQL)
+        now = timezone.now()
+        window = {'start': (now - timedelta(days=7)).isoformat(), 'end': (now + timedelta(days=35)).isoformat()}
+        scenarios = [(f'events_json_{filter_type}', {**window, 'filter': filter_type}) for filter_type in FILTERS]
+        scenarios.append(('events_json_upcoming_list', {**window, 'upcoming': 'true'}))
+        scenarios.append(('events_json_stream', {**window, 'stream': 'true'}))
+        for name, params in scenarios:
+            recorder = Recorder()
+            for _ in range(count):
+                feed_cache.clear()
+                recorder.request(testuser_client, reverse('events_json'), data=params)
+            results[name] = recorder.summary()
+
+        recorder = Recorder()
+        for _ in range(count):
+            recorder.request(testuser_client, reverse('events_json'), data={**window, 'filter': 'all'})
+        results['events_json_cached'] = recorder.summary()
+
+        # Liste paginée : première page puis pages suivantes par curseur
+        recorder = Recorder()
+        cursor = None
+        for _ in range(count):
+            response = recorder.request(testuser_client, reverse('events_list'), data={'cursor': cursor} if cursor else {})
+            cursor = response.json()['next']
+        results['events_list'] = recorder.summary()
+
+        recorder = Recorder()
+        for _ in range(count):
+            recorder.request(rng.choice(clients), reverse('event_detail', args=[rng.choice(event_ids)]))
+        results['event_detail'] = recorder.summary()
+
+        recorder = Recorder()
+        for _ in range(count):
+            recorder.call(rng.choice(clients).post, reverse('event_participate', args=[rng.choice(event_ids)]))
+        results['event_participate'] = recorder.summary()
+
+        # QR codes : génération à froid puis cache LRU
+        qrcodes.memory_cache.clear()
+        sample = rng.sample(event_ids, min(len(event_ids), 20))
+        for name in ('event_qrcode_cold', 'event_qrcode_warm'):
+            recorder = Recorder()
+            for i in range(count):
+                if name == 'event_qrcode_cold':
+                    qrcodes.memory_cache.clear()
+                recorder.request(anonymous, reverse('event_qrcode', args=[sample[i % len(sample)]]))
+            results[name] = recorder.summary()
+
+        recorder = Recorder()
+        for _ in range(count):
+            recorder.request(rng.choice(clients + [testuser_client]), reverse('profil'))
+        results['profile_view'] = recorder.summary()
+        return results
+
+
+def compare_results(baseline, results, tolerance):
+    """Liste les indicateurs dégradés de plus de `tolerance` par rapport à la référence"""
+    regressions = []
+    for name, summary in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = reference.get(metric), summary.get(metric)
+            if before is None or after is None:
+                continue
+            # Écart absolu minimal : ignore le bruit sur les valeurs très faibles
+            if after > before * (1 + tolerance) and after - before > 0.5:
+                regressions.append(f"{name} : {metric} {before} -> {after}")
+    return regressions
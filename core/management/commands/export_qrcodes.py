@@ -0,0 +1,65 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core import checkin, qrcodes
+from core.models import Event, Participation
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Génère en une fois les QR codes d'événements dans une archive ZIP ou un PDF multipage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Fichier de sortie (.zip ou .pdf)")
+        parser.add_argument('--event', type=int, action='append', dest='event_ids', help="Événement à inclure (répétable)")
+        parser.add_argument('--organizer', help="Inclure tous les événements publiés de cet organisateur")
+        parser.add_argument('--base-url', default='http://localhost:8000', help="Schéma et hôte encodés dans les QR codes")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus de génération")
+        parser.add_argument('--badges', action='store_true', help="Un QR code de présence par participant accepté au lieu d'un par événement")
+        parser.add_argument('--size', type=int, default=qrcodes.DEFAULT_BOX_SIZE, help="Taille d'un module en pixels")
+
+    def handle(self, *args, **options):
+        if not qrcodes.QRCODE_AVAILABLE:
+            raise CommandError("Le package 'qrcode' n'est pas installé.")
+
+        events = Event.objects.filter(status='published').order_by('start_datetime')
+        if options['event_ids']:
+            events = events.filter(id__in=options['event_ids'])
+        elif options['organizer']:
+            events = events.filter(organizer__username=options['organizer'])
+        else:
+            raise CommandError("Préciser --event ou --organizer.")
+
+        base_url = options['base_url'].rstrip('/')
+        codes, labels = [], {}
+        if options['badges']:
+            participations = Participation.objects.filter(
+                event__in=events, status='accepted'
+            ).order_by('event__start_datetime', 'id').values_list(
+                'id', 'event_id', 'event__organizer_id', 'event__title', 'participant__username'
+            )
+            for participation_id, event_id, organizer_id, title, username in participations:
+                name = f"badge-{event_id}-{participation_id}-{username}.png"
+                token = checkin.make_token(participation_id, event_id, organizer_id)
+                codes.append((name, checkin.checkin_url(base_url, token)))
+                labels[name] = f"{title} - {username}"
+        else:
+            for event_id, title in events.values_list('id', 'title'):
+                name = f"qrcode-event-{event_id}.png"
+                codes.append((name, base_url + reverse('event_detail', args=[event_id])))
+                labels[name] = title
+        if not codes:
+            raise CommandError("Aucun QR code à générer.")
+
+        entries = qrcodes.iter_rendered(codes, box_size=options['size'], workers=options['workers'])
+        output = options['output']
+        chunks = qrcodes.stream_pdf(entries, labels) if output.lower().endswith('.pdf') else qrcodes.stream_zip(entries)
+        with open(output, 'wb') as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"{len(codes)} QR codes écrits dans {output}"))
@@ -0,0 +1,53 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import importing
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Importe des événements depuis un fichier CSV ou iCalendar (validation et insertion par lots)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier .csv ou .ics")
+        parser.add_argument('--organizer', required=True, help="Nom d'utilisateur de l'organisateur des événements")
+        parser.add_argument('--format', choices=[importing.CSV, importing.ICS], help="Format du fichier (déduit de l'extension par défaut)")
+        parser.add_argument('--status', default='published', help="Statut des lignes qui n'en précisent pas")
+        parser.add_argument('--batch-size', type=int, default=importing.DEFAULT_BATCH_SIZE, help="Lignes validées et insérées par transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Valider le fichier sans rien enregistrer")
+        parser.add_argument('--allow-conflicts', action='store_true', help="Accepter les lieux réservés plusieurs fois sur un même créneau")
+
+    def handle(self, *args, **options):
+        try:
+            organizer = User.objects.get(username=options['organizer'])
+        except User.DoesNotExist:
+            raise CommandError(f"Utilisateur inconnu : {options['organizer']}")
+        if options['status'] not in importing.STATUSES or options['batch_size'] < 1:
+            raise CommandError("Paramètres invalides : --status inconnu ou --batch-size < 1.")
+
+        started = time.perf_counter()
+        file_format = options['format'] or importing.guess_format(options['path'])
+        try:
+            handle = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(f"Fichier illisible : {e}")
+        with handle:
+            result = importing.import_events(
+                importing.iter_rows(handle, file_format),
+                organizer,
+                default_status=options['status'],
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                check_conflicts=not options['allow_conflicts'],
+            )
+
+        for error in result.errors:
+            self.stderr.write(f"Ligne {error.line} : {error.message}" if error.line else error.message)
+        elapsed = time.perf_counter() - started
+        verb = "valides" if options['dry_run'] else "importés"
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.created} événements {verb}, {len(result.errors)} lignes en erreur, en {elapsed:.1f} s"
+        ))
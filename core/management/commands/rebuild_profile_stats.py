@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.stats import rebuild_user_stats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques de profil (table UserStats) depuis les événements et participations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help="Limiter à cet utilisateur (répétable)")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Lignes écrites par requête")
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(User.objects.filter(username__in=options['usernames']).values_list('pk', flat=True))
+            if not user_ids:
+                raise CommandError("Aucun utilisateur correspondant.")
+
+        with transaction.atomic():
+            rebuilt = rebuild_user_stats(user_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Statistiques recalculées pour {rebuilt} utilisateurs."))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.models import Event, Participation
+
+
+class Command(BaseCommand):
+    help = 'Recalcule le compteur de participants acceptés des événements et corrige les écarts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, action='append', dest='event_ids', help="Limiter à cet événement (répétable)")
+        parser.add_argument('--dry-run', action='store_true', help="Afficher les écarts sans les corriger")
+
+    def handle(self, *args, **options):
+        accepted = Participation.objects.filter(
+            event=OuterRef('pk'), status='accepted'
+        ).order_by().values('event').annotate(total=Count('id')).values('total')
+        actual = Coalesce(Subquery(accepted), 0)
+
+        events = Event.objects.all()
+        if options['event_ids']:
+            events = events.filter(pk__in=options['event_ids'])
+
+        # Événements dont le compteur stocké diverge du nombre réel (une seule requête)
+        drifted = events.annotate(actual_count=actual).exclude(accepted_count=F('actual_count'))
+        drifted_count = 0
+        for event in drifted.only('id', 'title', 'accepted_count').iterator(chunk_size=2000):
+            drifted_count += 1
+            self.stdout.write(f"✗ {event.title} (#{event.id}) : {event.accepted_count} stockés, {event.actual_count} réels")
+
+        if not drifted_count:
+            self.stdout.write(self.style.SUCCESS('Aucun écart détecté.'))
+            return
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{drifted_count} événements à corriger.'))
+            return
+
+        # Correction en masse : un seul UPDATE avec sous-requête
+        with transaction.atomic():
+            fixed = events.filter(pk__in=drifted.values('pk')).update(accepted_count=actual)
+        self.stdout.write(self.style.SUCCESS(f'{fixed} compteurs corrigés.'))
@@ -1,16 +1,114 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Q
 from django.utils import timezone
 from datetime import datetime, timedelta
-import random
-from core.models import Event
+import time
+from core import ics, seeding
+from core.importing import insert_rows
+from core.cache import bump_feed_version
+from core.models import Event, Participation
+from core.stats import rebuild_user_stats
 
 User = get_user_model()
 
+SEED_USER_PREFIX = 'seed-user-'
+
+# Identifiants par DELETE : sous la limite de paramètres de SQLite
+DELETE_BATCH_SIZE = 500
+
+PARTICIPATION_COLUMNS = [
+    'event', 'participant', 'status', 'queue_position', 'checked_in_at', 'comments', 'created_at', 'updated_at',
+]
+
+
 class Command(BaseCommand):
-    help = 'Crée des événements de test pour le calendrier'
+    help = 'Crée des événements de test pour le calendrier (générateur déterministe, en masse)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help="Nombre d'utilisateurs (testuser compris)")
+        parser.add_argument('--events', type=int, default=100, help="Nombre d'événements")
+        parser.add_argument('--density', type=float, default=0.2, help="Probabilité qu'un utilisateur s'inscrive à un événement")
+        parser.add_argument('--days', type=int, default=30, help="Événements répartis sur les N prochains jours")
+        parser.add_argument('--past-days', type=int, default=7, help="... et sur les N jours précédents")
+        parser.add_argument('--capacity', type=int, nargs=2, default=[10, 50], metavar=('MIN', 'MAX'), help="Capacité des événements")
+        parser.add_argument('--start-date', help="Date de référence AAAA-MM-JJ (aujourd'hui par défaut)")
+        parser.add_argument('--seed', type=int, default=42, help="Graine aléatoire : même graine, mêmes données")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Événements générés et insérés par lot")
+        parser.add_argument('--workers', type=int, default=0, help="Processus de génération (0 : aucun pool)")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['events'] < 0 or not 0 <= options['density'] <= 1:
+            raise CommandError("Paramètres invalides : --users >= 1, --events >= 0, 0 <= --density <= 1.")
+        started = time.perf_counter()
+
+        user_ids = self.create_users(options['users'])
+
+        deleted = self.delete_generated_events(user_ids[0])
+        if deleted:
+            self.stdout.write(f"✓ {deleted} anciens événements de test supprimés")
+
+        # Date de référence à minuit : les données ne dépendent que des options
+        if options['start_date']:
+            base = timezone.make_aware(datetime.strptime(options['start_date'], '%Y-%m-%d'))
+        else:
+            base = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        events_created = participations_created = 0
+        chunks = seeding.iter_chunks(
+            options['seed'], options['events'], options['batch_size'], len(user_ids),
+            options['density'], options['days'], options['past_days'], tuple(options['capacity']),
+            workers=options['workers'],
+        )
+        for chunk in chunks:
+            with transaction.atomic():
+                created = self.insert_chunk(chunk, user_ids, base, options['batch_size'])
+            events_created += len(chunk)
+            participations_created += created
+            self.stdout.write(f"✓ {events_created} événements, {participations_created} participations")
+
+        # Suppression SQL et bulk_create n'envoient pas de signaux : caches du calendrier
+        # et des flux iCalendar (blocs VEVENT indexés par identifiant), statistiques à rafraîchir
+        bump_feed_version()
+        ics.bump_organizers_version()
+        rebuild_user_stats(batch_size=options['batch_size'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{events_created} événements de test et {participations_created} participations '
+            f'créés en {elapsed:.1f} s'
+        ))
 
-    def handle(self, *args, **kwargs):
+    def delete_generated_events(self, testuser_id):
+        """Supprime les événements générés par une exécution précédente et leurs participations.
+
+        Seuls les événements de testuser ou des comptes générés portant la marque
+        du générateur sont concernés. Les DELETE sont envoyés directement pour ne
+        pas déclencher les signaux ligne à ligne (promotion de liste d'attente,
+        statistiques) : tout est recalculé en fin de commande.
+        """
+        ids = list(Event.objects.filter(
+            Q(organizer_id=testuser_id) | Q(organizer__username__startswith=SEED_USER_PREFIX),
+            description__endswith=seeding.GENERATED_MARK,
+        ).values_list('pk', flat=True))
+        quote = connection.ops.quote_name
+        participations = (
+            f'DELETE FROM {quote(Participation._meta.db_table)} '
+            f'WHERE {quote(Participation._meta.get_field("event").column)} IN'
+        )
+        events = f'DELETE FROM {quote(Event._meta.db_table)} WHERE {quote(Event._meta.pk.column)} IN'
+        with transaction.atomic(), connection.cursor() as cursor:
+            for first in range(0, len(ids), DELETE_BATCH_SIZE):
+                batch = ids[first:first + DELETE_BATCH_SIZE]
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(f'{participations} ({placeholders})', batch)
+                cursor.execute(f'{events} ({placeholders})', batch)
+        return len(ids)
+
+    def create_users(self, count):
+        """Crée les utilisateurs manquants et retourne leurs identifiants, testuser en premier"""
         # Créer un utilisateur de test s'il n'existe pas
         user, created = User.objects.get_or_create(
             username='testuser',
@@ -25,77 +123,54 @@ class Command(BaseCommand):
             user.save()
             self.stdout.write(self.style.SUCCESS('Utilisateur de test créé'))
 
-        # Noms d'événements de test
-        event_titles = [
-            "Formation Django Avancé",
-            "Réunion d'équipe hebdomadaire",
-            "Atelier de développement web",
-            "Présentation du projet Q4",
-            "Session de code review",
-            "Formation sécurité informatique",
-            "Brainstorming nouveaux produits",
-            "Conférence sur l'IA",
-            "Workshop Tailwind CSS",
-            "Meetup développeurs locaux",
-            "Séminaire gestion de projet",
-            "Entraînement présentation",
-            "Révision stratégique",
-            "Planning sprint suivant",
-            "Formation PostgreSQL",
-        ]
-
-        # Lieux de test
-        locations = [
-            "Salle de conférence A",
-            "Bureau 201",
-            "Espace coworking",
-            "Amphithéâtre principal",
-            "Salle de réunion virtuelle",
-            "Cafétéria",
-            "Lab informatique",
-            "Salle de formation",
-            "Online (Zoom)",
-            "Google Meet",
-        ]
+        # Un seul hachage pour tous les comptes générés
+        password = make_password('testpass123')
+        usernames = [f'{SEED_USER_PREFIX}{i:07d}' for i in range(1, count)]
+        User.objects.bulk_create(
+            [User(username=username, email=f'{username}@example.com', password=password) for username in usernames],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        ids = dict(
+            User.objects.filter(username__startswith=SEED_USER_PREFIX).values_list('username', 'pk').iterator()
+        )
+        return [user.pk] + [ids[username] for username in usernames]
 
-        # Supprimer les anciens événements de test
-        Event.objects.filter(organizer=user).delete()
-
-        # Créer des événements pour les 30 prochains jours
-        today = timezone.now()
-        events_created = 0
-
-        for i in range(15):  # Créer 15 événements
-            # Date aléatoire dans les 30 prochains jours
-            days_ahead = random.randint(0, 30)
-            start_date = today + timedelta(days=days_ahead)
-            
-            # Heure de début entre 8h et 18h
-            start_hour = random.randint(8, 18)
-            start_datetime = start_date.replace(
-                hour=start_hour,
-                minute=random.choice([0, 15, 30, 45]),
-                second=0,
-                microsecond=0
-            )
-            
-            # Durée entre 1 et 3 heures
-            duration_hours = random.randint(1, 3)
-            end_datetime = start_datetime + timedelta(hours=duration_hours)
-            
-            # Créer l'événement
-            event = Event.objects.create(
-                title=random.choice(event_titles),
-                description=f"Description de l'événement {i+1}. Ceci est un événement de test créé automatiquement pour démontrer le fonctionnement du calendrier.",
-                location=random.choice(locations),
+    def insert_chunk(self, chunk, user_ids, base, batch_size):
+        """Insère un lot d'événements puis leurs participations, compteurs déjà calculés"""
+        events = []
+        for title, description, location, start, duration, capacity, organizer, participations in chunk:
+            start_datetime = base + timedelta(minutes=start)
+            events.append(Event(
+                title=title,
+                description=description,
+                location=location,
                 start_datetime=start_datetime,
-                end_datetime=end_datetime,
-                max_participants=random.randint(10, 50),
-                organizer=user,
-                status='published'
-            )
-            
-            events_created += 1
-            self.stdout.write(f"✓ Événement créé: {event.title} le {start_datetime.strftime('%d/%m/%Y à %H:%M')}")
+                end_datetime=start_datetime + timedelta(minutes=duration),
+                max_participants=capacity,
+                accepted_count=sum(1 for _, status, _, _ in participations if status == 'accepted'),
+                waitlist_tail=sum(1 for _, status, _, _ in participations if status == 'pending'),
+                organizer_id=user_ids[organizer],
+                status='published',
+            ))
+        Event.objects.bulk_create(events, batch_size=batch_size)
 
-        self.stdout.write(self.style.SUCCESS(f'{events_created} événements de test créés avec succès!'))
\ No newline at end of file
+        # Les participations dominent le volume : valeurs adaptées une fois pour toutes
+        adapt = connection.ops.adapt_datetimefield_value
+        now = adapt(timezone.now())
+        rows = [
+            (
+                event.pk,
+                user_ids[user],
+                status,
+                queue_position,
+                adapt(base + timedelta(minutes=checked_in)) if checked_in is not None else None,
+                '',
+                now,
+                now,
+            )
+            for event, (*_, participations) in zip(events, chunk)
+            for user, status, queue_position, checked_in in participations
+        ]
+        insert_rows(Participation, PARTICIPATION_COLUMNS, rows, batch_size)
+        return len(rows)
@@ -0,0 +1,331 @@
+"""Métriques agrégées de l'application au format texte Prometheus (``/metrics``).
+
+Chaque processus incrémente ses compteurs et histogrammes en mémoire (un
+verrou, aucune E/S sur le chemin de la requête). Avec plusieurs workers
+gunicorn, ``METRICS_DIR`` désigne un répertoire partagé : un thread de chaque
+processus y écrit un instantané de ses valeurs toutes les
+``METRICS_FLUSH_INTERVAL`` secondes, et la vue ``/metrics`` additionne les
+instantanés. Un instantané qui n'a pas été réécrit depuis
+``METRICS_SNAPSHOT_TTL`` secondes est celui d'un processus arrêté : il est
+supprimé et ne compte plus (Prometheus traite la baisse d'un compteur comme
+une remise à zéro).
+
+Les jauges de connexions à la base (ouvertes, utilisées par une requête en
+cours) sont calculées au moment de l'instantané. Pour une réponse diffusée
+(flux, exports, archives), durée, requêtes SQL et connexion utilisée sont
+mesurées jusqu'à la fermeture du corps, comme dans core/instrumentation.py.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Nom : (type, description)
+METRICS = {
+    'http_requests_total': ('counter', "Requêtes HTTP traitées, par nom d'URL, méthode et code de statut"),
+    'http_request_duration_seconds': ('histogram', "Durée de traitement des requêtes, par nom d'URL"),
+    'db_queries_total': ('counter', "Requêtes SQL exécutées, par nom d'URL"),
+    'db_connections_opened_total': ('counter', "Connexions à la base ouvertes, par alias"),
+    'db_connections_open': ('gauge', "Connexions à la base actuellement ouvertes (persistantes comprises), par alias"),
+    'db_connections_in_use': ('gauge', "Connexions à la base utilisées par une requête HTTP en cours, par alias"),
+    'cache_requests_total': ('counter', "Accès aux caches (flux du calendrier, QR codes), par résultat"),
+    'registrations_total': ('counter', "Inscriptions et désinscriptions, par résultat"),
+    'checkins_total': ('counter', "Scans de présence, par résultat"),
+}
+
+
+class Registry:
+    """Compteurs et histogrammes du processus courant"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.gauges = defaultdict(float)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def add(self, name, delta, **labels):
+        """Fait varier une jauge"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.gauges[key] += delta
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(DURATION_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self):
+        """Copie sérialisable des valeurs courantes"""
+        gauges = open_connections()
+        with self._lock:
+            gauges.update(self.gauges)
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'gauges': [[name, labels, value] for (name, labels), value in gauges.items()],
+                'histograms': [
+                    [name, labels, list(buckets), total, count]
+                    for (name, labels), (buckets, total, count) in self.histograms.items()
+                ],
+            }
+
+
+# Connexions créées par ce processus (tous threads) : ouvertes tant que leur connexion DB-API existe
+_connections = weakref.WeakSet()
+
+
+def open_connections():
+    """Jauge des connexions ouvertes du processus, par alias"""
+    gauges = defaultdict(float)
+    for connection in list(_connections):
+        if connection.connection is not None:
+            gauges[('db_connections_open', (('alias', connection.alias),))] += 1
+    return gauges
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+
+
+def _snapshot_filename():
+    # Le pid seul pourrait être réutilisé par un nouveau worker
+    return f'metrics-{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+
+
+_snapshot_name = _snapshot_filename()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    """Worker issu d'un fork (gunicorn --preload) : valeurs, fichier et thread propres au fils"""
+    global _snapshot_name, _flusher
+    registry.__init__()
+    _connections.clear()
+    _snapshot_name = _snapshot_filename()
+    _flusher = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def flush():
+    """Écrit l'instantané du processus dans METRICS_DIR"""
+    directory = metrics_dir()
+    if not directory:
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as handle:
+            json.dump(registry.snapshot(), handle)
+        os.replace(tmp_path, os.path.join(directory, _snapshot_name))
+    except OSError:
+        pass
+
+
+atexit.register(flush)
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0))
+        flush()
+
+
+def start_flusher():
+    """Démarre, une fois par processus, le thread qui écrit l'instantané hors des requêtes"""
+    global _flusher
+    if _flusher is not None or not metrics_dir():
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_periodically, name='metrics-flush', daemon=True)
+            _flusher.start()
+
+
+def _read_snapshots(directory):
+    """Instantanés des processus actifs ; ceux des processus arrêtés sont supprimés"""
+    expired = time.time() - getattr(settings, 'METRICS_SNAPSHOT_TTL', 60)
+    snapshots = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < expired:
+                # Instantané d'un processus arrêté, ou fichier temporaire abandonné
+                os.remove(path)
+                continue
+            if name.endswith('.json'):
+                with open(path) as handle:
+                    snapshots.append(json.load(handle))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def collect():
+    """Additionne les instantanés de tous les processus (ou du seul processus courant)"""
+    directory = metrics_dir()
+    if not directory:
+        snapshots = [registry.snapshot()]
+    else:
+        flush()
+        snapshots = _read_snapshots(directory)
+
+    # Compteurs et jauges s'additionnent de la même façon entre processus
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters'] + snapshot.get('gauges', []):
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(DURATION_BUCKETS), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render():
+    """Texte au format d'exposition Prometheus 0.0.4"""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind in ('counter', 'gauge'):
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+            continue
+        for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket in zip(DURATION_BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    inc('db_connections_opened_total', alias=connection.alias)
+    _connections.add(connection)
+
+
+class _QueryCounter:
+    """execute_wrapper comptant les requêtes SQL de la requête HTTP en cours"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.count:
+            # Première requête : la connexion est occupée jusqu'à la fin de la requête HTTP
+            registry.add('db_connections_in_use', 1, alias=context['connection'].alias)
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Compte et chronomètre chaque requête sous le nom de son URL"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start_flusher()
+        started = time.perf_counter()
+        counter = _QueryCounter()
+        try:
+            with connections['default'].execute_wrapper(counter):
+                response = self.get_response(request)
+        except BaseException:
+            self.release(counter)
+            raise
+        if response.streaming and not getattr(response, 'is_async', False):
+            # Corps produit après le retour de la vue : mesures arrêtées à sa fermeture
+            response.streaming_content = self.measure_stream(
+                request, response, counter, started, response.streaming_content
+            )
+        else:
+            self.release(counter)
+            self.record(request, response, counter, time.perf_counter() - started)
+        return response
+
+    def measure_stream(self, request, response, counter, started, content):
+        """Corps de la réponse diffusée, ses requêtes SQL comptées jusqu'à sa fermeture"""
+        chunks = iter(content)
+        try:
+            while True:
+                with connections['default'].execute_wrapper(counter):
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        break
+                yield chunk
+        finally:
+            self.release(counter)
+            self.record(request, response, counter, time.perf_counter() - started)
+
+    def release(self, counter):
+        """La requête HTTP est terminée : sa connexion n'est plus utilisée"""
+        if counter.count:
+            registry.add('db_connections_in_use', -1, alias='default')
+
+    def record(self, request, response, counter, duration):
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unresolved'
+        inc('http_requests_total', view=view, method=request.method, status=response.status_code)
+        observe('http_request_duration_seconds', duration, view=view)
+        if counter.count:
+            inc('db_queries_total', counter.count, view=view)
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_accepted_count(apps, schema_editor):
+    Event = apps.get_model('core', 'Event')
+    Participation = apps.get_model('core', 'Participation')
+    accepted = Participation.objects.filter(
+        event=OuterRef('pk'), status='accepted'
+    ).order_by().values('event').annotate(total=Count('id')).values('total')
+    Event.objects.update(accepted_count=Coalesce(Subquery(accepted), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='accepted_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Participants acceptés'),
+        ),
+        migrations.RunPython(populate_accepted_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_event_accepted_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='waitlist_tail',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Dernière position en liste d'attente"),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='queue_position',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name="Position en liste d'attente"),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['event', 'status', 'queue_position'], name='core_partic_event_i_ad74b3_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participation',
+            name='checked_in_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Présence enregistrée le'),
+        ),
+    ]
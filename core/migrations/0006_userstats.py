@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_participation_checked_in_at'),
+        ('users', '__first__'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+                ('events_organized', models.IntegerField(default=0, verbose_name='Événements organisés')),
+                ('participations', models.IntegerField(default=0, verbose_name='Participations')),
+                ('pending_participations', models.IntegerField(default=0, verbose_name='Participations en attente')),
+                ('accepted_participations', models.IntegerField(default=0, verbose_name='Participations acceptées')),
+                ('rejected_participations', models.IntegerField(default=0, verbose_name='Participations rejetées')),
+                ('cancelled_participations', models.IntegerField(default=0, verbose_name='Participations annulées')),
+                ('events_attended', models.IntegerField(default=0, verbose_name='Présences enregistrées')),
+                ('time_attended', models.DurationField(default=datetime.timedelta(0), verbose_name='Temps de présence')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Statistiques utilisateur',
+                'verbose_name_plural': 'Statistiques utilisateurs',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_event_status_start_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='core_event_start_d_08cb0b_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='core_event_organiz_d4cb56_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='core_event_status_10b7b9_idx',
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status', 'end_datetime', 'start_datetime'], name='event_status_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['organizer', 'start_datetime'], name='event_organizer_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['participant', 'status', 'event'], name='participation_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['event', '-created_at'], name='participation_event_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recurring_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['location', 'end_datetime', 'start_datetime'], name='event_location_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('recurrence__isnull', False)), fields=['location', 'start_datetime'], name='event_location_series_idx'),
+        ),
+    ]
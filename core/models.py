@@ -1,6 +1,7 @@
 
 # Create your models here.
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.utils import timezone
@@ -31,6 +32,20 @@ class Event(models.Model):
         validators=[MinValueValidator(1)]
     )
     
+    # Compteur dénormalisé des participants acceptés, maintenu par Participation
+    accepted_count = models.PositiveIntegerField(
+        verbose_name="Participants acceptés",
+        default=0,
+        editable=False
+    )
+    
+    # Dernière position attribuée dans la liste d'attente (compteur monotone)
+    waitlist_tail = models.PositiveBigIntegerField(
+        verbose_name="Dernière position en liste d'attente",
+        default=0,
+        editable=False
+    )
+    
     # Organisation
     organizer = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -47,24 +62,99 @@ class Event(models.Model):
         verbose_name="Statut"
     )
     
+    # Récurrence (voir core/recurrence.py) : une série est une seule ligne dont les
+    # occurrences sont calculées à la demande. NULL (et non "") pour les événements
+    # simples : "recurrence IS NOT NULL" ne prend pas de paramètre et peut servir
+    # l'index partiel des séries
+    RECURRENCE_CHOICES = [
+        ('daily', 'Tous les jours'),
+        ('weekly', 'Toutes les semaines'),
+        ('monthly', 'Tous les mois'),
+    ]
+    recurrence = models.CharField(
+        max_length=10,
+        choices=RECURRENCE_CHOICES,
+        null=True,
+        blank=True,
+        verbose_name="Récurrence"
+    )
+    recurrence_interval = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        verbose_name="Intervalle de récurrence"
+    )
+    recurrence_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Dernière occurrence au plus tard le"
+    )
+    
+    # Occurrence matérialisée d'une série (inscriptions, annulation ou modification
+    # de cette seule occurrence) : `occurrence_start` est son début prévu par la règle
+    series = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='occurrences',
+        verbose_name="Série"
+    )
+    occurrence_start = models.DateTimeField(null=True, blank=True, editable=False)
+    
     # Métadonnées
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Champs mis à jour uniquement par des expressions F()
+    COUNTER_FIELDS = ('accepted_count', 'waitlist_tail')
+    
     class Meta:
         verbose_name = "Événement"
         verbose_name_plural = "Événements"
         ordering = ['start_datetime']
         indexes = [
-            models.Index(fields=['start_datetime', 'end_datetime']),
-            models.Index(fields=['organizer']),
-            models.Index(fields=['status']),
+            # Flux du calendrier : événements publiés chevauchant la fenêtre. La plage porte
+            # sur la fin (> début de fenêtre) : seuls les événements non terminés sont lus,
+            # quel que soit l'historique accumulé
+            models.Index(fields=['status', 'end_datetime', 'start_datetime'], name='event_status_window_idx'),
+            # Liste paginée : filtre sur le statut, tri et curseur sur (start_datetime, id)
+            models.Index(fields=['status', 'start_datetime', 'id']),
+            # Événements d'un organisateur par date (profil, filtre "mine", archives)
+            models.Index(fields=['organizer', 'start_datetime'], name='event_organizer_start_idx'),
+            # Occupation d'un lieu : événements du lieu non terminés au début du créneau
+            # (contrôle des réservations en double, voir core/conflicts.py)
+            models.Index(fields=['location', 'end_datetime', 'start_datetime'], name='event_location_window_idx'),
+            # Séries récurrentes d'un lieu (occurrences calculées, même contrôle)
+            models.Index(
+                fields=['location', 'start_datetime'],
+                condition=models.Q(recurrence__isnull=False),
+                name='event_location_series_idx',
+            ),
+            # Séries récurrentes débutant avant la fin de la fenêtre
+            models.Index(
+                fields=['start_datetime'],
+                condition=models.Q(recurrence__isnull=False),
+                name='event_series_start_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'occurrence_start'], name='event_unique_occurrence'),
         ]
     
     def __str__(self):
         return f"{self.title} - {self.start_datetime.strftime('%d/%m/%Y %H:%M')}"
     
     # Méthodes utilitaires
+    @property
+    def is_series(self):
+        """Événement récurrent (ligne unique de la série)"""
+        return self.recurrence is not None
+    
+    @property
+    def occurrence_timestamp(self):
+        """Début prévu de l'occurrence en secondes depuis l'epoch (identifiant dans les URL)"""
+        return int(self.occurrence_start.timestamp()) if self.occurrence_start else None
+    
     def is_past(self):
         """Vérifie si l'événement est passé"""
         return self.end_datetime < timezone.now()
@@ -87,19 +177,69 @@ class Event(models.Model):
         return (
             self.status == 'published' 
             and not self.is_past()
-            and self.current_participants_count() < self.max_participants
+            and self.accepted_count < self.max_participants
         )
     
     def current_participants_count(self):
-        """Compte le nombre de participants acceptés"""
-        return self.participations.filter(status='accepted').count()
+        """Nombre de participants acceptés (compteur dénormalisé, sans requête)"""
+        return self.accepted_count
+    
+    def promote_waitlist(self):
+        """Accepte les premiers inscrits de la liste d'attente tant qu'il reste des places"""
+        promoted = []
+        while True:
+            with transaction.atomic():
+                # Tête de file via l'index (event, status, queue_position) : pas de parcours de la liste
+                head = (
+                    self.participations.select_for_update(skip_locked=True)
+                    .filter(status='pending', queue_position__isnull=False)
+                    .order_by('queue_position')
+                    .first()
+                )
+                if head is None:
+                    break
+                head.status = 'accepted'
+                head.queue_position = None
+                try:
+                    with transaction.atomic():
+                        head.save(update_fields=['status', 'queue_position', 'updated_at'])
+                except EventFull:
+                    break
+            promoted.append(head)
+        return promoted
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Capacité en base, pour détecter une augmentation au prochain save()
+        instance._loaded_max_participants = instance.__dict__.get('max_participants')
+        return instance
     
     def save(self, *args, **kwargs):
         # Validation de cohérence des dates
         if self.end_datetime <= self.start_datetime:
             from django.core.exceptions import ValidationError
             raise ValidationError("La date de fin doit être après la date de début")
+        
+        # Les compteurs sont maintenus par des UPDATE atomiques : une instance
+        # chargée plus tôt ne doit pas les écraser avec des valeurs périmées
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        
+        previous_max = getattr(self, '_loaded_max_participants', None)
         super().save(*args, **kwargs)
+        self._loaded_max_participants = self.max_participants
+        
+        # Places supplémentaires : promotion automatique de la liste d'attente
+        if previous_max is not None and self.max_participants > previous_max:
+            self.promote_waitlist()
+
+
+class EventFull(Exception):
+    """Levée lorsqu'une participation acceptée dépasserait la capacité de l'événement"""
 
 
 class Participation(models.Model):
@@ -132,6 +272,22 @@ class Participation(models.Model):
         verbose_name="Statut"
     )
     
+    # Position dans la liste d'attente (participations en attente uniquement)
+    queue_position = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Position en liste d'attente"
+    )
+
+    # Renseigné une seule fois, au premier scan du QR code de présence
+    checked_in_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Présence enregistrée le"
+    )
+
     comments = models.TextField(blank=True, verbose_name="Commentaires")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -141,6 +297,103 @@ class Participation(models.Model):
         verbose_name_plural = "Participations"
         unique_together = ['event', 'participant']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['event', 'status', 'queue_position']),
+            # Participations d'un utilisateur par statut (filtre "participating", profil)
+            models.Index(fields=['participant', 'status', 'event'], name='participation_user_status_idx'),
+            # Participations d'un événement dans l'ordre par défaut
+            models.Index(fields=['event', '-created_at'], name='participation_event_recent_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.participant} - {self.event}"
+    
+    def is_waitlisted(self):
+        """Vérifie si la participation est sur liste d'attente"""
+        return self.status == 'pending' and self.queue_position is not None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut en base, pour détecter les transitions au prochain save()
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
+    def accepted_delta(self):
+        """Variation du nombre de participants acceptés induite par le statut courant"""
+        previous = getattr(self, '_loaded_status', None)
+        return int(self.status == 'accepted') - int(previous == 'accepted')
+    
+    def save(self, *args, **kwargs):
+        # Mise à jour atomique du compteur de l'événement lors des changements de statut
+        delta = self.accepted_delta()
+        with transaction.atomic():
+            if delta > 0:
+                # Réservation conditionnelle : aucune ligne modifiée si l'événement est complet
+                reserved = Event.objects.filter(
+                    pk=self.event_id,
+                    accepted_count__lt=F('max_participants')
+                ).update(accepted_count=F('accepted_count') + 1)
+                if not reserved:
+                    raise EventFull("L'événement a atteint son nombre maximum de participants")
+            elif delta < 0:
+                Event.objects.filter(pk=self.event_id).update(
+                    accepted_count=F('accepted_count') - 1
+                )
+            super().save(*args, **kwargs)
+            self._loaded_status = self.status
+            
+            # Place libérée : la tête de la liste d'attente est promue dans la même transaction
+            if delta < 0:
+                Event(pk=self.event_id).promote_waitlist()
+
+class UserStats(models.Model):
+    """Statistiques agrégées d'un utilisateur, tenues à jour par les signaux (voir core/stats.py)"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name="Utilisateur"
+    )
+    events_organized = models.IntegerField(default=0, verbose_name="Événements organisés")
+    participations = models.IntegerField(default=0, verbose_name="Participations")
+    pending_participations = models.IntegerField(default=0, verbose_name="Participations en attente")
+    accepted_participations = models.IntegerField(default=0, verbose_name="Participations acceptées")
+    rejected_participations = models.IntegerField(default=0, verbose_name="Participations rejetées")
+    cancelled_participations = models.IntegerField(default=0, verbose_name="Participations annulées")
+    events_attended = models.IntegerField(default=0, verbose_name="Présences enregistrées")
+    time_attended = models.DurationField(default=timedelta(0), verbose_name="Temps de présence")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Statistiques utilisateur"
+        verbose_name_plural = "Statistiques utilisateurs"
+    
+    def __str__(self):
+        return f"Statistiques de {self.user_id}"
+    
+    @property
+    def hours_attended(self):
+        """Heures de présence, arrondies au dixième"""
+        return round(self.time_attended.total_seconds() / 3600, 1)
+
+
+class FeedToken(models.Model):
+    """Version des adresses d'abonnement iCalendar d'un utilisateur (voir core/ics.py)"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='feed_token',
+        verbose_name="Utilisateur"
+    )
+    version = models.PositiveIntegerField(default=0, verbose_name="Version")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Jeton de flux iCalendar"
+        verbose_name_plural = "Jetons de flux iCalendar"
     
     def __str__(self):
-        return f"{self.participant} - {self.event}"
\ No newline at end of file
+        return f"Flux iCalendar de {self.user_id} (version {self.version})"
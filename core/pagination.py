@@ -0,0 +1,59 @@
+"""Pagination par curseur (keyset) de la liste des événements.
+
+Les événements sont triés sur ``(start_datetime, id)`` ; le curseur contient
+la clé du dernier événement renvoyé et la page suivante commence strictement
+après elle. Contrairement à ``OFFSET``, le coût d'une page ne dépend pas de
+sa position : la base parcourt l'index ``(status, start_datetime, id)`` à
+partir de la clé, sans relire les pages précédentes. Le curseur est signé
+(il ne peut pas être forgé) et transporte aussi les paramètres de la requête
+(fenêtre, filtre) : les pages suivantes portent sur exactement la même liste.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.db.models import Q
+
+SALT = 'core.pagination'
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidCursor(Exception):
+    """Curseur illisible ou altéré"""
+
+
+def to_microseconds(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_microseconds(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def encode_cursor(event, params):
+    """Curseur désignant la position juste après `event`, pour les paramètres `params`"""
+    return signing.dumps([to_microseconds(event.start_datetime), event.pk, params], salt=SALT)
+
+
+def decode_cursor(cursor):
+    """Retourne la clé ``(start_datetime, id)`` et les paramètres contenus dans le curseur"""
+    try:
+        timestamp, pk, params = signing.loads(cursor, salt=SALT)
+        return (from_microseconds(timestamp), int(pk)), params
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def after(queryset, key):
+    """Événements situés strictement après la clé ``(start_datetime, id)``"""
+    start, pk = key
+    return queryset.filter(Q(start_datetime__gt=start) | Q(start_datetime=start, id__gt=pk))
+
+
+def paginate(queryset, key, page_size):
+    """Une page triée sur (start_datetime, id) et l'indication d'une page suivante"""
+    if key is not None:
+        queryset = after(queryset, key)
+    # Un élément de plus que la page : détecte la suite sans requête COUNT
+    events = list(queryset.order_by('start_datetime', 'id')[:page_size + 1])
+    return events[:page_size], len(events) > page_size
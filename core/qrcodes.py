@@ -0,0 +1,326 @@
+"""Génération des QR codes avec cache LRU en mémoire et stockage disque optionnel.
+
+Un QR code ne dépend que de son contenu (URL de l'événement : schéma, hôte et
+identifiant), du format et de la taille des modules : la clé de cache est une
+empreinte de ces valeurs, réutilisée comme ETag. Le stockage disque est activé
+par ``QRCODE_CACHE_DIR`` et partagé entre les workers.
+"""
+import atexit
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import metrics
+from .instrumentation import span
+from .zipstream import StreamBuffer
+
+try:
+    import qrcode
+    QRCODE_AVAILABLE = True
+except ImportError:
+    QRCODE_AVAILABLE = False
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+DEFAULT_BOX_SIZE = 10
+MAX_BOX_SIZE = 40
+
+
+class LRUCache:
+    """Cache LRU borné, partagé entre les threads d'un worker"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+memory_cache = LRUCache(getattr(settings, 'QRCODE_CACHE_SIZE', 256))
+
+
+def cache_key(data, fmt='png', box_size=DEFAULT_BOX_SIZE):
+    """Empreinte identifiant un QR code (sert aussi d'ETag)"""
+    return hashlib.sha1(f'{fmt}|{box_size}|{data}'.encode('utf-8')).hexdigest()
+
+
+def render_qrcode(data, fmt='png', box_size=DEFAULT_BOX_SIZE):
+    """Génère le QR code sans passer par le cache et retourne son contenu binaire"""
+    with span('qrcode'):
+        return _render_qrcode(data, fmt, box_size)
+
+
+def _render_qrcode(data, fmt, box_size):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    if fmt == 'svg':
+        return _matrix_to_svg(qr.get_matrix(), box_size)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _matrix_to_svg(matrix, box_size):
+    """SVG minimal : un seul chemin, une commande par suite de modules noirs d'une ligne.
+
+    Bien moins coûteux que l'encodage PNG (pas de rastérisation ni de
+    compression) et que les fabriques SVG de ``qrcode`` (un élément par module).
+    """
+    size = len(matrix)
+    runs = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                start = x
+                while x < size and row[x]:
+                    x += 1
+                runs.append(f'M{start} {y}h{x - start}v1h-{x - start}z')
+            else:
+                x += 1
+    pixels = size * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path d="{"".join(runs)}" fill="#000"/></svg>'
+    ).encode('utf-8')
+
+
+def _disk_path(key, fmt):
+    cache_dir = getattr(settings, 'QRCODE_CACHE_DIR', None)
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, key[:2], f'{key}.{fmt}')
+
+
+def _read_disk(path):
+    try:
+        with open(path, 'rb') as handle:
+            return handle.read()
+    except OSError:
+        return None
+
+
+def _write_disk(path, content):
+    """Écriture atomique (fichier temporaire puis renommage) pour les workers concurrents"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(content)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def get_qrcode(data, fmt='png', box_size=DEFAULT_BOX_SIZE):
+    """Retourne le QR code depuis le cache mémoire, le disque, ou en le générant"""
+    key = cache_key(data, fmt, box_size)
+    content = memory_cache.get(key)
+    if content is not None:
+        metrics.inc('cache_requests_total', cache='qrcode', result='memory_hit')
+        return content
+
+    path = _disk_path(key, fmt)
+    if path:
+        content = _read_disk(path)
+    if content is None:
+        metrics.inc('cache_requests_total', cache='qrcode', result='miss')
+        content = render_qrcode(data, fmt, box_size)
+        if path:
+            _write_disk(path, content)
+    else:
+        metrics.inc('cache_requests_total', cache='qrcode', result='disk_hit')
+
+    memory_cache.set(key, content)
+    return content
+
+
+# Pools de processus du worker, par nombre de processus : créés au premier export
+# et réutilisés ensuite, les fils ne démarrent (et n'importent Django) qu'une fois
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(workers):
+    """Pool de processus persistant de ce worker"""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # "spawn" : les processus fils n'héritent ni des threads ni des connexions SQL du worker
+            context = multiprocessing.get_context('spawn')
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return pool
+
+
+@atexit.register
+def shutdown_pools():
+    """Arrête les processus fils à la sortie du worker"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+def _discard_pool(workers, pool):
+    """Oublie un pool devenu inutilisable (processus fils tué) ; le suivant sera recréé"""
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_rendered(codes, fmt='png', box_size=DEFAULT_BOX_SIZE, workers=0, batch_size=64, pool_threshold=0):
+    """Génère une série de QR codes ``(nom, données)`` et produit ``(nom, contenu)`` dans l'ordre.
+
+    Avec ``workers > 1`` et au moins `pool_threshold` codes, la génération est
+    répartie sur le pool persistant du worker ; les tâches sont soumises par
+    lots pour ne garder en mémoire qu'un lot à la fois, quel que soit le nombre
+    de QR codes. Les petites séries sont générées sur place, avec le cache.
+    """
+    from concurrent.futures.process import BrokenProcessPool
+    from itertools import islice
+
+    codes = list(codes)
+    if workers <= 1 or len(codes) < pool_threshold:
+        for name, data in codes:
+            yield name, get_qrcode(data, fmt, box_size)
+        return
+
+    pool = get_pool(workers)
+    codes = iter(codes)
+    while batch := list(islice(codes, batch_size)):
+        try:
+            contents = list(pool.map(
+                render_qrcode,
+                [data for _, data in batch],
+                [fmt] * len(batch),
+                [box_size] * len(batch),
+                chunksize=max(1, len(batch) // workers),
+            ))
+        except BrokenProcessPool:
+            # Pool perdu : la suite de l'export est générée sur place
+            _discard_pool(workers, pool)
+            yield from iter_rendered([*batch, *codes], fmt, box_size)
+            return
+        yield from zip((name for name, _ in batch), contents)
+
+
+def stream_zip(entries):
+    """Produit une archive ZIP morceau par morceau à partir de ``(nom, contenu)``"""
+    buffer = StreamBuffer()
+    # Les PNG sont déjà compressés : stockage sans compression
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for name, content in entries:
+            archive.writestr(name, content)
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def _pdf_text(value):
+    """Chaîne littérale PDF en WinAnsiEncoding (police standard Helvetica)"""
+    value = value.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return b'(' + value.encode('cp1252', errors='replace') + b')'
+
+
+def stream_pdf(entries, labels=None, resolution=150):
+    """Produit un PDF d'une page par QR code (PNG), sous chaque code son libellé, page après page.
+
+    Chaque image est décodée en 1 bit par pixel et compressée (FlateDecode) ;
+    les positions des objets sont comptées au fil de l'envoi pour la table de
+    références finale : ni fichier temporaire ni document complet en mémoire.
+    """
+    import zlib
+
+    from PIL import Image
+
+    labels = labels or {}
+    scale = 72 / resolution
+    offsets = {}
+    position = 0
+    pages = []
+
+    def write(number, body, stream=None):
+        nonlocal position
+        offsets[number] = position
+        if stream is not None:
+            body += b'/Length %d>>stream\n' % len(stream) + stream + b'\nendstream'
+        chunk = b'%d 0 obj\n' % number + body + b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    # 1 : catalogue, 2 : arbre des pages (écrit en dernier), 3 : police
+    yield header + write(1, b'<</Type/Catalog/Pages 2 0 R>>') + write(
+        3, b'<</Type/Font/Subtype/Type1/BaseFont/Helvetica/Encoding/WinAnsiEncoding>>'
+    )
+    number = 3
+    for name, content in entries:
+        image = Image.open(io.BytesIO(content)).convert('1')
+        width, height = image.size
+        page_width, image_height, margin = width * scale, height * scale, 40 * scale
+        page, contents, xobject = number + 1, number + 2, number + 3
+        number += 3
+        pages.append(page)
+        drawing = b'q %.2f 0 0 %.2f 0 %.2f cm /Im0 Do Q BT /F1 10 Tf %.2f %.2f Td %s Tj ET' % (
+            page_width, image_height, margin, 10 * scale, 10 * scale, _pdf_text(labels.get(name, name)),
+        )
+        yield b''.join((
+            write(page, b'<</Type/Page/Parent 2 0 R/MediaBox[0 0 %.2f %.2f]/Contents %d 0 R'
+                        b'/Resources<</Font<</F1 3 0 R>>/XObject<</Im0 %d 0 R>>>>>>'
+                  % (page_width, image_height + margin, contents, xobject)),
+            write(contents, b'<<', drawing),
+            write(xobject, b'<</Type/XObject/Subtype/Image/Width %d/Height %d/ColorSpace/DeviceGray'
+                           b'/BitsPerComponent 1/Filter/FlateDecode' % (width, height),
+                  zlib.compress(image.tobytes())),
+        ))
+    kids = b' '.join(b'%d 0 R' % page for page in pages)
+    tree = write(2, b'<</Type/Pages/Kids[%s]/Count %d>>' % (kids, len(pages)))
+    xref = position
+    lines = [b'xref\n0 %d\n' % (number + 1), b'0000000000 65535 f \n']
+    lines += [b'%010d 00000 n \n' % offsets[i] for i in range(1, number + 1)]
+    yield tree + b''.join(lines) + b'trailer\n<</Size %d/Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n' % (number + 1, xref)
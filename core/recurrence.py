@@ -0,0 +1,141 @@
+"""Événements récurrents : occurrences calculées à la demande.
+
+Une série est une seule ligne ``Event`` portant une règle (``recurrence``,
+``recurrence_interval``, ``recurrence_until``) ; ses dates de début et de fin
+sont celles de la première occurrence. Les occurrences ne sont calculées que
+pour la fenêtre demandée, en heure locale (une réunion à 9 h reste à 9 h après
+un changement d'heure), en sautant directement à la première occurrence de la
+fenêtre : le coût est proportionnel à la fenêtre, pas à l'ancienneté de la série.
+
+Une occurrence n'est enregistrée (« matérialisée ») que lorsqu'elle a besoin
+d'une ligne à elle : inscriptions, annulation ou modification de cette seule
+occurrence. C'est alors un ``Event`` ordinaire (``series``, ``occurrence_start``)
+qui remplace l'occurrence calculée, et auquel s'appliquent inscriptions, liste
+d'attente, badges et contrôle d'accès.
+"""
+import calendar
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .models import Event
+
+DAILY, WEEKLY, MONTHLY = 'daily', 'weekly', 'monthly'
+
+
+def _local(value):
+    return timezone.localtime(value).replace(tzinfo=None)
+
+
+def _add_months(value, months):
+    """Même jour et même heure `months` mois plus tard, None si ce jour n'existe pas"""
+    year, month = divmod(value.month - 1 + months, 12)
+    year += value.year
+    if value.day > calendar.monthrange(year, month + 1)[1]:
+        return None
+    return value.replace(year=year, month=month + 1)
+
+
+def iter_occurrence_starts(series, start, end=None):
+    """Débuts des occurrences de `series` qui chevauchent ``[start, end)``, dans l'ordre"""
+    duration = series.end_datetime - series.start_datetime
+    # Une occurrence chevauche la fenêtre si elle finit après son début
+    lower = start - duration
+    first = _local(series.start_datetime)
+    interval = series.recurrence_interval or 1
+
+    if series.recurrence == MONTHLY:
+        months = (_local(lower).year - first.year) * 12 + _local(lower).month - first.month
+        n = max(0, months // interval - 1)
+
+        def candidate(n):
+            return _add_months(first, n * interval)
+    else:
+        step = timedelta(days=interval * (7 if series.recurrence == WEEKLY else 1))
+        n = max(0, (_local(lower) - first) // step - 1)
+
+        def candidate(n):
+            return first + n * step
+
+    while True:
+        naive = candidate(n)
+        n += 1
+        if naive is None:
+            continue
+        occurrence = timezone.make_aware(naive)
+        if (end is not None and occurrence >= end) or (
+            series.recurrence_until is not None and occurrence > series.recurrence_until
+        ):
+            return
+        if occurrence > lower:
+            yield occurrence
+
+
+def find_occurrence(series, timestamp):
+    """Début exact de l'occurrence identifiée par `timestamp` (secondes), None si la règle ne le prévoit pas"""
+    moment = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+    for occurrence in iter_occurrence_starts(series, moment, moment + timedelta(seconds=1)):
+        if int(occurrence.timestamp()) == timestamp:
+            return occurrence
+    return None
+
+
+def next_occurrence(series, after=None):
+    """Première occurrence non terminée après `after` (maintenant par défaut)"""
+    return next(iter_occurrence_starts(series, after or timezone.now()), None)
+
+
+def occurrence(series, start):
+    """Occurrence calculée (non enregistrée) de `series` débutant à `start`"""
+    return Event(
+        title=series.title,
+        description=series.description,
+        location=series.location,
+        start_datetime=start,
+        end_datetime=start + (series.end_datetime - series.start_datetime),
+        max_participants=series.max_participants,
+        organizer=series.organizer,
+        status=series.status,
+        series=series,
+        occurrence_start=start,
+    )
+
+
+def materialize(series, start, **fields):
+    """Occurrence enregistrée de `series` débutant à `start` (créée si besoin)"""
+    template = occurrence(series, start)
+    defaults = {
+        field.name: getattr(template, field.name)
+        for field in Event._meta.concrete_fields
+        if not field.primary_key and field.name not in ('series', 'occurrence_start')
+    }
+    defaults.update(fields)
+    event, created = Event.objects.get_or_create(series=series, occurrence_start=start, defaults=defaults)
+    return event
+
+
+def expand(series_list, start, end):
+    """Occurrences calculées des séries dans ``[start, end)``, hors occurrences matérialisées.
+
+    Une seule requête pour toutes les séries : les occurrences enregistrées
+    (publiées, annulées ou modifiées) sont servies comme des événements
+    ordinaires et ne doivent pas apparaître deux fois.
+    """
+    series_list = list(series_list)
+    if not series_list:
+        return []
+    longest = max(series.end_datetime - series.start_datetime for series in series_list)
+    materialized = set(
+        Event.objects.filter(
+            series__in=series_list,
+            occurrence_start__gt=start - longest,
+            occurrence_start__lt=end,
+        ).values_list('series_id', 'occurrence_start')
+    )
+    occurrences = []
+    for series in series_list:
+        for occurrence_start in iter_occurrence_starts(series, start, end):
+            if (series.pk, occurrence_start) not in materialized:
+                occurrences.append(occurrence(series, occurrence_start))
+    return occurrences
+
@@ -0,0 +1,172 @@
+"""Moteur d'inscription aux événements.
+
+La place est réservée par un UPDATE conditionnel sur ``Event.accepted_count``
+(voir ``Participation.save``) exécuté dans la même transaction que l'écriture
+de la participation : deux inscriptions simultanées ne peuvent pas obtenir la
+dernière place, quel que soit le nombre de requêtes concurrentes.
+
+Lorsque l'événement est complet, l'inscription rejoint une liste d'attente
+FIFO : participation ``pending`` numérotée par le compteur
+``Event.waitlist_tail``. Toute place libérée promeut la tête de file dans la
+transaction qui la libère (voir ``Event.promote_waitlist``).
+
+Une inscription est refusée si l'utilisateur est déjà inscrit (ou en
+attente) à un autre événement sur le même créneau (voir core/conflicts.py).
+Le contrôle a lieu dans la transaction d'inscription, après verrouillage de
+la ligne de l'utilisateur : deux inscriptions simultanées du même
+utilisateur à des créneaux qui se chevauchent sont sérialisées et la
+seconde voit la première.
+"""
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F
+
+from . import conflicts, metrics
+from .models import Event, EventFull, Participation
+
+# Résultats possibles d'une inscription
+ACCEPTED = 'accepted'
+REACTIVATED = 'reactivated'
+WAITLISTED = 'waitlisted'
+ALREADY_REGISTERED = 'already_registered'
+PENDING = 'pending'
+REJECTED = 'rejected'
+FULL = 'full'
+CLOSED = 'closed'
+ORGANIZER = 'organizer'
+CONFLICT = 'conflict'
+
+# Résultats possibles d'une désinscription
+CANCELLED = 'cancelled'
+NOT_REGISTERED = 'not_registered'
+
+# Nouvelles tentatives en cas de verrou (SQLite) ou de conflit de sérialisation
+MAX_ATTEMPTS = 50
+MAX_BACKOFF = 0.1
+
+
+def with_retries(func, *args):
+    """Exécute une transaction en la rejouant en cas d'erreur de verrouillage transitoire"""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return func(*args)
+        except OperationalError:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            # Attente exponentielle aléatoire avant de rejouer la transaction
+            time.sleep(random.uniform(0, min(MAX_BACKOFF, 0.005 * 2 ** attempt)))
+
+
+def register_participant(event, user, waitlist=True):
+    """Inscrit un utilisateur à un événement et retourne le résultat de l'inscription"""
+    if event.organizer_id == user.pk:
+        outcome = ORGANIZER
+    elif event.status != 'published' or event.is_past():
+        outcome = CLOSED
+    else:
+        outcome = with_retries(_register, event, user, waitlist)
+    metrics.inc('registrations_total', action='register', outcome=outcome)
+    return outcome
+
+
+def cancel_participation(event, user):
+    """Annule la participation d'un utilisateur ; la place libérée profite à la liste d'attente"""
+    outcome = with_retries(_cancel, event, user)
+    metrics.inc('registrations_total', action='cancel', outcome=outcome)
+    return outcome
+
+
+def waitlist_rank(participation):
+    """Rang (à partir de 1) d'une participation dans la liste d'attente de son événement"""
+    if not participation.is_waitlisted():
+        return None
+    return Participation.objects.filter(
+        event_id=participation.event_id,
+        status='pending',
+        queue_position__lt=participation.queue_position,
+    ).count() + 1
+
+
+def _next_queue_position(event):
+    """Attribue la position suivante de la liste d'attente (à appeler dans une transaction)"""
+    Event.objects.filter(pk=event.pk).update(waitlist_tail=F('waitlist_tail') + 1)
+    return Event.objects.filter(pk=event.pk).values_list('waitlist_tail', flat=True).get()
+
+
+def _accept_or_enqueue(event, participation, waitlist):
+    """Tente d'accepter la participation, sinon la place en fin de liste d'attente"""
+    participation.status = 'accepted'
+    participation.queue_position = None
+    try:
+        with transaction.atomic():
+            participation.save()
+        return True
+    except EventFull:
+        if not waitlist:
+            raise
+    participation.status = 'pending'
+    participation.queue_position = _next_queue_position(event)
+    participation.save()
+    return False
+
+
+def _has_conflict(event, user):
+    """L'utilisateur est-il déjà engagé sur le créneau de l'événement ? (une requête indexée)"""
+    return conflicts.participant_conflicts(
+        user, event.start_datetime, event.end_datetime, exclude=event.pk
+    ).exists()
+
+
+def _register(event, user, waitlist):
+    """Une tentative d'inscription, dans une seule transaction"""
+    try:
+        with transaction.atomic():
+            # Verrou sur l'utilisateur : ses inscriptions concurrentes attendent la fin de
+            # celle-ci avant de contrôler leur créneau (sans effet sous SQLite, où la
+            # première écriture verrouille la base et la transaction perdante est rejouée)
+            get_user_model().objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True).first()
+            if _has_conflict(event, user):
+                return CONFLICT
+
+            participation = Participation.objects.filter(event=event, participant=user).first()
+
+            if participation is None:
+                try:
+                    with transaction.atomic():
+                        participation = Participation(event=event, participant=user)
+                        accepted = _accept_or_enqueue(event, participation, waitlist)
+                except IntegrityError:
+                    # Inscription concurrente du même utilisateur
+                    return ALREADY_REGISTERED
+                return ACCEPTED if accepted else WAITLISTED
+
+            if participation.status == 'cancelled':
+                accepted = _accept_or_enqueue(event, participation, waitlist)
+                return REACTIVATED if accepted else WAITLISTED
+
+            return {
+                'accepted': ALREADY_REGISTERED,
+                'pending': PENDING,
+                'rejected': REJECTED,
+            }.get(participation.status, ALREADY_REGISTERED)
+    except EventFull:
+        return FULL
+
+
+def _cancel(event, user):
+    """Une tentative de désinscription, dans une seule transaction"""
+    with transaction.atomic():
+        participation = Participation.objects.filter(
+            event=event,
+            participant=user,
+            status__in=['accepted', 'pending'],
+        ).first()
+        if participation is None:
+            return NOT_REGISTERED
+        participation.status = 'cancelled'
+        participation.queue_position = None
+        participation.save(update_fields=['status', 'queue_position', 'updated_at'])
+        return CANCELLED
@@ -0,0 +1,129 @@
+"""Génération déterministe de données de test (commande ``seed_events``).
+
+Les événements sont produits par lots ; chaque lot est tiré d'un générateur
+aléatoire initialisé par ``(graine, numéro du lot)``, si bien que le résultat
+ne dépend ni du nombre de processus ni de l'ordre d'exécution. Les lots ne
+contiennent que des tuples Python (décalages en minutes par rapport à une
+date de référence, indices d'utilisateurs) : ils peuvent être générés dans
+un pool de processus sans initialiser Django, puis insérés par
+``bulk_create`` dans le processus principal.
+"""
+import math
+import random
+
+EVENT_TITLES = [
+    "Formation Django Avancé",
+    "Réunion d'équipe hebdomadaire",
+    "Atelier de développement web",
+    "Présentation du projet Q4",
+    "Session de code review",
+    "Formation sécurité informatique",
+    "Brainstorming nouveaux produits",
+    "Conférence sur l'IA",
+    "Workshop Tailwind CSS",
+    "Meetup développeurs locaux",
+    "Séminaire gestion de projet",
+    "Entraînement présentation",
+    "Révision stratégique",
+    "Planning sprint suivant",
+    "Formation PostgreSQL",
+]
+
+LOCATIONS = [
+    "Salle de conférence A",
+    "Bureau 201",
+    "Espace coworking",
+    "Amphithéâtre principal",
+    "Salle de réunion virtuelle",
+    "Cafétéria",
+    "Lab informatique",
+    "Salle de formation",
+    "Online (Zoom)",
+    "Google Meet",
+]
+
+# Fin de la description de chaque événement généré : seuls ceux-là sont supprimés
+# d'une exécution à l'autre, pas ceux créés à la main par testuser
+GENERATED_MARK = 'Ceci est un événement de test créé automatiquement pour démontrer le fonctionnement du calendrier.'
+
+# Part des inscriptions annulées, et des participants acceptés présents aux événements passés
+CANCELLED_RATE = 0.05
+ATTENDANCE_RATE = 0.8
+
+
+def participant_count(rng, users, density):
+    """Nombre d'inscrits d'un événement : loi binomiale approchée par une loi normale"""
+    mean = users * density
+    deviation = math.sqrt(mean * (1 - density))
+    return min(users, max(0, round(rng.gauss(mean, deviation))))
+
+
+def generate_chunk(seed, chunk, first, count, users, density, days, past_days, capacity):
+    """Génère ``count`` événements du lot ``chunk``, numérotés à partir de ``first``.
+
+    Chaque événement est un tuple ``(titre, description, lieu, début, durée,
+    capacité, organisateur, participations)`` où début et durée sont en minutes
+    par rapport à la date de référence, l'organisateur un indice d'utilisateur
+    et chaque participation un tuple ``(utilisateur, statut, position en liste
+    d'attente, présence en minutes ou None)``.
+    """
+    rng = random.Random(f'{seed}:{chunk}')
+    events = []
+    for position in range(count):
+        day = rng.randint(-past_days, days)
+        start = day * 1440 + rng.randint(8, 18) * 60 + rng.choice([0, 15, 30, 45])
+        duration = rng.randint(1, 3) * 60
+        max_participants = rng.randint(*capacity)
+        organizer = rng.randrange(users)
+
+        participations = []
+        accepted = waitlisted = 0
+        for user in rng.sample(range(users), participant_count(rng, users, density)):
+            if user == organizer:
+                continue
+            if rng.random() < CANCELLED_RATE:
+                participations.append((user, 'cancelled', None, None))
+            elif accepted < max_participants:
+                accepted += 1
+                checked_in = None
+                if day < 0 and rng.random() < ATTENDANCE_RATE:
+                    checked_in = start + rng.randint(-15, 30)
+                participations.append((user, 'accepted', None, checked_in))
+            else:
+                waitlisted += 1
+                participations.append((user, 'pending', waitlisted, None))
+
+        events.append((
+            rng.choice(EVENT_TITLES),
+            f"Description de l'événement {first + position}. {GENERATED_MARK}",
+            rng.choice(LOCATIONS),
+            start,
+            duration,
+            max_participants,
+            organizer,
+            participations,
+        ))
+    return events
+
+
+def _generate_chunk(args):
+    return generate_chunk(*args)
+
+
+def iter_chunks(seed, events, batch_size, users, density, days, past_days, capacity, workers=0):
+    """Produit les lots d'événements dans l'ordre, éventuellement générés dans un pool de processus"""
+    tasks = []
+    for chunk in range(math.ceil(events / batch_size)):
+        count = min(batch_size, events - chunk * batch_size)
+        tasks.append((seed, chunk, chunk * batch_size + 1, count, users, density, days, past_days, capacity))
+
+    if workers <= 1:
+        for task in tasks:
+            yield _generate_chunk(task)
+        return
+
+    import multiprocessing
+
+    # "spawn" : les processus fils n'héritent pas des connexions SQL du processus principal
+    with multiprocessing.get_context('spawn').Pool(workers) as pool:
+        yield from pool.imap(_generate_chunk, tasks)
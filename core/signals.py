@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import ics
+from .cache import bump_feed_version
+from .models import Event, Participation, UserStats
+from .stats import STATUS_FIELDS, add_attendance, add_to_stats
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=Participation)
+@receiver(post_delete, sender=Participation)
+def invalidate_events_feed(sender, **kwargs):
+    """Invalide le cache du calendrier à chaque modification d'événement ou de participation"""
+    bump_feed_version()
+
+
+@receiver(post_delete, sender=Participation)
+def release_accepted_seat(sender, instance, **kwargs):
+    """Décrémente le compteur de l'événement à la suppression d'une participation acceptée"""
+    if getattr(instance, '_loaded_status', instance.status) == 'accepted':
+        Event.objects.filter(pk=instance.event_id).update(accepted_count=F('accepted_count') - 1)
+        Event(pk=instance.event_id).promote_waitlist()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    """Crée la ligne de statistiques (vide) de chaque nouvel utilisateur"""
+    if created and not raw:
+        UserStats.objects.get_or_create(user_id=instance.pk)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_organizer_names(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Le nom des organisateurs figure dans les flux : leur cache est invalidé à chaque modification"""
+    # Connexion (seul last_login enregistré) : rien d'affiché ne change
+    if created or raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    ics.bump_organizers_version()
+    bump_feed_version()
+
+
+@receiver(post_save, sender=Event)
+def count_organized_event(sender, instance, created, raw=False, **kwargs):
+    """Compte le nouvel événement dans les statistiques de son organisateur"""
+    # Occurrence d'une série : la série est déjà comptée
+    if created and not raw and instance.series_id is None:
+        add_to_stats(instance.organizer_id, events_organized=1)
+
+
+@receiver(post_delete, sender=Event)
+def uncount_organized_event(sender, instance, **kwargs):
+    """Retire l'événement supprimé des statistiques de son organisateur"""
+    if instance.series_id is None:
+        add_to_stats(instance.organizer_id, events_organized=-1)
+
+
+@receiver(post_save, sender=Participation)
+def count_participation(sender, instance, created, raw=False, **kwargs):
+    """Reporte la création ou le changement de statut d'une participation sur les statistiques"""
+    if raw:
+        return
+    # `_loaded_status` est encore le statut précédent (mis à jour après le signal)
+    previous = None if created else getattr(instance, '_loaded_status', instance.status)
+    if previous == instance.status:
+        return
+    deltas = {STATUS_FIELDS[instance.status]: 1}
+    if previous is None:
+        deltas['participations'] = 1
+    else:
+        deltas[STATUS_FIELDS[previous]] = -1
+    add_to_stats(instance.participant_id, **deltas)
+
+
+@receiver(post_delete, sender=Participation)
+def uncount_participation(sender, instance, **kwargs):
+    """Retire la participation supprimée (et sa présence éventuelle) des statistiques"""
+    status = getattr(instance, '_loaded_status', instance.status)
+    add_to_stats(instance.participant_id, participations=-1, **{STATUS_FIELDS[status]: -1})
+    if instance.checked_in_at is not None:
+        add_attendance(instance.participant_id, instance.event_id, sign=-1)
@@ -0,0 +1,138 @@
+"""Statistiques agrégées par utilisateur (table ``UserStats``).
+
+Les compteurs sont mis à jour de façon incrémentale par les signaux
+(voir core/signals.py) au moyen d'UPDATE ``F()`` : la page de profil et les
+classements lisent les statistiques par une simple recherche sur la clé
+primaire. ``rebuild_user_stats`` les recalcule entièrement depuis les tables
+Event et Participation (commande ``rebuild_profile_stats``) : rattrapage des
+données existantes, des imports en masse ou d'éventuelles dérives.
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, DurationField, ExpressionWrapper, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Event, Participation, UserStats
+
+STATUS_FIELDS = {
+    'pending': 'pending_participations',
+    'accepted': 'accepted_participations',
+    'rejected': 'rejected_participations',
+    'cancelled': 'cancelled_participations',
+}
+
+COUNTER_FIELDS = ['events_organized', 'participations', *STATUS_FIELDS.values(), 'events_attended']
+STAT_FIELDS = COUNTER_FIELDS + ['time_attended']
+
+EVENT_DURATION = ExpressionWrapper(
+    F('event__end_datetime') - F('event__start_datetime'),
+    output_field=DurationField(),
+)
+
+
+def get_user_stats(user):
+    """Statistiques de l'utilisateur (recherche par clé primaire, calculées au premier accès)"""
+    stats = UserStats.objects.filter(pk=user.pk).first()
+    if stats is None:
+        rebuild_user_stats([user.pk])
+        stats = UserStats.objects.get(pk=user.pk)
+    return stats
+
+
+def add_to_stats(user_id, **deltas):
+    """Applique des variations aux compteurs d'un utilisateur, sans lecture préalable"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if deltas:
+        UserStats.objects.filter(pk=user_id).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+
+
+def add_attendance(user_id, event_id, sign=1):
+    """Ajoute (ou retire) une présence et la durée de l'événement, en un seul UPDATE.
+
+    ``user_id`` peut être une sous-requête : le scan de présence ne connaît que la participation.
+    """
+    duration = Coalesce(
+        Subquery(
+            Event.objects.filter(pk=event_id).values(
+                duration=ExpressionWrapper(F('end_datetime') - F('start_datetime'), output_field=DurationField())
+            ),
+            output_field=DurationField(),
+        ),
+        Value(timedelta(0)),
+    )
+    time_attended = F('time_attended') + duration if sign > 0 else F('time_attended') - duration
+    UserStats.objects.filter(pk=user_id).update(
+        events_attended=F('events_attended') + sign,
+        time_attended=time_attended,
+    )
+
+
+def _count(queryset, related_field, **filters):
+    """Sous-requête scalaire : nombre de lignes de `queryset` liées à l'utilisateur courant"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{related_field: OuterRef('pk')}, **filters)
+            .order_by()
+            .values(related_field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def stat_expressions():
+    """Expressions calculant chaque statistique depuis les tables sources"""
+    attended = Participation.objects.filter(participant=OuterRef('pk'), checked_in_at__isnull=False).order_by()
+    expressions = {
+        # Une série compte pour un événement, ses occurrences enregistrées ne comptent pas
+        'events_organized': _count(Event.objects, 'organizer', series__isnull=True),
+        'participations': _count(Participation.objects, 'participant'),
+        'events_attended': _count(Participation.objects, 'participant', checked_in_at__isnull=False),
+        'time_attended': Coalesce(
+            Subquery(
+                attended.values('participant').annotate(total=Sum(EVENT_DURATION)).values('total'),
+                output_field=DurationField(),
+            ),
+            Value(timedelta(0)),
+        ),
+    }
+    for status, field in STATUS_FIELDS.items():
+        expressions[field] = _count(Participation.objects, 'participant', status=status)
+    return expressions
+
+
+def rebuild_user_stats(user_ids=None, batch_size=1000):
+    """Recalcule les statistiques des utilisateurs donnés (tous par défaut) et retourne leur nombre"""
+    users = get_user_model().objects.order_by('pk')
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    # Alias préfixés : `participations` est déjà le related_name de Participation
+    rows = users.annotate(
+        **{f'stat_{field}': expression for field, expression in stat_expressions().items()}
+    ).values_list('pk', *(f'stat_{field}' for field in STAT_FIELDS))
+
+    rebuilt = 0
+    batch = []
+    for pk, *values in rows.iterator(chunk_size=batch_size):
+        batch.append(UserStats(user_id=pk, **dict(zip(STAT_FIELDS, values))))
+        if len(batch) >= batch_size:
+            rebuilt += _upsert(batch)
+            batch = []
+    if batch:
+        rebuilt += _upsert(batch)
+    return rebuilt
+
+
+def _upsert(batch):
+    UserStats.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=STAT_FIELDS + ['updated_at'],
+    )
+    return len(batch)
@@ -1,3 +1,1896 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import analytics, checkin, conflicts, exports, ics, importing, jsonstream, metrics, qrcodes, recurrence, registration, seeding, stats, views
+from .cache import get_feed_cache
+from .models import Event, EventFull, Participation, UserStats
+
+User = get_user_model()
+
+
+def make_event(organizer, days=1, **kwargs):
+    """Crée un événement publié commençant dans `days` jours"""
+    start = timezone.now() + timedelta(days=days)
+    defaults = {
+        'title': 'Événement',
+        'start_datetime': start,
+        'end_datetime': start + timedelta(hours=2),
+        'organizer': organizer,
+        'max_participants': 10,
+    }
+    defaults.update(kwargs)
+    return Event.objects.create(**defaults)
+
+
+class EventsJsonTests(TestCase):
+    """Tests de l'API JSON du calendrier"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='secret')
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.other = User.objects.create_user(username='carol', password='secret')
+
+    def setUp(self):
+        get_feed_cache().clear()
+
+    def add_events(self, count):
+        for i in range(count):
+            event = make_event(self.organizer, days=i + 1)
+            Participation.objects.create(event=event, participant=self.other, status='accepted')
+            if i % 2 == 0:
+                Participation.objects.create(event=event, participant=self.user, status='accepted')
+        make_event(self.user, days=2)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('events_json'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_query_count_does_not_grow_with_events(self):
+        self.client.force_login(self.user)
+        self.add_events(2)
+        small_count, small_data = self.count_queries()
+        self.add_events(20)
+        large_count, large_data = self.count_queries()
+        self.assertEqual(len(large_data), len(small_data) + 21)
+        self.assertEqual(small_count, large_count)
+
+    def test_anonymous_query_count_is_constant(self):
+        self.add_events(3)
+        # Validateurs de la fenêtre, événements simples puis séries récurrentes
+        with self.assertNumQueries(3):
+            self.client.get(reverse('events_json'))
+
+    def test_colours_and_available_spots(self):
+        self.client.force_login(self.user)
+        self.add_events(2)
+        data = {item['id']: item for item in self.count_queries()[1]}
+        mine = Event.objects.get(organizer=self.user)
+        participating = Event.objects.filter(participations__participant=self.user).first()
+        other = Event.objects.filter(organizer=self.organizer).exclude(pk=participating.pk).first()
+        self.assertEqual(data[mine.id]['backgroundColor'], '#10b981')
+        self.assertEqual(data[participating.id]['backgroundColor'], '#8b5cf6')
+        self.assertEqual(data[other.id]['backgroundColor'], '#3b82f6')
+        self.assertEqual(data[participating.id]['extendedProps']['available_spots'], 8)
+        self.assertEqual(data[other.id]['organizer'], 'bob')
+
+
+class EventsFeedCacheTests(TestCase):
+    """Tests du cache versionné du flux d'événements"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='secret')
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.event = make_event(cls.organizer)
+
+    def setUp(self):
+        get_feed_cache().clear()
+
+    def test_repeated_window_is_served_from_cache(self):
+        now = timezone.now()
+        params = {'start': (now - timedelta(days=1)).isoformat(), 'end': (now + timedelta(days=30)).isoformat()}
+        first = self.client.get(reverse('events_json'), params)
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('events_json'), params)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(len(first.json()), 1)
+
+    def test_window_is_bounded(self):
+        make_event(self.organizer, days=200)
+        params = {'start': timezone.now().isoformat(), 'end': (timezone.now() + timedelta(days=365)).isoformat()}
+        response = self.client.get(reverse('events_json'), params)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('92 jours', response.json()['error'])
+        self.assertEqual([event['id'] for event in self.client.get(reverse('events_json')).json()], [self.event.id])
+
+    def test_participation_change_invalidates_cache(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('events_json')).json()[0]['backgroundColor'], '#3b82f6')
+        Participation.objects.create(event=self.event, participant=self.user, status='accepted')
+        data = self.client.get(reverse('events_json')).json()
+        self.assertEqual(data[0]['backgroundColor'], '#8b5cf6')
+        self.assertEqual(data[0]['extendedProps']['available_spots'], 9)
+
+    def test_colours_are_cached_per_user(self):
+        self.client.force_login(self.organizer)
+        self.assertEqual(self.client.get(reverse('events_json')).json()[0]['backgroundColor'], '#10b981')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('events_json')).json()[0]['backgroundColor'], '#3b82f6')
+
+
+@override_settings(EVENTS_MAX_WINDOW_DAYS=30, EVENTS_API_PAGE_SIZE=2, EVENTS_API_MAX_PAGE_SIZE=3)
+class EventsListTests(TestCase):
+    """Tests de la liste paginée par curseur"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        start = timezone.now() + timedelta(days=1)
+        # Deux événements à la même heure : le curseur départage par identifiant
+        cls.events = [make_event(cls.organizer, days=1, start_datetime=start) for _ in range(2)]
+        cls.events += [make_event(cls.organizer, days=days) for days in (2, 3, 4)]
+        make_event(cls.organizer, days=60)
+        make_event(cls.organizer, days=5, status='draft')
+
+    def fetch_all(self, params):
+        ids, cursor = [], None
+        while True:
+            data = self.client.get(reverse('events_list'), {**params, **({'cursor': cursor} if cursor else {})}).json()
+            ids += [event['id'] for event in data['results']]
+            cursor = data['next']
+            if cursor is None:
+                return ids
+
+    def test_pages_follow_start_then_id(self):
+        self.assertEqual(self.fetch_all({}), [event.id for event in self.events])
+        self.assertEqual(self.fetch_all({'limit': 1}), [event.id for event in self.events])
+
+    def test_page_size_is_capped(self):
+        data = self.client.get(reverse('events_list'), {'limit': 1000}).json()
+        self.assertEqual(len(data['results']), 3)
+        self.assertIsNotNone(data['next'])
+
+    def test_window_is_mandatory_and_bounded(self):
+        start = timezone.now()
+        params = {'start': start.isoformat(), 'end': (start + timedelta(days=31)).isoformat()}
+        self.assertEqual(self.client.get(reverse('events_list'), params).status_code, 400)
+        params['end'] = start.isoformat()
+        self.assertEqual(self.client.get(reverse('events_list'), params).status_code, 400)
+        data = self.client.get(reverse('events_list'), {'start': start.isoformat()}).json()
+        self.assertEqual(data['end'], (start + timedelta(days=30)).isoformat())
+
+    def test_feed_rejects_the_same_windows(self):
+        start = timezone.now()
+        params = {'start': start.isoformat(), 'end': (start + timedelta(days=31)).isoformat()}
+        self.assertEqual(self.client.get(reverse('events_json'), params).status_code, 400)
+        params['end'] = start.isoformat()
+        self.assertEqual(self.client.get(reverse('events_json'), params).status_code, 400)
+        params['end'] = (start + timedelta(days=30)).isoformat()
+        self.assertEqual(self.client.get(reverse('events_json'), params).status_code, 200)
+
+    def test_cursor_is_signed_and_keeps_the_window(self):
+        first = self.client.get(reverse('events_list'), {'limit': 1}).json()
+        self.assertEqual(self.client.get(reverse('events_list'), {'cursor': first['next'] + 'x'}).status_code, 400)
+        second = self.client.get(reverse('events_list'), {'cursor': first['next'], 'start': '2000-01-01'}).json()
+        self.assertEqual((second['start'], second['end']), (first['start'], first['end']))
+        self.assertEqual(second['results'][0]['id'], self.events[1].id)
+
+    def test_query_count_does_not_depend_on_page(self):
+        first = self.client.get(reverse('events_list')).json()
+        with self.assertNumQueries(1):
+            self.client.get(reverse('events_list'), {'cursor': first['next']})
+
+
+class StreamingJsonTests(TestCase):
+    """Tests du flux JSON diffusé"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='secret')
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        for i in range(7):
+            event = make_event(cls.organizer, days=i + 1, title=f'Événement "{i}"')
+            if i % 3 == 0:
+                Participation.objects.create(event=event, participant=cls.user, status='accepted')
+
+    def setUp(self):
+        get_feed_cache().clear()
+        self.client.force_login(self.user)
+
+    @override_settings(EVENTS_STREAM_CHUNK_SIZE=2)
+    def test_stream_matches_buffered_response(self):
+        buffered = self.client.get(reverse('events_json')).json()
+        get_feed_cache().clear()
+        response = self.client.get(reverse('events_json'), {'stream': 'true'})
+        self.assertTrue(response.streaming)
+        self.assertIn('ETag', response)
+        streamed = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(streamed, buffered)
+        self.assertEqual(len(streamed), 7)
+
+    def test_stream_covers_a_whole_year(self):
+        late = make_event(self.organizer, days=300)
+        start = timezone.now()
+        params = {'stream': 'true', 'start': start.isoformat(), 'end': (start + timedelta(days=365)).isoformat()}
+        response = self.client.get(reverse('events_json'), params)
+        streamed = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(streamed), 8)
+        self.assertIn(late.id, [event['id'] for event in streamed])
+        params['end'] = (start + timedelta(days=401)).isoformat()
+        self.assertEqual(self.client.get(reverse('events_json'), params).status_code, 400)
+
+    def test_stream_honours_conditional_requests(self):
+        etag = self.client.get(reverse('events_json'), {'stream': 'true'})['ETag']
+        response = self.client.get(reverse('events_json'), {'stream': 'true'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(EVENTS_STREAM_CHUNK_SIZE=2)
+    def test_compact_format_matches_full_format(self):
+        full = self.client.get(reverse('events_json')).json()
+        response = self.client.get(reverse('events_json'), {'format': 'compact'})
+        compact = response.json()
+        self.assertLess(len(response.content), len(json.dumps(full)) / 2)
+        self.assertEqual(compact['organizers'], ['bob'])
+        rows = [dict(zip(compact['fields'], row)) for row in compact['events']]
+        self.assertEqual([row['id'] for row in rows], [event['id'] for event in full])
+        for row, event in zip(rows, full):
+            self.assertEqual(views.KIND_COLORS[row['kind']], event['backgroundColor'])
+            self.assertEqual(compact['organizers'][row['organizer']], event['organizer'])
+            self.assertEqual(row['start'], int(timezone.datetime.fromisoformat(event['start']).timestamp()))
+        get_feed_cache().clear()
+        streamed = self.client.get(reverse('events_json'), {'format': 'compact', 'stream': 'true'})
+        self.assertEqual(json.loads(b''.join(streamed.streaming_content)), compact)
+
+    def test_json_array_batches(self):
+        items = [{'id': i, 'title': 'é"'} for i in range(5)]
+        chunks = list(jsonstream.iter_json_array(items, batch_size=2))
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(json.loads(b''.join(chunks)), items)
+        self.assertEqual(b''.join(jsonstream.iter_json_array([])), b'[]')
+
+    def test_stdlib_fallback_matches_orjson(self):
+        value = [{'id': 1, 'title': 'Réunion "équipe"', 'spots': None}]
+        with mock.patch.object(jsonstream, 'ORJSON_AVAILABLE', False):
+            fallback = jsonstream.dumps(value)
+        self.assertEqual(json.loads(fallback), value)
+        if jsonstream.ORJSON_AVAILABLE:
+            self.assertEqual(fallback, jsonstream.dumps(value))
+
+
+class RecurringEventTests(TestCase):
+    """Tests des séries récurrentes et de leurs occurrences"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='secret')
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        start = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        cls.series = make_event(
+            cls.organizer,
+            title='Réunion hebdomadaire',
+            start_datetime=start,
+            end_datetime=start + timedelta(hours=1),
+            recurrence='weekly',
+            recurrence_until=start + timedelta(days=363),
+        )
+
+    def setUp(self):
+        get_feed_cache().clear()
+
+    def window(self, days=28):
+        start = self.series.start_datetime - timedelta(hours=1)
+        return {'start': start.isoformat(), 'end': (start + timedelta(days=days)).isoformat()}
+
+    def feed(self, **params):
+        return self.client.get(reverse('events_json'), {**self.window(), **params}).json()
+
+    def occurrence_url(self, name, weeks):
+        timestamp = int((self.series.start_datetime + timedelta(weeks=weeks)).timestamp())
+        return reverse(name, args=[self.series.id, timestamp])
+
+    def test_window_is_expanded_from_a_single_row(self):
+        data = self.feed()
+        self.assertEqual(len(data), 4)
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertEqual(data[1]['url'], self.occurrence_url('event_occurrence', 1))
+        self.assertEqual(data[1]['start'], (self.series.start_datetime + timedelta(weeks=1)).isoformat())
+        # Le coût ne dépend que de la fenêtre, pas de l'ancienneté de la série
+        window = {'start': (self.series.start_datetime + timedelta(weeks=40)).isoformat()}
+        window['end'] = (self.series.start_datetime + timedelta(weeks=44)).isoformat()
+        self.assertEqual(len(self.client.get(reverse('events_json'), window).json()), 4)
+        window['start'] = (self.series.start_datetime + timedelta(weeks=52)).isoformat()
+        window['end'] = (self.series.start_datetime + timedelta(weeks=56)).isoformat()
+        self.assertEqual(self.client.get(reverse('events_json'), window).json(), [])
+
+    def test_participation_materializes_one_occurrence(self):
+        self.client.force_login(self.user)
+        self.client.post(self.occurrence_url('event_occurrence_participate', 2))
+        self.client.post(self.occurrence_url('event_occurrence_participate', 2))
+        occurrence = Event.objects.get(series=self.series)
+        self.assertEqual(occurrence.start_datetime, self.series.start_datetime + timedelta(weeks=2))
+        self.assertEqual(occurrence.accepted_count, 1)
+        self.assertEqual(Participation.objects.get().event, occurrence)
+        self.assertRedirects(self.client.get(self.occurrence_url('event_occurrence', 2)), reverse('event_detail', args=[occurrence.id]))
+
+        data = self.feed()
+        self.assertEqual(len(data), 4)
+        self.assertEqual([item['backgroundColor'] for item in data if item['id'] == occurrence.id], ['#8b5cf6'])
+        self.assertEqual(UserStats.objects.get(user=self.organizer).events_organized, 1)
+
+    def test_organizer_cancels_a_single_occurrence(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post(self.occurrence_url('event_occurrence_cancel', 1)).status_code, 404)
+        self.client.force_login(self.organizer)
+        self.client.post(self.occurrence_url('event_occurrence_cancel', 1))
+        starts = [item['start'] for item in self.feed()]
+        self.assertEqual(len(starts), 3)
+        self.assertNotIn((self.series.start_datetime + timedelta(weeks=1)).isoformat(), starts)
+        self.assertEqual(self.client.get(self.occurrence_url('event_occurrence', 1)).status_code, 404)
+
+    def test_unknown_occurrence_and_series_page(self):
+        timestamp = int((self.series.start_datetime + timedelta(days=3)).timestamp())
+        self.assertEqual(self.client.get(reverse('event_occurrence', args=[self.series.id, timestamp])).status_code, 404)
+        response = self.client.get(reverse('event_detail', args=[self.series.id]))
+        self.assertRedirects(response, self.occurrence_url('event_occurrence', 0))
+        self.assertContains(self.client.get(response.url), 'Réunion hebdomadaire')
+        self.assertEqual(self.client.post(reverse('event_participate', args=[self.series.id])).status_code, 302)
+        self.assertFalse(Participation.objects.exists())
+
+    def test_filters_and_compact_feed(self):
+        self.client.force_login(self.organizer)
+        self.assertEqual(len(self.feed(filter='mine')), 4)
+        self.assertEqual(self.feed(filter='participating'), [])
+        compact = self.feed(format='compact')
+        self.assertEqual(compact['events'][0][0], f'{self.series.id}/occurrences/{int(self.series.start_datetime.timestamp())}')
+
+    @override_settings(TIME_ZONE='Europe/Paris')
+    def test_local_time_is_kept_across_dst_and_short_months(self):
+        with timezone.override('Europe/Paris'):
+            start = timezone.make_aware(timezone.datetime(2026, 3, 19, 9, 0))
+            weekly = Event(start_datetime=start, end_datetime=start + timedelta(hours=1), recurrence='weekly')
+            starts = list(recurrence.iter_occurrence_starts(weekly, start, start + timedelta(days=15)))
+            self.assertEqual([timezone.localtime(value).hour for value in starts], [9, 9, 9])
+            utc = [value.astimezone(dt_timezone.utc) for value in starts]
+            self.assertEqual(utc[2] - utc[1], timedelta(days=7, hours=-1))
+
+            start = timezone.make_aware(timezone.datetime(2026, 1, 31, 9, 0))
+            monthly = Event(start_datetime=start, end_datetime=start + timedelta(hours=1), recurrence='monthly')
+            starts = list(recurrence.iter_occurrence_starts(monthly, start, start + timedelta(days=150)))
+            self.assertEqual([value.month for value in starts], [1, 3, 5])
+
+
+class ConditionalResponseTests(TestCase):
+    """Tests des réponses conditionnelles (ETag / Last-Modified)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='secret')
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.event = make_event(cls.organizer)
+
+    def setUp(self):
+        get_feed_cache().clear()
+        self.client.force_login(self.user)
+
+    def test_events_json_returns_304_when_unchanged(self):
+        response = self.client.get(reverse('events_json'))
+        self.assertIn('Last-Modified', response)
+        repeat = self.client.get(reverse('events_json'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.content, b'')
+
+    def test_events_json_etag_changes_with_participations(self):
+        etag = self.client.get(reverse('events_json'))['ETag']
+        Participation.objects.create(event=self.event, participant=self.user, status='accepted')
+        response = self.client.get(reverse('events_json'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_events_json_etag_depends_on_user(self):
+        etag = self.client.get(reverse('events_json'))['ETag']
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse('events_json'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_event_detail_returns_304_when_unchanged(self):
+        url = reverse('event_detail', args=[self.event.id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Participation.objects.create(event=self.event, participant=self.user, status='accepted')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_event_detail_renders_pending_messages(self):
+        url = reverse('event_detail', args=[self.event.id])
+        etag = self.client.get(url)['ETag']
+        self.client.post(reverse('event_participate', args=[self.event.id]))
+        etag = self.client.get(url, HTTP_IF_NONE_MATCH=etag)['ETag']
+        self.client.post(reverse('event_participate', args=[self.event.id]))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class AcceptedCountTests(TestCase):
+    """Tests du compteur dénormalisé de participants acceptés"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.users = [User.objects.create_user(username=f'user{i}', password='secret') for i in range(3)]
+
+    def setUp(self):
+        self.event = make_event(self.organizer, max_participants=2)
+
+    def test_counter_follows_status_transitions(self):
+        first = Participation.objects.create(event=self.event, participant=self.users[0], status='accepted')
+        Participation.objects.create(event=self.event, participant=self.users[1], status='pending')
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.accepted_count, 1)
+
+        first.status = 'cancelled'
+        first.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.accepted_count, 0)
+
+        first = Participation.objects.get(pk=first.pk)
+        first.status = 'accepted'
+        first.save()
+        first.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.accepted_count, 1)
+
+    def test_counter_decrements_on_delete(self):
+        Participation.objects.create(event=self.event, participant=self.users[0], status='accepted')
+        Participation.objects.create(event=self.event, participant=self.users[1], status='accepted')
+        Participation.objects.filter(participant=self.users[0]).delete()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.accepted_count, 1)
+
+    def test_availability_check_needs_no_query(self):
+        Participation.objects.create(event=self.event, participant=self.users[0], status='accepted')
+        Participation.objects.create(event=self.event, participant=self.users[1], status='accepted')
+        self.event.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertFalse(self.event.is_available())
+            self.assertEqual(self.event.current_participants_count(), 2)
+
+    def test_saving_stale_event_keeps_accepted_count(self):
+        stale = Event.objects.get(pk=self.event.pk)
+        Participation.objects.create(event=self.event, participant=self.users[0], status='accepted')
+        # Modification par un formulaire ou l'admin depuis une instance chargée avant l'inscription
+        stale.description = 'Nouvelle description'
+        stale.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.accepted_count, 1)
+        self.assertEqual(self.event.description, 'Nouvelle description')
+
+    def test_recount_command_repairs_drift(self):
+        Participation.objects.create(event=self.event, participant=self.users[0], status='accepted')
+        Event.objects.filter(pk=self.event.pk).update(accepted_count=5)
+        out = StringIO()
+        call_command('recount_participants', '--dry-run', stdout=out)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.accepted_count, 5)
+        call_command('recount_participants', stdout=out)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.accepted_count, 1)
+        self.assertIn('1 compteurs corrigés', out.getvalue())
+
+
+class RegistrationTests(TestCase):
+    """Tests du moteur d'inscription"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.users = [User.objects.create_user(username=f'user{i}', password='secret') for i in range(3)]
+
+    def setUp(self):
+        self.event = make_event(self.organizer, max_participants=1)
+
+    def test_outcomes(self):
+        register = registration.register_participant
+        self.assertEqual(register(self.event, self.organizer), registration.ORGANIZER)
+        self.assertEqual(register(self.event, self.users[0]), registration.ACCEPTED)
+        self.assertEqual(register(self.event, self.users[0]), registration.ALREADY_REGISTERED)
+        self.assertEqual(register(self.event, self.users[1], waitlist=False), registration.FULL)
+        self.assertFalse(Participation.objects.filter(participant=self.users[1]).exists())
+
+        participation = Participation.objects.get(participant=self.users[0])
+        participation.status = 'cancelled'
+        participation.save()
+        self.assertEqual(register(self.event, self.users[1]), registration.ACCEPTED)
+        self.assertEqual(register(self.event, self.users[0], waitlist=False), registration.FULL)
+
+    def test_reactivation(self):
+        participation = Participation.objects.create(event=self.event, participant=self.users[0], status='cancelled')
+        self.assertEqual(registration.register_participant(self.event, self.users[0]), registration.REACTIVATED)
+        participation.refresh_from_db()
+        self.assertEqual(participation.status, 'accepted')
+
+    def test_past_event_is_closed(self):
+        past = make_event(self.organizer, days=-3)
+        self.assertEqual(registration.register_participant(past, self.users[0]), registration.CLOSED)
+
+    def test_accepting_beyond_capacity_raises(self):
+        Participation.objects.create(event=self.event, participant=self.users[0], status='accepted')
+        with self.assertRaises(EventFull):
+            Participation.objects.create(event=self.event, participant=self.users[1], status='accepted')
+
+    def test_view_reports_full_event(self):
+        Participation.objects.create(event=self.event, participant=self.users[0], status='accepted')
+        self.client.force_login(self.users[1])
+        response = self.client.post(reverse('event_participate', args=[self.event.id]), follow=True)
+        self.assertContains(response, "vous êtes inscrit sur la liste d&#x27;attente")
+
+
+class WaitlistTests(TestCase):
+    """Tests de la liste d'attente"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.users = [User.objects.create_user(username=f'user{i}', password='secret') for i in range(4)]
+
+    def setUp(self):
+        self.event = make_event(self.organizer, max_participants=1)
+        self.outcomes = [registration.register_participant(self.event, user) for user in self.users]
+
+    def status_of(self, user):
+        return Participation.objects.get(event=self.event, participant=user).status
+
+    def test_full_event_enqueues_in_order(self):
+        self.assertEqual(self.outcomes, [registration.ACCEPTED] + [registration.WAITLISTED] * 3)
+        positions = [
+            Participation.objects.get(participant=user).queue_position for user in self.users[1:]
+        ]
+        self.assertEqual(positions, sorted(positions))
+        third = Participation.objects.get(participant=self.users[3])
+        self.assertEqual(registration.waitlist_rank(third), 3)
+
+    def test_cancellation_promotes_head_of_queue(self):
+        self.assertEqual(registration.cancel_participation(self.event, self.users[0]), registration.CANCELLED)
+        self.assertEqual(self.status_of(self.users[0]), 'cancelled')
+        self.assertEqual(self.status_of(self.users[1]), 'accepted')
+        self.assertEqual(self.status_of(self.users[2]), 'pending')
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.accepted_count, 1)
+
+    def test_leaving_waitlist_keeps_order(self):
+        registration.cancel_participation(self.event, self.users[1])
+        registration.cancel_participation(self.event, self.users[0])
+        self.assertEqual(self.status_of(self.users[2]), 'accepted')
+        self.assertEqual(self.status_of(self.users[1]), 'cancelled')
+
+    def test_deleting_accepted_participation_promotes(self):
+        Participation.objects.filter(participant=self.users[0]).delete()
+        self.assertEqual(self.status_of(self.users[1]), 'accepted')
+
+    def test_raising_capacity_promotes(self):
+        event = Event.objects.get(pk=self.event.pk)
+        event.max_participants = 3
+        event.save()
+        self.assertEqual(
+            [self.status_of(user) for user in self.users],
+            ['accepted', 'accepted', 'accepted', 'pending'],
+        )
+        event.refresh_from_db()
+        self.assertEqual(event.accepted_count, 3)
+
+    def test_saving_stale_event_keeps_counters(self):
+        stale = Event.objects.get(pk=self.event.pk)
+        registration.cancel_participation(self.event, self.users[3])
+        registration.cancel_participation(self.event, self.users[0])
+        stale.title = 'Nouveau titre'
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual(stale.accepted_count, 1)
+        self.assertEqual(stale.waitlist_tail, 3)
+
+    def test_cancel_view(self):
+        self.client.force_login(self.users[0])
+        response = self.client.post(reverse('event_cancel_participation', args=[self.event.id]), follow=True)
+        self.assertContains(response, 'Votre participation a été annulée.')
+        self.assertEqual(self.status_of(self.users[1]), 'accepted')
+
+
+class QRCodeTests(TestCase):
+    """Tests du cache des QR codes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.event = make_event(cls.organizer)
+
+    def setUp(self):
+        qrcodes.memory_cache.clear()
+        self.url = reverse('event_qrcode', args=[self.event.id])
+
+    def test_png_is_generated_once(self):
+        with mock.patch('core.qrcodes.render_qrcode', wraps=qrcodes.render_qrcode) as render:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first['Content-Type'], 'image/png')
+        self.assertTrue(first.content.startswith(b'\x89PNG'))
+        self.assertEqual(first.content, second.content)
+        self.assertIn('max-age=', first['Cache-Control'])
+
+    def test_conditional_request_skips_generation(self):
+        etag = self.client.get(self.url)['ETag']
+        qrcodes.memory_cache.clear()
+        with mock.patch('core.qrcodes.render_qrcode') as render:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        render.assert_not_called()
+
+    def test_svg_and_size_are_part_of_the_key(self):
+        svg = self.client.get(self.url, {'format': 'svg'})
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', svg.content)
+        small = self.client.get(self.url, {'size': 2})
+        self.assertNotEqual(small['ETag'], self.client.get(self.url)['ETag'])
+        self.assertEqual(len(qrcodes.memory_cache), 3)
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = qrcodes.LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+
+    def test_disk_store_is_shared(self):
+        with tempfile.TemporaryDirectory() as cache_dir, self.settings(QRCODE_CACHE_DIR=cache_dir):
+            content = qrcodes.get_qrcode('http://localhost/core/events/1/')
+            qrcodes.memory_cache.clear()
+            with mock.patch('core.qrcodes.render_qrcode') as render:
+                self.assertEqual(qrcodes.get_qrcode('http://localhost/core/events/1/'), content)
+            render.assert_not_called()
+
+
+class QRCodeArchiveTests(TestCase):
+    """Tests de la génération groupée des QR codes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.events = [make_event(cls.organizer, days=i + 1) for i in range(3)]
+        make_event(User.objects.create_user(username='carol', password='secret'))
+
+    def test_archive_is_streamed_with_one_code_per_event(self):
+        self.client.force_login(self.organizer)
+        with self.settings(QRCODE_EXPORT_WORKERS=0):
+            response = self.client.get(reverse('event_qrcodes_archive'))
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(
+            sorted(archive.namelist()),
+            sorted(f'qrcode-event-{event.id}.png' for event in self.events),
+        )
+
+    def assertValidPdf(self, content, pages):
+        self.assertTrue(content.startswith(b'%PDF-1.4'))
+        self.assertTrue(content.endswith(b'%%EOF\n'))
+        # Chaque entrée de la table de références pointe sur son objet
+        xref = int(content.rsplit(b'startxref\n', 1)[1].split(b'\n')[0])
+        entries = content[xref:].split(b'\n')[3:]
+        number = 1
+        while entries[number - 1].endswith(b' n '):
+            offset = int(entries[number - 1][:10])
+            self.assertTrue(content[offset:].startswith(b'%d 0 obj' % number))
+            number += 1
+        self.assertIn(b'/Count %d>>' % pages, content)
+
+    def test_process_pool_keeps_order(self):
+        codes = [(f'code-{i}.png', f'http://localhost/core/events/{i}/') for i in range(5)]
+        pooled = list(qrcodes.iter_rendered(codes, workers=2, batch_size=2))
+        self.assertEqual([name for name, _ in pooled], [name for name, _ in codes])
+        self.assertEqual(pooled[3][1], qrcodes.render_qrcode(codes[3][1]))
+        # Le pool est gardé pour les exports suivants
+        pool = qrcodes.get_pool(2)
+        list(qrcodes.iter_rendered(codes, workers=2))
+        self.assertIs(qrcodes.get_pool(2), pool)
+
+    def test_small_sets_are_rendered_in_process(self):
+        codes = [(f'code-{i}.png', f'http://localhost/core/events/{i}/') for i in range(3)]
+        with mock.patch.object(qrcodes, 'get_pool') as get_pool:
+            rendered = list(qrcodes.iter_rendered(codes, workers=4, pool_threshold=10))
+        get_pool.assert_not_called()
+        self.assertEqual(len(rendered), 3)
+
+    def test_pdf_archive(self):
+        self.client.force_login(self.organizer)
+        with self.settings(QRCODE_EXPORT_WORKERS=0):
+            response = self.client.get(reverse('event_qrcodes_archive'), {'format': 'pdf'})
+            self.assertEqual(self.client.get(reverse('event_qrcodes_archive'), {'format': 'gif'}).status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('qrcodes-evenements.pdf', response['Content-Disposition'])
+        content = b''.join(response.streaming_content)
+        self.assertValidPdf(content, pages=3)
+        self.assertIn(b'(\xc9v\xe9nement) Tj', content)
+
+    def test_command_writes_pdf(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = f'{directory}/codes.pdf'
+            call_command('export_qrcodes', output, '--organizer', 'bob', '--workers', '1', stdout=StringIO())
+            with open(output, 'rb') as handle:
+                self.assertValidPdf(handle.read(), pages=3)
+
+
+class CheckinTests(TestCase):
+    """Tests de l'enregistrement des présences par QR code"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.user = User.objects.create_user(username='alice', password='secret')
+        cls.event = make_event(cls.organizer, days=0)
+        cls.participation = Participation.objects.create(event=cls.event, participant=cls.user, status='accepted')
+        cls.token = checkin.participation_token(cls.participation)
+
+    def scan(self, token=None):
+        return self.client.get(reverse('event_checkin', args=[token or self.token]))
+
+    def test_first_scan_records_attendance_with_one_write(self):
+        self.client.force_login(self.organizer)
+        # Session, utilisateur, l'UPDATE conditionnel puis les statistiques du participant
+        with self.assertNumQueries(4):
+            response = self.scan()
+        self.assertEqual(response.json(), {'result': checkin.CHECKED_IN, 'participation': self.participation.id})
+        self.participation.refresh_from_db()
+        self.assertIsNotNone(self.participation.checked_in_at)
+
+    def test_repeated_scans_are_idempotent(self):
+        self.client.force_login(self.organizer)
+        self.scan()
+        self.participation.refresh_from_db()
+        checked_in_at = self.participation.checked_in_at
+        response = self.scan()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['result'], checkin.ALREADY_CHECKED_IN)
+        self.participation.refresh_from_db()
+        self.assertEqual(self.participation.checked_in_at, checked_in_at)
+
+    def test_tampered_token_is_rejected_without_database(self):
+        self.client.force_login(self.organizer)
+        forged = checkin.make_token(self.participation.id, self.event.id, self.organizer.id)[:-1] + '!'
+        self.assertEqual(self.scan(forged).status_code, 400)
+        self.assertIsNone(checkin.read_token(f'{self.participation.id}.{self.event.id}.{self.user.id}:abc'))
+
+    def test_only_the_organizer_can_scan(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.scan().status_code, 403)
+        self.participation.refresh_from_db()
+        self.assertIsNone(self.participation.checked_in_at)
+
+    def test_scan_outside_event_window(self):
+        later = make_event(self.organizer, days=3)
+        participation = Participation.objects.create(event=later, participant=self.user, status='accepted')
+        self.client.force_login(self.organizer)
+        response = self.scan(checkin.participation_token(participation))
+        self.assertEqual(response.json()['result'], checkin.OUTSIDE_WINDOW)
+
+    def test_cancelled_participation_cannot_check_in(self):
+        self.participation.status = 'cancelled'
+        self.participation.save()
+        self.client.force_login(self.organizer)
+        self.assertEqual(self.scan().status_code, 404)
+
+    def test_participant_badge_encodes_checkin_url(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('event_badge', args=[self.event.id]))
+        self.assertEqual(response['Content-Type'], 'image/png')
+        data = checkin.checkin_url('http://testserver', self.token)
+        self.assertEqual(response.content, qrcodes.get_qrcode(data))
+        self.client.force_login(self.organizer)
+        self.assertEqual(self.client.get(reverse('event_badge', args=[self.event.id])).status_code, 404)
+
+    def test_badges_archive_has_one_code_per_accepted_participant(self):
+        other = User.objects.create_user(username='carol', password='secret')
+        Participation.objects.create(event=self.event, participant=other, status='cancelled')
+        self.client.force_login(self.organizer)
+        with self.settings(QRCODE_EXPORT_WORKERS=0):
+            response = self.client.get(reverse('event_badges_archive', args=[self.event.id]))
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), [f'badge-{self.event.id}-{self.participation.id}-alice.png'])
+
+
+class UserStatsTests(TestCase):
+    """Tests des statistiques matérialisées par utilisateur"""
+
+    FIELDS = stats.STAT_FIELDS
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.users = [User.objects.create_user(username=f'user{i}', password='secret') for i in range(3)]
+
+    def snapshot(self):
+        return {
+            row['user']: row
+            for row in UserStats.objects.values('user', *self.FIELDS)
+        }
+
+    def test_incremental_counters_match_rebuild(self):
+        event = make_event(self.organizer, days=0, max_participants=1)
+        other = make_event(self.organizer, days=2)
+        for user in self.users:
+            registration.register_participant(event, user)
+        registration.register_participant(other, self.users[0])
+        checkin.record_checkin(
+            checkin.participation_token(Participation.objects.get(event=event, participant=self.users[0])),
+            self.organizer,
+        )
+        # Désinscription : la liste d'attente est promue
+        registration.cancel_participation(event, self.users[0])
+        Participation.objects.filter(event=event, participant=self.users[2]).get().delete()
+        other.delete()
+
+        incremental = self.snapshot()
+        stats.rebuild_user_stats()
+        self.assertEqual(incremental, self.snapshot())
+        user_stats = UserStats.objects.get(pk=self.users[0].pk)
+        self.assertEqual((user_stats.events_attended, user_stats.hours_attended), (1, 2.0))
+        self.assertEqual(UserStats.objects.get(pk=self.organizer.pk).events_organized, 1)
+
+    def test_missing_row_is_computed_on_first_read(self):
+        make_event(self.organizer)
+        UserStats.objects.filter(pk=self.organizer.pk).delete()
+        self.assertEqual(stats.get_user_stats(self.organizer).events_organized, 1)
+
+    def test_rebuild_command(self):
+        make_event(self.organizer)
+        UserStats.objects.update(events_organized=42)
+        out = StringIO()
+        call_command('rebuild_profile_stats', '--user', 'bob', stdout=out)
+        self.assertEqual(UserStats.objects.get(pk=self.organizer.pk).events_organized, 1)
+        self.assertEqual(UserStats.objects.get(pk=self.users[0].pk).events_organized, 42)
+
+
+class SeedEventsTests(TestCase):
+    """Tests du générateur de données de test"""
+
+    OPTIONS = ['--users', '30', '--events', '40', '--density', '0.3', '--start-date', '2026-01-15', '--batch-size', '15']
+
+    def seed(self, *extra):
+        call_command('seed_events', *self.OPTIONS, *extra, stdout=StringIO())
+        return (
+            list(Event.objects.order_by('start_datetime', 'title', 'organizer__username').values_list(
+                'title', 'start_datetime', 'max_participants', 'accepted_count', 'waitlist_tail', 'organizer__username',
+            )),
+            sorted(Participation.objects.values_list(
+                'event__title', 'event__start_datetime', 'participant__username', 'status', 'queue_position',
+            ), key=repr),
+        )
+
+    def test_same_seed_same_data(self):
+        first = self.seed()
+        self.assertEqual(len(first[0]), 40)
+        self.assertTrue(first[1])
+        self.assertEqual(self.seed(), first)
+        self.assertNotEqual(self.seed('--seed', '7'), first)
+
+    def test_reseeding_keeps_events_created_by_hand(self):
+        self.seed()
+        testuser = User.objects.get(username='testuser')
+        own = make_event(testuser, title='Réunion ajoutée à la main')
+        Participation.objects.create(event=own, participant=User.objects.get(username='seed-user-0000001'))
+        version = ics.organizers_version()
+        self.seed()
+        self.assertEqual(Event.objects.filter(description__endswith=seeding.GENERATED_MARK).count(), 40)
+        self.assertTrue(Participation.objects.filter(event=own).exists())
+        # Identifiants supprimés puis réattribués : blocs VEVENT en cache invalidés
+        self.assertNotEqual(ics.organizers_version(), version)
+
+    def test_process_pool_generates_the_same_chunks(self):
+        args = (42, 100, 30, 50, 0.2, 10, 5, (5, 10))
+        self.assertEqual(
+            list(seeding.iter_chunks(*args, workers=2)),
+            list(seeding.iter_chunks(*args)),
+        )
+
+    def test_counters_and_stats_are_consistent(self):
+        self.seed()
+        out = StringIO()
+        call_command('recount_participants', '--dry-run', stdout=out)
+        self.assertIn('Aucun écart', out.getvalue())
+        for event in Event.objects.all():
+            self.assertLessEqual(event.accepted_count, event.max_participants)
+        # bulk_create sans signaux : statistiques recalculées en fin de commande
+        testuser = User.objects.get(username='testuser')
+        self.assertEqual(
+            stats.get_user_stats(testuser).participations,
+            Participation.objects.filter(participant=testuser).count(),
+        )
+        self.assertTrue(UserStats.objects.filter(events_attended__gt=0).exists())
+
+
+class IcsFeedTests(TestCase):
+    """Tests des flux d'abonnement iCalendar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='secret')
+        cls.organizer = User.objects.create_user(username='bob', first_name='Bob', last_name='Martin')
+        cls.own = make_event(cls.user, title='Atelier, salle 2; niveau 1', days=2)
+        cls.other = make_event(cls.organizer, title='Conférence', days=3, description='Ligne 1\nLigne 2')
+        Participation.objects.create(event=cls.other, participant=cls.user, status='accepted')
+        make_event(cls.organizer, title='Brouillon', days=4, status='draft')
+        make_event(cls.organizer, title='Trop loin', days=800)
+        start = timezone.now() + timedelta(days=1)
+        cls.series = make_event(
+            cls.organizer,
+            title='Réunion hebdomadaire',
+            start_datetime=start,
+            end_datetime=start + timedelta(hours=1),
+            recurrence='weekly',
+            recurrence_until=start + timedelta(weeks=3),
+        )
+
+    def setUp(self):
+        get_feed_cache().clear()
+        ics.get_fragment_cache().clear()
+
+    def url(self, scope, user=None):
+        return reverse('events_ics', args=[ics.make_token((user or self.user).pk, scope)])
+
+    def get(self, scope, **headers):
+        response = self.client.get(self.url(scope), **headers)
+        return response, b''.join(response.streaming_content).decode('utf-8') if response.status_code == 200 else ''
+
+    def test_scopes(self):
+        response, body = self.get('mine')
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn('SUMMARY:Atelier\\, salle 2\\; niveau 1', body)
+
+        body = self.get('participating')[1]
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn('DESCRIPTION:Organisé par Bob Martin\\n\\nLigne 1\\nLigne 2', body)
+
+        # Tous les événements publiés de la période, occurrences des séries comprises
+        body = self.get('all')[1]
+        self.assertEqual(body.count('BEGIN:VEVENT'), 6)
+        self.assertEqual(body.count(f'RELATED-TO:event-{self.series.pk}'), 4)
+        self.assertNotIn('Brouillon', body)
+        self.assertNotIn('Trop loin', body)
+
+    def test_invalid_token(self):
+        token = ics.make_token(self.user.pk, 'mine')
+        self.assertEqual(self.client.get(reverse('events_ics', args=[token + 'x'])).status_code, 404)
+        forged = token.replace(f'{self.user.pk}.mine', f'{self.organizer.pk}.mine')
+        self.assertEqual(self.client.get(reverse('events_ics', args=[forged])).status_code, 404)
+        self.assertIsNone(ics.read_token(ics.make_token(self.user.pk, 'everything')))
+
+    def test_regenerated_tokens_replace_the_old_ones(self):
+        old_url = self.url('mine')
+        self.assertEqual(self.client.get(old_url).status_code, 200)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('regenerate_feeds')).status_code, 405)
+        self.assertRedirects(self.client.post(reverse('regenerate_feeds')), reverse('profil'))
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        new_url = reverse('events_ics', args=[ics.make_token(self.user.pk, 'mine', 1)])
+        self.assertEqual(self.client.get(new_url).status_code, 200)
+        self.assertIn(new_url, self.client.get(reverse('profil')).content.decode())
+        self.client.post(reverse('regenerate_feeds'))
+        self.assertEqual(self.client.get(new_url).status_code, 404)
+
+    def test_organizer_rename_refreshes_fragments(self):
+        response, body = self.get('participating')
+        self.assertIn('Organisé par Bob Martin', body)
+        self.organizer.first_name = 'Robert'
+        self.organizer.save()
+        response, body = self.get('participating', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Organisé par Robert Martin', body)
+
+    def test_not_modified_until_an_event_changes(self):
+        response, _ = self.get('all')
+        etag = response['ETag']
+        # Seule la lecture de l'utilisateur : l'ETag vient du cache
+        with self.assertNumQueries(1):
+            response, _ = self.get('all', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.other.title = 'Conférence (salle changée)'
+        self.other.save()
+        response, body = self.get('all', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Conférence (salle changée)', body)
+
+    def test_fragments_are_reused(self):
+        body = self.get('all')[1]
+        get_feed_cache().clear()
+        with mock.patch.object(ics, 'render_vevent') as render_vevent:
+            self.assertEqual(self.get('all')[1], body)
+        render_vevent.assert_not_called()
+
+    def test_long_lines_are_folded(self):
+        line = 'DESCRIPTION:' + 'é' * 100
+        folded = ics.fold(line)
+        parts = folded.encode('utf-8').split(b'\r\n')
+        self.assertTrue(all(len(part) <= 75 for part in parts))
+        self.assertEqual(folded.replace('\r\n ', '').rstrip('\r\n'), line)
+
+    def test_profile_lists_feed_urls(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('profil'))
+        self.assertContains(response, self.url('participating'))
+
+
+class EventImportTests(TestCase):
+    """Tests de l'import en masse CSV / iCalendar"""
+
+    CSV = (
+        'title;start;end;location;max_participants;recurrence;recurrence_until\n'
+        'Cours A;2030-01-07 09:00;2030-01-07 10:00;Salle 1;30;;\n'
+        'Cours B;2030-01-07 10:00;2030-01-07 09:00;Salle 1;30;;\n'
+        ';2030-01-08 09:00;2030-01-08 10:00;;;;\n'
+        'Cours C;demain;2030-01-08 10:00;;;;\n'
+        '"Cours D\nsur deux lignes";2030-01-09 09:00;2030-01-09 10:00;;0;;\n'
+        'Cours E;2030-01-10T09:00;2030-01-10T11:00;"Salle 2; étage 1";;weekly;2030-03-31\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='secret')
+
+    def import_csv(self, content, **kwargs):
+        return importing.import_events(importing.iter_csv_rows(io.BytesIO(content.encode('utf-8'))), self.user, **kwargs)
+
+    def test_csv_rows_are_validated_and_reported(self):
+        result = self.import_csv(self.CSV, batch_size=2)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([error.line for error in result.errors], [3, 4, 5, 7])
+        self.assertIn('fin', result.errors[0].message)
+        self.assertIn('Titre', result.errors[1].message)
+        self.assertIn('demain', result.errors[2].message)
+        series = Event.objects.get(title='Cours E')
+        self.assertEqual(series.location, 'Salle 2; étage 1')
+        self.assertEqual(series.recurrence, 'weekly')
+        self.assertEqual(timezone.localtime(series.recurrence_until).date().isoformat(), '2030-03-31')
+        self.assertEqual(stats.get_user_stats(self.user).events_organized, 2)
+
+    def test_batches_are_bulk_inserted(self):
+        rows = 'title,start,end\n' + ''.join(
+            f'Cours {i},2030-02-01 {i % 10:02d}:00,2030-02-01 {i % 10:02d}:30\n' for i in range(25)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            result = self.import_csv(rows, batch_size=10)
+        self.assertEqual(result, importing.ImportResult(25, []))
+        inserts = [query for query in queries if 'INSERT INTO "core_event"' in query['sql']]
+        self.assertEqual(len(inserts), 3)
+
+    def test_dry_run_and_missing_columns(self):
+        self.assertEqual(self.import_csv(self.CSV, dry_run=True).created, 2)
+        self.assertFalse(Event.objects.exists())
+        result = self.import_csv('titre,début\nA,2030-01-01\n')
+        self.assertEqual(result.created, 0)
+        self.assertIn('end', result.errors[0].message)
+
+    def test_ics_feed_can_be_imported(self):
+        organizer = User.objects.create_user(username='bob')
+        make_event(organizer, title='Réunion, salle 3', days=2, description='Ligne 1\nLigne 2' + 'x' * 100)
+        feed = self.client.get(reverse('events_ics', args=[ics.make_token(organizer.pk, 'mine')]))
+        content = b''.join(feed.streaming_content) + (
+            b'BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nSUMMARY:Journ\xc3\xa9e\r\nDTSTART;VALUE=DATE:20300105\r\n'
+            b'RRULE:FREQ=MONTHLY;INTERVAL=2;UNTIL=20301231\r\nEND:VEVENT\r\n'
+            b'BEGIN:VEVENT\r\nSUMMARY:Paris\r\nDTSTART;TZID=Europe/Paris:20300105T090000\r\n'
+            b'DTEND;TZID=Europe/Paris:20300105T100000\r\nRRULE:FREQ=WEEKLY;BYDAY=MO\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n'
+        )
+        result = importing.import_events(importing.iter_ics_rows(io.BytesIO(content)), self.user)
+        self.assertEqual(result.created, 2)
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn('BYDAY', result.errors[0].message)
+
+        copy = Event.objects.get(organizer=self.user, title='Réunion, salle 3')
+        self.assertTrue(copy.description.endswith('Ligne 1\nLigne 2' + 'x' * 100))
+        day = Event.objects.get(title='Journée')
+        self.assertEqual(day.end_datetime - day.start_datetime, timedelta(days=1))
+        self.assertEqual((day.recurrence, day.recurrence_interval), ('monthly', 2))
+
+    def test_upload_and_command(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('cours.csv', self.CSV.encode('utf-8'), content_type='text/csv')
+        response = self.client.post(reverse('event_import'), {'file': upload})
+        self.assertContains(response, 'Ligne 4 : Titre manquant.')
+        self.assertEqual(Event.objects.filter(organizer=self.user).count(), 2)
+
+        with tempfile.NamedTemporaryFile(suffix='.csv') as handle:
+            handle.write(self.CSV.encode('utf-8'))
+            handle.flush()
+            out, err = StringIO(), StringIO()
+            call_command('import_events', handle.name, organizer='alice', stdout=out, stderr=err)
+            self.assertIn('0 événements importés, 6 lignes en erreur', out.getvalue())
+            self.assertIn('Ligne 2 : Lieu déjà réservé', err.getvalue())
+            out, err = StringIO(), StringIO()
+            call_command('import_events', handle.name, organizer='alice', allow_conflicts=True, stdout=out, stderr=err)
+        self.assertIn('2 événements importés, 4 lignes en erreur', out.getvalue())
+        self.assertIn('Ligne 3 :', err.getvalue())
+        self.assertEqual(Event.objects.filter(organizer=self.user).count(), 4)
+
+
+class ParticipationExportTests(TestCase):
+    """Tests des exports CSV / XLSX des participations"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.event = make_event(cls.organizer, title='=Atelier', days=2)
+        cls.other = make_event(cls.organizer, title='Conférence', days=40)
+        cls.participants = [
+            User.objects.create_user(username=f'user{i}', first_name='+Jean' if i == 0 else 'Marie')
+            for i in range(3)
+        ]
+        for user in cls.participants:
+            Participation.objects.create(event=cls.event, participant=user, status='accepted')
+        Participation.objects.create(event=cls.other, participant=cls.participants[0], status='pending')
+        Participation.objects.filter(participant=cls.participants[1], event=cls.event).update(
+            checked_in_at=timezone.now()
+        )
+
+    def setUp(self):
+        self.client.force_login(self.organizer)
+
+    def test_rows_are_read_in_one_query(self):
+        participations = Participation.objects.filter(event=self.event).order_by('id')
+        with self.assertNumQueries(1):
+            content = b''.join(exports.render(participations, exports.CSV, chunk_size=2))
+        lines = content.decode('utf-8').splitlines()
+        self.assertTrue(lines[0].startswith('\ufeffÉvénement,Début'))
+        self.assertEqual(len(lines), 4)
+        self.assertIn("'=Atelier", lines[1])
+        self.assertIn("'+Jean", lines[1])
+        self.assertEqual([line.rsplit(',', 1)[1] for line in lines[1:]], ['Non', 'Oui', 'Non'])
+
+    def test_event_export(self):
+        response = self.client.get(reverse('event_participations_export', args=[self.event.id]))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn(f'participations-evenement-{self.event.id}.csv', response['Content-Disposition'])
+        self.assertEqual(b''.join(response.streaming_content).count(b'Accept\xc3\xa9'), 3)
+
+        response = self.client.get(reverse('event_participations_export', args=[self.event.id]), {'format': 'xlsx'})
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('user2', sheet)
+        # Titre écrit comme du texte, pas comme une formule
+        self.assertNotIn('<f>', sheet)
+
+        self.client.force_login(self.participants[0])
+        self.assertEqual(self.client.get(reverse('event_participations_export', args=[self.event.id])).status_code, 404)
+
+    @override_settings(TIME_ZONE='Europe/Paris')
+    def test_xlsx_is_streamed_as_rows_arrive(self):
+        consumed = []
+
+        def rows():
+            for row in exports.iter_rows(Participation.objects.filter(event=self.event).order_by('id'), 2):
+                consumed.append(row)
+                yield row
+
+        chunks = exports.iter_xlsx(rows(), 'Atelier [1/2]')
+        content = next(chunks)
+        self.assertEqual(consumed, [])
+        content += b''.join(chunks)
+        self.assertEqual(len(consumed), 3)
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        self.assertIsNone(archive.testzip())
+        self.assertIn('<sheet name="Atelier 12"', archive.read('xl/workbook.xml').decode('utf-8'))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(sheet.count('<row '), 4)
+        self.assertIn('<t xml:space="preserve">=Atelier</t>', sheet)
+        # Dates en numéros de série Excel (heure locale), avec le style date
+        start = timezone.localtime(self.event.start_datetime).replace(tzinfo=None, microsecond=0)
+        serial = (start - datetime(1899, 12, 30)).total_seconds() / 86400
+        self.assertIn(f'<c r="B2" s="1"><v>{serial!r}</v></c>', sheet)
+
+    def test_date_range_export(self):
+        today = timezone.localdate()
+        params = {'start': today.isoformat(), 'end': (today + timedelta(days=7)).isoformat()}
+        content = b''.join(self.client.get(reverse('participations_export'), params).streaming_content)
+        self.assertEqual(len(content.decode('utf-8').splitlines()), 4)
+        params['end'] = (today + timedelta(days=60)).isoformat()
+        content = b''.join(self.client.get(reverse('participations_export'), params).streaming_content)
+        self.assertEqual(len(content.decode('utf-8').splitlines()), 5)
+        self.assertIn('Conférence', content.decode('utf-8').splitlines()[-1])
+
+        self.assertEqual(self.client.get(reverse('participations_export'), {'start': 'hier'}).status_code, 400)
+        params['format'] = 'pdf'
+        self.assertEqual(self.client.get(reverse('participations_export'), params).status_code, 400)
+
+
+class AnalyticsTests(TestCase):
+    """Tests du tableau de bord organisateur (colonnes des participations en cache)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.users = [User.objects.create_user(username=f'user{i}') for i in range(4)]
+        cls.past = make_event(cls.organizer, title='Atelier', days=-3)
+        cls.older = make_event(cls.organizer, title='Conférence', days=-10)
+        cls.future = make_event(cls.organizer, title='Séminaire', days=5)
+        for user in cls.users[:3]:
+            Participation.objects.create(event=cls.past, participant=user, status='accepted')
+            Participation.objects.create(event=cls.older, participant=user, status='accepted')
+        Participation.objects.create(event=cls.past, participant=cls.users[3], status='cancelled')
+        Participation.objects.create(event=cls.future, participant=cls.users[0], status='accepted')
+        Participation.objects.create(event=cls.future, participant=cls.users[1], status='pending')
+        now = timezone.now()
+        Participation.objects.filter(event=cls.past, participant__in=cls.users[:2]).update(checked_in_at=now)
+        Participation.objects.filter(event=cls.older, participant=cls.users[0]).update(checked_in_at=now)
+        # Événement d'un autre organisateur : jamais compté
+        other = make_event(cls.users[3], days=-3)
+        Participation.objects.create(event=other, participant=cls.users[0], status='accepted')
+
+    def setUp(self):
+        analytics.get_analytics_cache().clear()
+
+    def by_id(self, dashboard):
+        return {event['id']: event for event in dashboard['per_event']}
+
+    def test_rates_and_no_shows(self):
+        dashboard = analytics.organizer_dashboard(self.organizer)
+        events = self.by_id(dashboard)
+        past = events[self.past.id]
+        self.assertEqual((past['registrations'], past['accepted'], past['cancelled']), (4, 3, 1))
+        self.assertEqual((past['attended'], past['no_shows']), (2, 1))
+        self.assertAlmostEqual(past['attendance_rate'], 2 / 3)
+        # Événement à venir : pas encore d'absence
+        future = events[self.future.id]
+        self.assertEqual((future['accepted'], future['pending'], future['no_shows']), (1, 1, 0))
+        self.assertIsNone(future['attendance_rate'])
+
+        totals = dashboard['totals']
+        self.assertEqual((totals['events'], totals['past_events']), (3, 2))
+        self.assertEqual((totals['accepted'], totals['attended'], totals['no_shows']), (6, 3, 3))
+        self.assertAlmostEqual(totals['no_show_rate'], 0.5)
+        self.assertEqual(totals['participants'], 3)
+
+        no_shows = {row['username']: row['no_shows'] for row in dashboard['per_participant']}
+        self.assertEqual(no_shows, {'user2': 2, 'user1': 1})
+        self.assertEqual(dashboard['per_participant'][0]['username'], 'user2')
+
+    def test_weekly_rollup(self):
+        dashboard = analytics.organizer_dashboard(self.organizer)
+        weeks = dashboard['per_week']
+        self.assertEqual(sum(week['events'] for week in weeks), 2)
+        self.assertEqual(sum(week['no_shows'] for week in weeks), 3)
+        for week in weeks:
+            self.assertEqual(week['week'].weekday(), 0)
+        self.assertEqual(weeks, sorted(weeks, key=lambda week: week['week']))
+        self.assertEqual(len(analytics.organizer_dashboard(self.organizer, weeks=1)['per_week']), 1)
+
+    def test_only_changed_events_are_reloaded(self):
+        self.assertEqual(analytics.organizer_dashboard(self.organizer)['refreshed_events'], 3)
+        self.assertEqual(analytics.organizer_dashboard(self.organizer)['refreshed_events'], 0)
+
+        # Scan de présence : seul l'événement concerné est relu
+        participation = Participation.objects.get(event=self.past, participant=self.users[2])
+        Participation.objects.filter(pk=participation.pk).update(
+            checked_in_at=timezone.now(), updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        dashboard = analytics.organizer_dashboard(self.organizer)
+        self.assertEqual(dashboard['refreshed_events'], 1)
+        self.assertEqual(self.by_id(dashboard)[self.past.id]['no_shows'], 0)
+
+        # Suppression : le nombre de participations change
+        Participation.objects.filter(event=self.older, participant=self.users[2]).delete()
+        dashboard = analytics.organizer_dashboard(self.organizer)
+        self.assertEqual(dashboard['refreshed_events'], 1)
+        self.assertEqual(self.by_id(dashboard)[self.older.id]['accepted'], 2)
+
+        # Dernière participation d'un événement supprimée
+        Participation.objects.filter(event=self.future).delete()
+        dashboard = analytics.organizer_dashboard(self.organizer)
+        self.assertEqual(self.by_id(dashboard)[self.future.id]['registrations'], 0)
+        self.assertEqual(dashboard['totals']['registrations'], 6)
+
+    @override_settings(ANALYTICS_MAX_PARTIAL_REFRESH=0)
+    def test_full_reload_beyond_threshold(self):
+        analytics.organizer_dashboard(self.organizer)
+        Participation.objects.filter(event=self.future, participant=self.users[1]).update(
+            status='accepted', updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        dashboard = analytics.organizer_dashboard(self.organizer)
+        self.assertEqual(self.by_id(dashboard)[self.future.id]['accepted'], 2)
+
+    @skipUnless(analytics.NUMPY_AVAILABLE, "numpy n'est pas installé")
+    def test_numpy_matches_pure_python(self):
+        with_numpy = analytics.organizer_dashboard(self.organizer)
+        analytics.get_analytics_cache().clear()
+        with mock.patch.object(analytics, 'NUMPY_AVAILABLE', False):
+            without_numpy = analytics.organizer_dashboard(self.organizer)
+        self.assertEqual(with_numpy, without_numpy)
+
+    def test_dashboard_view(self):
+        url = reverse('organizer_dashboard')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.organizer)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Atelier')
+        self.assertContains(response, 'user2')
+        self.assertEqual([event['id'] for event in response.context['recent_events']], [self.past.id, self.older.id])
+        self.assertEqual([event['id'] for event in response.context['upcoming_events']], [self.future.id])
+
+
+class ConflictTests(TestCase):
+    """Tests de la détection des conflits d'horaires (inscriptions, lieux, import)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.user = User.objects.create_user(username='alice', password='secret')
+        cls.event = make_event(cls.organizer, title='Atelier', location='Salle 1')
+        start = cls.event.start_datetime
+
+        cls.overlapping = make_event(cls.organizer, title='Conférence', start_datetime=start + timedelta(hours=1),
+                                     end_datetime=start + timedelta(hours=3))
+        cls.adjacent = make_event(cls.organizer, title='Pause', start_datetime=cls.event.end_datetime,
+                                  end_datetime=cls.event.end_datetime + timedelta(hours=1))
+
+    def test_interval_index(self):
+        start = timezone.now()
+        index = conflicts.IntervalIndex([
+            (start, start + timedelta(hours=1), 'a'),
+            (start - timedelta(days=2), start + timedelta(days=2), 'long'),
+            (start + timedelta(hours=1), start + timedelta(hours=2), 'b'),
+        ])
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.overlapping(start + timedelta(minutes=30), start + timedelta(minutes=90)), ['long', 'a', 'b'])
+        # Créneaux qui se touchent : pas de chevauchement
+        self.assertEqual(index.overlapping(start + timedelta(hours=2), start + timedelta(hours=3)), ['long'])
+        self.assertEqual(index.overlapping(start + timedelta(days=3), start + timedelta(days=4)), [])
+
+    def test_overlapping_registration_is_refused(self):
+        self.assertEqual(registration.register_participant(self.event, self.user), registration.ACCEPTED)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(conflicts.participant_conflicts(self.user, self.overlapping.start_datetime, self.overlapping.end_datetime)),
+                [self.event],
+            )
+        self.assertEqual(registration.register_participant(self.overlapping, self.user), registration.CONFLICT)
+        self.assertFalse(Participation.objects.filter(event=self.overlapping).exists())
+        # Un événement qui commence à la fin du précédent n'est pas en conflit
+        self.assertEqual(registration.register_participant(self.adjacent, self.user), registration.ACCEPTED)
+        # Déjà inscrit : le conflit avec ses propres inscriptions n'est pas compté
+        self.assertEqual(registration.register_participant(self.event, self.user), registration.ALREADY_REGISTERED)
+
+        registration.cancel_participation(self.event, self.user)
+        self.assertEqual(registration.register_participant(self.overlapping, self.user), registration.CONFLICT)
+        registration.cancel_participation(self.adjacent, self.user)
+        self.assertEqual(registration.register_participant(self.overlapping, self.user), registration.ACCEPTED)
+
+    def test_participate_view_lists_conflicts(self):
+        Participation.objects.create(event=self.event, participant=self.user, status='pending')
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('event_participate', args=[self.overlapping.id]), follow=True)
+        message = str(list(response.context['messages'])[0])
+        self.assertIn('déjà inscrit', message)
+        self.assertIn('« Atelier »', message)
+
+    def create(self, **data):
+        start = timezone.localtime(self.event.start_datetime) + timedelta(minutes=30)
+        form = {
+            'title': 'Réunion',
+            'location': 'Salle 1',
+            'start_datetime': start.strftime('%Y-%m-%dT%H:%M'),
+            'end_datetime': (start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+        }
+        form.update(data)
+        self.client.force_login(self.organizer)
+        return self.client.post(reverse('event_create'), form)
+
+    def test_room_double_booking_is_refused(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('« Atelier »', str(list(response.context['messages'])[0]))
+        self.assertFalse(Event.objects.filter(title='Réunion').exists())
+
+        self.assertEqual(self.create(location='Salle 2').status_code, 302)
+        self.assertEqual(self.create(title='Brouillon annulé', status='cancelled').status_code, 302)
+        # Lieu libéré par l'annulation
+        Event.objects.filter(pk=self.event.pk).update(status='cancelled')
+        self.assertEqual(self.create().status_code, 302)
+
+    def test_recurring_series_occupies_its_room(self):
+        series = make_event(self.organizer, title='Hebdo', location='Salle 3', days=-20, recurrence='weekly')
+        occurrence = next(recurrence.iter_occurrence_starts(series, timezone.now()))
+        taken = conflicts.room_conflicts('Salle 3', occurrence + timedelta(minutes=30), occurrence + timedelta(hours=1))
+        self.assertEqual([(event.title, event.start_datetime) for event in taken], [('Hebdo', occurrence)])
+        self.assertEqual(conflicts.room_conflicts('Salle 3', occurrence - timedelta(hours=2), occurrence), [])
+        self.assertEqual(conflicts.room_conflicts('', occurrence, occurrence + timedelta(hours=1)), [])
+
+    def test_finished_or_cancelled_series_free_the_room(self):
+        start = timezone.now() - timedelta(days=20)
+        ended = make_event(self.organizer, title='Terminée', location='Salle 4', start_datetime=start,
+                           end_datetime=start + timedelta(hours=3), recurrence='daily',
+                           recurrence_until=start + timedelta(days=10))
+        make_event(self.organizer, title='Annulée', location='Salle 4', days=-20, recurrence='weekly', status='cancelled')
+        last = ended.start_datetime + timedelta(days=10)
+        # La dernière occurrence déborde encore sur le créneau
+        self.assertEqual(
+            [event.title for event in conflicts.room_conflicts('Salle 4', last + timedelta(hours=2), last + timedelta(hours=4))],
+            ['Terminée'],
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(conflicts.room_conflicts('Salle 4', last + timedelta(hours=3), last + timedelta(days=30)), [])
+
+    def test_every_occurrence_of_a_new_series_is_checked(self):
+        # Atelier dans trois semaines, même lieu, même heure qu'une occurrence de la série
+        later = make_event(self.organizer, title='Atelier 2', location='Salle 1',
+                           start_datetime=self.event.start_datetime + timedelta(weeks=3),
+                           end_datetime=self.event.end_datetime + timedelta(weeks=3))
+        start = timezone.localtime(self.event.start_datetime) + timedelta(days=7)
+        until = (start + timedelta(weeks=4)).date()
+        response = self.create(start_datetime=start.strftime('%Y-%m-%dT%H:%M'),
+                               end_datetime=(start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+                               recurrence='weekly', recurrence_until=until.isoformat())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('« Atelier 2 »', str(list(response.context['messages'])[0]))
+        # Série arrêtée avant l'occurrence en conflit
+        until = (start + timedelta(weeks=1)).date()
+        response = self.create(start_datetime=start.strftime('%Y-%m-%dT%H:%M'),
+                               end_datetime=(start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+                               recurrence='weekly', recurrence_until=until.isoformat())
+        self.assertEqual(response.status_code, 302)
+        # Série sans fin : contrôlée sur EVENTS_SERIES_CHECK_DAYS jours
+        Event.objects.filter(title='Réunion').delete()
+        later.delete()
+        make_event(self.organizer, title='Atelier 3', location='Salle 1',
+                   start_datetime=self.event.start_datetime + timedelta(weeks=20),
+                   end_datetime=self.event.end_datetime + timedelta(weeks=20))
+        series = {'start_datetime': start.strftime('%Y-%m-%dT%H:%M'),
+                  'end_datetime': (start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+                  'recurrence': 'weekly'}
+        with self.settings(EVENTS_SERIES_CHECK_DAYS=100):
+            self.assertEqual(self.create(**series).status_code, 302)
+        Event.objects.filter(title='Réunion').delete()
+        response = self.create(**series)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('« Atelier 3 »', str(list(response.context['messages'])[-1]))
+
+    def test_import_checks_every_occurrence(self):
+        base = timezone.localtime(self.event.start_datetime).replace(tzinfo=None)
+        first = base - timedelta(weeks=2)
+        rows = [
+            (2, {'title': 'Hebdo', 'start': first.isoformat(), 'end': (first + timedelta(hours=1)).isoformat(),
+                 'location': 'Salle 1', 'recurrence': 'weekly', 'recurrence_until': (base + timedelta(days=1)).date().isoformat()}),
+            (3, {'title': 'Quotidien', 'start': '2030-01-01T09:00', 'end': '2030-01-01T10:00',
+                 'location': 'Salle 2', 'recurrence': 'daily', 'recurrence_until': '2030-01-10'}),
+            (4, {'title': 'Cours', 'start': '2030-01-08T09:30', 'end': '2030-01-08T10:30', 'location': 'Salle 2'}),
+            (5, {'title': 'Après', 'start': '2030-01-11T09:30', 'end': '2030-01-11T10:30', 'location': 'Salle 2'}),
+        ]
+        result = importing.import_events(rows, self.user)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([error.line for error in result.errors], [2, 4])
+        self.assertIn('« Atelier »', result.errors[0].message)
+        self.assertIn('« Quotidien »', result.errors[1].message)
+
+    def test_import_skips_booked_rooms(self):
+        start = timezone.localtime(self.event.start_datetime).replace(tzinfo=None)
+        rows = [
+            (2, {'title': 'Existant', 'start': start.isoformat(), 'end': (start + timedelta(hours=1)).isoformat(), 'location': 'Salle 1'}),
+            (3, {'title': 'Cours A', 'start': '2030-01-07T09:00', 'end': '2030-01-07T10:00', 'location': 'Salle 2'}),
+            (4, {'title': 'Cours B', 'start': '2030-01-07T09:30', 'end': '2030-01-07T10:30', 'location': 'Salle 2'}),
+            (5, {'title': 'Cours C', 'start': '2030-01-07T10:00', 'end': '2030-01-07T11:00', 'location': 'Salle 2'}),
+            (6, {'title': 'Sans lieu', 'start': '2030-01-07T09:00', 'end': '2030-01-07T10:00'}),
+            (7, {'title': 'Cours D', 'start': '2030-01-07T10:15', 'end': '2030-01-07T10:45', 'location': 'Salle 2'}),
+        ]
+        result = importing.import_events(rows, self.user, batch_size=4)
+        self.assertEqual(result.created, 3)
+        self.assertEqual([error.line for error in result.errors], [2, 4, 7])
+        self.assertIn('« Atelier »', result.errors[0].message)
+        self.assertIn('« Cours A »', result.errors[1].message)
+        # Ligne d'un lot précédent, déjà enregistrée
+        self.assertIn('« Cours C »', result.errors[2].message)
+
+        Event.objects.filter(organizer=self.user).delete()
+        self.assertEqual(importing.import_events(rows, self.user, check_conflicts=False).created, 6)
+
+
+class QueryPlanTests(TestCase):
+    """Plans d'exécution des requêtes des vues principales sur une base remplie"""
+
+    # Tables dont un parcours complet croît avec l'historique
+    TABLES = ('core_event', 'core_participation')
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_events', '--users', '60', '--events', '400', '--density', '0.1', stdout=StringIO())
+        cls.user = User.objects.get(username='testuser')
+        cls.event = Event.objects.filter(status='published').exclude(organizer=cls.user).first()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        get_feed_cache().clear()
+        self.client.force_login(self.user)
+
+    def full_scans(self, sql):
+        """Lignes du plan d'exécution parcourant entièrement une des tables surveillées"""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN ' + sql)
+                plan = [row[0] for row in cursor.fetchall()]
+            return [line for line in plan if any(f'Seq Scan on {table}' in line for table in self.TABLES)]
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+        # SQLite : "SEARCH" utilise un index sur une plage, "SCAN" parcourt tout (table ou index)
+        return [line for line in plan if any(line.startswith(f'SCAN {table}') for table in self.TABLES)]
+
+    def assertNoFullScan(self, method, url, **data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400)
+        for query in ctx.captured_queries:
+            if not query['sql'].lstrip().upper().startswith('SELECT'):
+                continue
+            with self.subTest(url=url, sql=query['sql']):
+                self.assertEqual(self.full_scans(query['sql']), [])
+
+    def test_full_scan_is_detected(self):
+        with CaptureQueriesContext(connection) as ctx:
+            list(Event.objects.filter(title='Atelier'))
+        self.assertTrue(self.full_scans(ctx.captured_queries[0]['sql']))
+
+    def test_events_feed(self):
+        now = timezone.now()
+        window = {'start': (now - timedelta(days=3)).isoformat(), 'end': (now + timedelta(days=35)).isoformat()}
+        for filter_type in ('all', 'mine', 'participating', 'upcoming'):
+            get_feed_cache().clear()
+            self.assertNoFullScan('get', reverse('events_json'), **window, filter=filter_type)
+        self.assertNoFullScan('get', reverse('events_json'), upcoming='true')
+
+    def test_events_list(self):
+        first = self.client.get(reverse('events_list'), {'limit': 20}).json()
+        self.assertNoFullScan('get', reverse('events_list'), limit=20)
+        self.assertNoFullScan('get', reverse('events_list'), cursor=first['next'], limit=20)
+
+    def test_event_pages(self):
+        self.assertNoFullScan('get', reverse('event_detail', args=[self.event.id]))
+        self.assertNoFullScan('post', reverse('event_participate', args=[self.event.id]))
+        start = timezone.localtime(self.event.start_datetime)
+        self.assertNoFullScan(
+            'post', reverse('event_create'), title='Réunion', location=self.event.location,
+            start_datetime=start.strftime('%Y-%m-%dT%H:%M'),
+            end_datetime=(start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+        )
+        self.assertNoFullScan('get', reverse('profil'))
+
+
+class BenchmarkComparisonTests(TestCase):
+    """Tests de la détection de régressions de la commande benchmark"""
+
+    def test_regressions_beyond_tolerance_are_reported(self):
+        from .management.commands.benchmark import compare_results
+
+        baseline = {
+            'event_detail': {'p95_ms': 10.0, 'queries_mean': 6.0},
+            'profile_view': {'p95_ms': 10.0, 'queries_mean': 5.0},
+        }
+        results = {
+            'event_detail': {'p95_ms': 11.0, 'queries_mean': 9.0},
+            'profile_view': {'p95_ms': 10.2, 'queries_mean': 5.0},
+            'events_json_all': {'p95_ms': 100.0, 'queries_mean': 5.0},
+        }
+        self.assertEqual(compare_results(baseline, results, 0.2), ['event_detail : queries_mean 6.0 -> 9.0'])
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+class InstrumentationTests(TestCase):
+    """Tests du middleware d'instrumentation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.event = make_event(cls.organizer)
+
+    def timings(self, response):
+        return {entry.split(';')[0]: entry for entry in response['Server-Timing'].split(', ')}
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs('core.instrumentation', 'INFO') as logs:
+            response = self.client.get(reverse('event_detail', args=[self.event.id]))
+        self.assertEqual(set(self.timings(response)), {'total', 'db', 'view', 'template'})
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], reverse('event_detail', args=[self.event.id]))
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertIn(f'desc="{record["queries"]} queries', self.timings(response)['db'])
+
+    def test_qrcode_encoding_is_timed(self):
+        qrcodes.memory_cache.clear()
+        with self.assertLogs('core.instrumentation', 'INFO'):
+            response = self.client.get(reverse('event_qrcode', args=[self.event.id]), {'size': 3})
+        self.assertIn('qrcode', self.timings(response))
+
+    def test_duplicate_queries_are_reported(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+
+        from .instrumentation import InstrumentationMiddleware
+
+        def n_plus_one(request):
+            for event in Event.objects.all():
+                list(Participation.objects.filter(event=event))
+            return HttpResponse()
+
+        for i in range(5):
+            make_event(self.organizer, days=i + 2)
+        with self.settings(INSTRUMENTATION_DUPLICATE_THRESHOLD=5), self.assertLogs('core.instrumentation', 'WARNING') as logs:
+            InstrumentationMiddleware(n_plus_one)(RequestFactory().get('/'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['queries'], 7)
+        self.assertEqual(record['duplicate_queries'], 5)
+        self.assertEqual(record['top_duplicates'][0]['count'], 6)
+
+    def test_streamed_body_is_measured_until_close(self):
+        from django.http import StreamingHttpResponse
+        from django.test import RequestFactory
+
+        from .instrumentation import InstrumentationMiddleware, logger
+
+        def chunks():
+            for _ in range(3):
+                yield str(Event.objects.count()).encode()
+
+        def streaming(request):
+            Event.objects.exists()
+            return StreamingHttpResponse(chunks())
+
+        with self.assertLogs('core.instrumentation', 'INFO') as logs:
+            response = InstrumentationMiddleware(streaming)(RequestFactory().get('/'))
+            self.assertIn('1 queries', response['Server-Timing'])
+            # Rien n'est écrit avant l'envoi du corps
+            logger.info('début du corps')
+            self.assertEqual(b''.join(response.streaming_content), b'111')
+            response.close()
+        self.assertEqual(logs.records[0].getMessage(), 'début du corps')
+        record = json.loads(logs.records[1].getMessage())
+        self.assertEqual(record['queries'], 4)
+        self.assertIn('stream', record['spans_ms'])
+
+    def test_missing_template_is_reported_by_the_engine(self):
+        from django.template import TemplateDoesNotExist, engines
+
+        engine = engines.all()[0]
+        with self.assertRaises(TemplateDoesNotExist) as raised:
+            engine.get_template('core/absent.html')
+        self.assertIs(raised.exception.backend, engine)
+        self.assertTrue(raised.exception.tried)
+
+    def test_unsampled_requests_are_not_instrumented(self):
+        with self.settings(INSTRUMENTATION_SAMPLE_RATE=0):
+            response = self.client.get(reverse('event_detail', args=[self.event.id]))
+        self.assertNotIn('Server-Timing', response)
+
+
+class MetricsTests(TestCase):
+    """Tests de l'endpoint /metrics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+        cls.user = User.objects.create_user(username='alice', password='secret')
+        cls.event = make_event(cls.organizer, max_participants=1)
+
+    def setUp(self):
+        metrics.registry.__init__()
+        get_feed_cache().clear()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_requests_cache_and_registrations_are_counted(self):
+        self.client.get(reverse('events_json'))
+        self.client.get(reverse('events_json'))
+        self.client.force_login(self.user)
+        self.client.post(reverse('event_participate', args=[self.event.id]))
+        text = self.scrape()
+        self.assertIn('http_requests_total{method="GET",status="200",view="events_json"} 2', text)
+        self.assertIn('http_request_duration_seconds_count{view="events_json"} 2', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="event_participate",le="+Inf"} 1', text)
+        self.assertIn('cache_requests_total{cache="events_feed",result="hit"} 1', text)
+        self.assertIn('cache_requests_total{cache="events_feed",result="miss"} 1', text)
+        self.assertIn('registrations_total{action="register",outcome="accepted"} 1', text)
+        self.assertRegex(text, r'db_queries_total\{view="event_participate"\} \d+')
+
+    def test_snapshots_of_all_workers_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            with open(f'{directory}/metrics-1-dead.json', 'w') as handle:
+                json.dump({
+                    'counters': [['registrations_total', [['action', 'register'], ['outcome', 'full']], 3]],
+                    'histograms': [['http_request_duration_seconds', [['view', 'event_detail']], [1] + [0] * 10, 0.004, 1]],
+                }, handle)
+            metrics.inc('registrations_total', 2, action='register', outcome='full')
+            metrics.observe('http_request_duration_seconds', 0.2, view='event_detail')
+            text = self.scrape()
+        self.assertIn('registrations_total{action="register",outcome="full"} 5', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="event_detail",le="0.005"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="event_detail",le="0.25"} 2', text)
+        self.assertIn('http_request_duration_seconds_count{view="event_detail"} 2', text)
+
+    def test_snapshots_of_stopped_workers_are_removed(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory, METRICS_SNAPSHOT_TTL=60):
+            stale = f'{directory}/metrics-1-dead.json'
+            with open(stale, 'w') as handle:
+                json.dump({
+                    'counters': [['registrations_total', [['action', 'register'], ['outcome', 'full']], 3]],
+                    'histograms': [],
+                }, handle)
+            os.utime(stale, (time.time() - 120, time.time() - 120))
+            metrics.inc('registrations_total', 2, action='register', outcome='full')
+            text = self.scrape()
+            self.assertFalse(os.path.exists(stale))
+        self.assertIn('registrations_total{action="register",outcome="full"} 2', text)
+
+    def test_requests_do_not_write_snapshots(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            with mock.patch.object(metrics, 'flush') as flush, mock.patch.object(metrics, 'start_flusher'):
+                self.client.get(reverse('events_json'))
+            flush.assert_not_called()
+
+    def test_connection_gauges(self):
+        self.client.get(reverse('events_json'))
+        text = self.scrape()
+        self.assertIn('# TYPE db_connections_open gauge', text)
+        self.assertIn('db_connections_open{alias="default"} 1', text)
+        # Connexions prises par les requêtes terminées rendues
+        self.assertIn('db_connections_in_use{alias="default"} 0', text)
+
+    def test_streamed_export_is_measured_until_the_body_is_sent(self):
+        self.client.force_login(self.organizer)
+        for user in (self.user, User.objects.create_user(username='carol')):
+            Participation.objects.create(event=self.event, participant=user, status='pending')
+        rows = exports.iter_rows
+
+        def slow_rows(participations, chunk_size):
+            time.sleep(0.05)
+            yield from rows(participations, chunk_size)
+
+        view = (('view', 'event_participations_export'),)
+        with mock.patch.object(exports, 'iter_rows', slow_rows), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('event_participations_export', args=[self.event.id]), {'format': 'xlsx'})
+            self.assertTrue(response.streaming)
+            self.assertNotIn(('http_request_duration_seconds', view), metrics.registry.histograms)
+            self.assertEqual(metrics.registry.gauges[('db_connections_in_use', (('alias', 'default'),))], 1)
+            b''.join(response.streaming_content)
+            response.close()
+        _, total, count = metrics.registry.histograms[('http_request_duration_seconds', view)]
+        self.assertEqual(count, 1)
+        self.assertGreaterEqual(total, 0.05)
+        # Lecture des participations (dans le corps) comprise
+        self.assertEqual(metrics.registry.counters[('db_queries_total', view)], len(queries))
+        self.assertEqual(metrics.registry.gauges[('db_connections_in_use', (('alias', 'default'),))], 0)
+
+    def test_token_is_required_when_configured(self):
+        with self.settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+
+class ConcurrentRegistrationTests(TransactionTestCase):
+    """Test de charge : inscriptions simultanées sur un même événement"""
+
+    CAPACITY = 25
+    PARTICIPANTS = 200
+    THREADS = 8
+
+    def test_capacity_is_never_exceeded(self):
+        organizer = User.objects.create_user(username='bob', password='secret')
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(self.PARTICIPANTS)])
+        users = list(User.objects.exclude(pk=organizer.pk))
+        event = make_event(organizer, max_participants=self.CAPACITY)
+
+        outcomes = []
+        lock = threading.Lock()
+        pending = list(users) + users[:self.PARTICIPANTS // 4]  # quelques doubles clics
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if not pending:
+                            return
+                        user = pending.pop()
+                    outcome = registration.register_participant(event, user, waitlist=False)
+                    with lock:
+                        outcomes.append(outcome)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        event.refresh_from_db()
+        accepted = Participation.objects.filter(event=event, status='accepted').count()
+        self.assertEqual(accepted, self.CAPACITY)
+        self.assertEqual(event.accepted_count, self.CAPACITY)
+        self.assertEqual(outcomes.count(registration.ACCEPTED), self.CAPACITY)
+        self.assertEqual(len(outcomes), self.PARTICIPANTS + self.PARTICIPANTS // 4)
+
+    def test_overlapping_registrations_of_one_user_are_serialized(self):
+        organizer = User.objects.create_user(username='bob', password='secret')
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(8)])
+        users = list(User.objects.exclude(pk=organizer.pk))
+        first = make_event(organizer, max_participants=100)
+        second = make_event(organizer, max_participants=100, start_datetime=first.start_datetime + timedelta(hours=1),
+                            end_datetime=first.end_datetime + timedelta(hours=1))
+        barrier = threading.Barrier(2 * len(users))
+
+        def register(event, user):
+            try:
+                barrier.wait()
+                registration.register_participant(event, user)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=register, args=(event, user)) for user in users for event in (first, second)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Une seule des deux inscriptions de chaque utilisateur aboutit
+        for user in users:
+            self.assertEqual(Participation.objects.filter(participant=user, status='accepted').count(), 1)
+
+    def test_concurrent_cancellations_promote_in_order(self):
+        organizer = User.objects.create_user(username='bob', password='secret')
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(40)])
+        users = list(User.objects.exclude(pk=organizer.pk).order_by('id'))
+        event = make_event(organizer, max_participants=10)
+        for user in users:
+            registration.register_participant(event, user)
+
+        def cancel(user):
+            try:
+                registration.cancel_participation(event, user)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=cancel, args=(user,)) for user in users[:10]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        event.refresh_from_db()
+        accepted = set(
+            Participation.objects.filter(event=event, status='accepted').values_list('participant_id', flat=True)
+        )
+        self.assertEqual(event.accepted_count, 10)
+        self.assertEqual(accepted, {user.pk for user in users[10:20]})
@@ -4,8 +4,30 @@ from . import views
 urlpatterns = [
     path('', views.calendar_view, name='calendar'),
     path('events/json/', views.events_json, name='events_json'),
+    path('events/list/', views.events_list, name='events_list'),
+    path('events/ics/<str:token>/', views.events_ics, name='events_ics'),
     path('events/<int:event_id>/', views.event_detail, name='event_detail'),
     path('events/<int:event_id>/participate/', views.event_participate, name='event_participate'),
+    path('events/<int:event_id>/occurrences/<int:timestamp>/', views.event_occurrence, name='event_occurrence'),
+    path(
+        'events/<int:event_id>/occurrences/<int:timestamp>/participate/',
+        views.event_occurrence_participate,
+        name='event_occurrence_participate',
+    ),
+    path(
+        'events/<int:event_id>/occurrences/<int:timestamp>/cancel/',
+        views.event_occurrence_cancel,
+        name='event_occurrence_cancel',
+    ),
+    path('events/<int:event_id>/cancel/', views.event_cancel_participation, name='event_cancel_participation'),
     path('events/<int:event_id>/qrcode/', views.event_qrcode, name='event_qrcode'),
+    path('events/<int:event_id>/badge/', views.event_badge, name='event_badge'),
+    path('events/<int:event_id>/badges/', views.event_badges_archive, name='event_badges_archive'),
+    path('events/<int:event_id>/export/', views.event_participations_export, name='event_participations_export'),
+    path('events/export/', views.participations_export, name='participations_export'),
+    path('dashboard/', views.organizer_dashboard, name='organizer_dashboard'),
+    path('checkin/<str:token>/', views.event_checkin, name='event_checkin'),
+    path('events/qrcodes/', views.event_qrcodes_archive, name='event_qrcodes_archive'),
     path('events/create/', views.event_create, name='event_create'),
+    path('events/import/', views.event_import, name='event_import'),
 ]
\ No newline at end of file
@@ -1,18 +1,42 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
+from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.conf import settings
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from datetime import datetime, timedelta
+from itertools import chain
+from operator import attrgetter
+import hashlib
 import json
 
-try:
-    import qrcode
-    QRCODE_AVAILABLE = True
-except ImportError:
-    QRCODE_AVAILABLE = False
-
+from . import analytics, checkin, conflicts, exports, ics, importing, jsonstream, metrics, pagination, qrcodes, recurrence, registration
+from .cache import feed_cache_key, feed_version, get_feed_cache, user_bucket
 from .models import Event, Participation
+from .qrcodes import QRCODE_AVAILABLE
+
+# Message affiché pour chaque résultat d'inscription
+PARTICIPATION_MESSAGES = {
+    registration.ACCEPTED: (messages.SUCCESS, "Votre participation a été enregistrée."),
+    registration.REACTIVATED: (messages.SUCCESS, "Votre participation a été réactivée."),
+    registration.WAITLISTED: (messages.INFO, "L'événement est complet : vous êtes inscrit sur la liste d'attente."),
+    registration.ALREADY_REGISTERED: (messages.INFO, "Vous participez déjà à cet événement."),
+    registration.PENDING: (messages.INFO, "Votre demande de participation est déjà en attente."),
+    registration.REJECTED: (messages.WARNING, "Votre participation a été refusée par l'organisateur."),
+    registration.FULL: (messages.ERROR, "Plus de places disponibles."),
+    registration.CLOSED: (messages.ERROR, "L'événement n'accepte plus de nouvelles participations."),
+    registration.ORGANIZER: (messages.ERROR, "Vous êtes l'organisateur de cet événement."),
+    registration.CONFLICT: (messages.ERROR, "Vous êtes déjà inscrit à un autre événement sur ce créneau :"),
+    registration.CANCELLED: (messages.SUCCESS, "Votre participation a été annulée."),
+    registration.NOT_REGISTERED: (messages.INFO, "Vous n'êtes pas inscrit à cet événement."),
+}
+
 
 def calendar_view(request):
     """Vue principale du calendrier"""
@@ -22,107 +46,586 @@ def calendar_view(request):
     return render(request, 'calendar.html', context)
 
 
-def events_json(request):
-    """API pour récupérer les événements en JSON (pour FullCalendar)"""
-    # Récupérer les paramètres de filtre
-    start = request.GET.get('start')
-    end = request.GET.get('end')
-    filter_type = request.GET.get('filter', 'all')
-    upcoming_only = request.GET.get('upcoming', False)
-    
-    # Construire la requête de base
-    events = Event.objects.filter(status='published')
-    
-    # Filtrer par date si fourni
-    if start and end:
-        try:
-            start_date = datetime.fromisoformat(start.replace('Z', '+00:00'))
-            end_date = datetime.fromisoformat(end.replace('Z', '+00:00'))
-            
-            # Pour FullCalendar, on filtre les événements qui chevauchent la période
-            events = events.filter(
-                start_datetime__lt=end_date,
-                end_datetime__gt=start_date
-            )
-        except (ValueError, TypeError):
-            pass
-    
-    # Appliquer les filtres supplémentaires
-    if filter_type == 'mine' and request.user.is_authenticated:
-        events = events.filter(organizer=request.user)
-    elif filter_type == 'participating' and request.user.is_authenticated:
+def parse_datetime_param(value):
+    """Date ISO 8601 transmise en paramètre (FullCalendar envoie un suffixe Z)"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def event_window(request):
+    """Fenêtre (début, fin) demandée ; sans fin, les EVENTS_MAX_WINDOW_DAYS jours suivant le début.
+
+    La taille de la fenêtre n'est pas bornée ici : voir ``window_limit``.
+    """
+    max_window = timedelta(days=settings.EVENTS_MAX_WINDOW_DAYS)
+    try:
+        start = parse_datetime_param(request.GET['start'])
+    except (KeyError, ValueError, TypeError):
+        start = timezone.now()
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    try:
+        end = parse_datetime_param(request.GET['end'])
+    except (KeyError, ValueError, TypeError):
+        end = start + max_window
+    if timezone.is_naive(end):
+        end = timezone.make_aware(end)
+    return start, end
+
+
+def window_limit(request):
+    """Fenêtre maximale (jours) : le mode diffusé, à mémoire constante, a sa propre limite"""
+    if request.GET.get('stream'):
+        return settings.EVENTS_STREAM_MAX_WINDOW_DAYS
+    return settings.EVENTS_MAX_WINDOW_DAYS
+
+
+def window_error(request):
+    """Réponse 400 si la fenêtre demandée est vide ou dépasse ``window_limit`` jours"""
+    start, end = event_window(request)
+    max_days = window_limit(request)
+    if start < end <= start + timedelta(days=max_days):
+        return None
+    return JsonResponse(
+        {'error': f'La fenêtre doit être non vide et couvrir au plus {max_days} jours.'},
+        status=400,
+    )
+
+
+def apply_filter(user, events, filter_type):
+    """Restreint les événements au filtre du calendrier (mine, participating, upcoming)"""
+    if filter_type == 'mine' and user.is_authenticated:
+        events = events.filter(organizer=user)
+    elif filter_type == 'participating' and user.is_authenticated:
         # Événements où l'utilisateur participe
-        participating_ids = request.user.participations.filter(
+        participating_ids = user.participations.filter(
             status='accepted'
         ).values_list('event_id', flat=True)
         events = events.filter(id__in=participating_ids)
     elif filter_type == 'upcoming':
         events = events.filter(start_datetime__gte=timezone.now())
+    return events
+
+
+def window_events(user, start_date, end_date, filter_type):
+    """Événements publiés (hors séries) chevauchant la période, filtrés pour `user`"""
+    # Les séries récurrentes sont développées à part, voir window_series
+    events = Event.objects.filter(
+        status='published',
+        recurrence__isnull=True,
+        start_datetime__lt=end_date,
+        end_datetime__gt=start_date,
+    )
+    return apply_filter(user, events, filter_type)
+
+
+def window_series(user, start_date, end_date, filter_type):
+    """Séries récurrentes publiées dont une occurrence peut tomber dans la période"""
+    series = Event.objects.filter(
+        Q(recurrence_until__isnull=True)
+        | Q(recurrence_until__gt=start_date - (F('end_datetime') - F('start_datetime'))),
+        status='published',
+        recurrence__isnull=False,
+        start_datetime__lt=end_date,
+    )
+    # Les inscriptions portent sur les occurrences matérialisées, servies comme événements simples
+    if filter_type == 'participating':
+        return series.none()
+    if filter_type == 'mine' and user.is_authenticated:
+        series = series.filter(organizer=user)
+    return series
+
+
+def window_occurrences(user, start_date, end_date, filter_type):
+    """Occurrences calculées des séries dans la période"""
+    series = window_series(user, start_date, end_date, filter_type).select_related('organizer')
+    occurrences = recurrence.expand(series, start_date, end_date)
+    if filter_type == 'upcoming':
+        now = timezone.now()
+        occurrences = [occurrence for occurrence in occurrences if occurrence.start_datetime >= now]
+    return occurrences
+
+
+def filter_events(request):
+    """Construit la requête des événements publiés correspondant aux paramètres du calendrier"""
+    # Fenêtre toujours bornée : sans start/end, les prochains EVENTS_MAX_WINDOW_DAYS jours
+    # (le flux ne grossit pas avec l'historique)
+    return window_events(request.user, *event_window(request), request.GET.get('filter', 'all'))
+
+
+def filter_series(request):
+    """Séries récurrentes publiées dont une occurrence peut tomber dans la fenêtre du calendrier"""
+    return window_series(request.user, *event_window(request), request.GET.get('filter', 'all'))
+
+
+def feed_occurrences(request):
+    """Occurrences calculées des séries pour la fenêtre du calendrier"""
+    return window_occurrences(request.user, *event_window(request), request.GET.get('filter', 'all'))
+
+
+def feed_stats(events):
+    """Dates de modification maximales et compteurs d'un ensemble d'événements (une requête).
+
+    Retourne ``(stats, last_modified)`` ; les compteurs détectent les
+    suppressions, que les dates ne voient pas. Les occurrences enregistrées
+    des séries en font partie via ``occurrences``.
+    """
+    stats = events.aggregate(
+        last_event=Max('updated_at'),
+        last_participation=Max('participations__updated_at'),
+        last_occurrence=Max('occurrences__updated_at'),
+        event_count=Count('id', distinct=True),
+        participation_count=Count('participations'),
+        occurrence_count=Count('occurrences'),
+        series_count=Count('id', filter=Q(recurrence__isnull=False), distinct=True),
+        past_count=Count('id', filter=Q(end_datetime__lt=timezone.now()), distinct=True),
+    )
+    dates = [date for date in (stats['last_event'], stats['last_participation'], stats['last_occurrence']) if date]
+    return stats, max(dates) if dates else None
+
+
+def events_feed_validators(request, events):
+    """Calcule l'ETag et la date de dernière modification d'une fenêtre du calendrier"""
+    stats, last_modified = feed_stats(events)
+    
+    # L'identité de l'utilisateur fait partie de l'ETag car les couleurs sont personnalisées.
+    # Les occurrences calculées passent en gris sans modification en base : avec des
+    # séries dans la fenêtre, l'ETag change aussi à chaque minute
+    fingerprint = '|'.join(str(value) for value in (
+        user_bucket(request.user),
+        request.GET.urlencode(),
+        *stats.values(),
+        timezone.now().strftime('%Y%m%d%H%M') if stats['series_count'] else '',
+    ))
+    etag = quote_etag(hashlib.md5(fingerprint.encode('utf-8')).hexdigest())
+    return etag, last_modified
+
+
+# Catégories d'événements du calendrier et couleur associée
+KIND_OTHER, KIND_MINE, KIND_PARTICIPATING, KIND_PAST = range(4)
+KIND_COLORS = {
+    KIND_OTHER: '#3b82f6',  # Bleu pour les autres
+    KIND_MINE: '#10b981',  # Vert pour mes événements
+    KIND_PARTICIPATING: '#8b5cf6',  # Violet pour mes participations
+    KIND_PAST: '#9ca3af',  # Événements passés en gris
+}
+
+# Colonnes des lignes du format compact (?format=compact)
+COMPACT_FIELDS = ['id', 'title', 'start', 'end', 'location', 'organizer', 'kind']
+
+
+def feed_id(event):
+    """Identifiant d'un événement du flux, relatif à /core/events/ (``<série>/occurrences/<début>``
+    pour une occurrence calculée)"""
+    if event.pk is None:
+        return f'{event.series_id}/occurrences/{event.occurrence_timestamp}'
+    return event.id
+
+
+def serialize_events(request, events, occurrences=()):
+    """Transforme les événements en liste de dictionnaires pour FullCalendar"""
+    return list(iter_serialized_events(request, events, occurrences=occurrences))
+
+
+def iter_feed_events(request, events, chunk_size=None, occurrences=()):
+    """Produit les couples ``(événement, catégorie)`` du flux du calendrier.
+
+    Avec `chunk_size`, les événements sont lus par lots de cette taille
+    (``QuerySet.iterator``) au lieu d'être tous chargés d'un coup. Les
+    occurrences calculées des séries (`occurrences`) suivent les événements.
+    """
+    upcoming_only = request.GET.get('upcoming', False)
+    
+    # Jointure sur l'organisateur (le nombre de participants est stocké sur l'événement)
+    events = events.select_related('organizer')
+    
+    # Événements de la fenêtre auxquels l'utilisateur participe (une seule requête)
+    participating_event_ids = set()
+    if request.user.is_authenticated:
+        participating_event_ids = set(
+            request.user.participations.filter(
+                status='accepted',
+                event__in=events.values('id')
+            ).values_list('event_id', flat=True)
+        )
     
     # Pour la vue mobile "à venir"
     if upcoming_only:
-        events = events.filter(
-            start_datetime__gte=timezone.now()
-        ).order_by('start_datetime')[:10]
-    
-    # Préparer les données pour FullCalendar
-    events_data = []
-    for event in events:
-        # Déterminer la couleur en fonction de l'utilisateur
-        if request.user.is_authenticated:
-            if event.organizer == request.user:
-                color = '#10b981'  # Vert pour mes événements
-            elif event.participations.filter(participant=request.user, status='accepted').exists():
-                color = '#8b5cf6'  # Violet pour mes participations
-            else:
-                color = '#3b82f6'  # Bleu pour les autres
-        else:
-            color = '#3b82f6'  # Bleu par défaut
-        
-        # Événements passés en gris
+        now = timezone.now()
+        upcoming = list(events.filter(start_datetime__gte=now).order_by('start_datetime')[:10])
+        upcoming += [occurrence for occurrence in occurrences if occurrence.start_datetime >= now]
+        events = sorted(upcoming, key=attrgetter('start_datetime'))[:10]
+        occurrences = ()
+    elif chunk_size:
+        events = events.iterator(chunk_size=chunk_size)
+    
+    for event in chain(events, occurrences):
+        # Déterminer la catégorie en fonction de l'utilisateur
         if event.is_past():
-            color = '#9ca3af'
-        
-        events_data.append({
-            'id': event.id,
+            kind = KIND_PAST
+        elif event.organizer_id == request.user.id:
+            kind = KIND_MINE
+        elif event.id in participating_event_ids:
+            kind = KIND_PARTICIPATING
+        else:
+            kind = KIND_OTHER
+        yield event, kind
+
+
+def iter_serialized_events(request, events, chunk_size=None, occurrences=()):
+    """Produit un à un les dictionnaires FullCalendar des événements"""
+    for event, kind in iter_feed_events(request, events, chunk_size, occurrences):
+        color = KIND_COLORS[kind]
+        organizer_name = event.organizer.get_full_name() or event.organizer.username
+        identifier = feed_id(event)
+        yield {
+            'id': identifier,
             'title': event.title,
             'start': event.start_datetime.isoformat(),
             'end': event.end_datetime.isoformat(),
             'location': event.location,
-            'organizer': event.organizer.get_full_name() or event.organizer.username,
-            'url': f'/core/events/{event.id}/',
+            'organizer': organizer_name,
+            'url': f'/core/events/{identifier}/',
             'backgroundColor': color,
             'borderColor': color,
             'textColor': '#ffffff',
             'extendedProps': {
                 'location': event.location,
-                'organizer': event.organizer.get_full_name() or event.organizer.username,
+                'organizer': organizer_name,
                 'description': event.description[:100] + '...' if len(event.description) > 100 else event.description,
-                'available_spots': event.max_participants - event.current_participants_count(),
+                'available_spots': event.max_participants - event.accepted_count,
             }
+        }
+
+
+def iter_compact_feed(request, events, chunk_size=None, occurrences=()):
+    """Produit, en morceaux d'octets, le flux du calendrier au format compact.
+
+    ``{"fields": [...], "events": [[...], ...], "organizers": [...]}`` : une
+    ligne par événement dans l'ordre de ``fields`` (identifiant comme dans
+    ``feed_id``), dates en secondes depuis
+    l'epoch, organisateur sous forme d'indice dans ``organizers`` et catégorie
+    (``kind``) à la place des couleurs, choisies par le client. Les noms
+    d'organisateurs sont envoyés une seule fois, après les événements, ce qui
+    permet de diffuser la réponse.
+    """
+    organizers = {}
+    
+    def rows():
+        for event, kind in iter_feed_events(request, events, chunk_size, occurrences):
+            organizer = organizers.get(event.organizer_id)
+            if organizer is None:
+                organizer = organizers[event.organizer_id] = (
+                    len(organizers), event.organizer.get_full_name() or event.organizer.username,
+                )
+            yield [
+                feed_id(event),
+                event.title,
+                int(event.start_datetime.timestamp()),
+                int(event.end_datetime.timestamp()),
+                event.location,
+                organizer[0],
+                kind,
+            ]
+    
+    yield b'{"fields":' + jsonstream.dumps(COMPACT_FIELDS) + b',"events":'
+    yield from jsonstream.iter_json_array(rows())
+    yield b',"organizers":' + jsonstream.dumps([name for _, name in organizers.values()]) + b'}'
+
+
+def events_json(request):
+    """API pour récupérer les événements en JSON (pour FullCalendar)"""
+    # Fenêtre trop longue refusée comme dans events_list plutôt que tronquée sans le dire
+    error = window_error(request)
+    if error is not None:
+        return error
+    
+    # Le cache contient les validateurs et, si déjà calculé, le contenu JSON de la fenêtre
+    feed_cache = get_feed_cache()
+    cache_key = feed_cache_key(request)
+    cached = feed_cache.get(cache_key)
+    metrics.inc('cache_requests_total', cache='events_feed', result='miss' if cached is None else 'hit')
+    if cached is None:
+        etag, last_modified = events_feed_validators(request, filter_events(request) | filter_series(request))
+        content = None
+    else:
+        etag, last_modified, content = cached
+    
+    # Réponse 304 si le navigateur possède déjà cette version de la fenêtre
+    not_modified = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    if not_modified is not None:
+        if cached is None:
+            feed_cache.set(cache_key, (etag, last_modified, None))
+        return set_validators(not_modified, etag, last_modified)
+    
+    compact = request.GET.get('format') == 'compact'
+    
+    # Mode diffusé (?stream=true) : événements lus par lots et encodés au fil de l'envoi,
+    # rien n'est gardé en cache (la mémoire reste constante quelle que soit la fenêtre)
+    if content is None and request.GET.get('stream'):
+        chunk_size = settings.EVENTS_STREAM_CHUNK_SIZE
+        occurrences = feed_occurrences(request)
+        if compact:
+            chunks = iter_compact_feed(request, filter_events(request), chunk_size, occurrences)
+        else:
+            chunks = jsonstream.iter_json_array(
+                iter_serialized_events(request, filter_events(request), chunk_size, occurrences)
+            )
+        response = StreamingHttpResponse(chunks, content_type='application/json')
+        return set_validators(response, etag, last_modified)
+    
+    if content is None:
+        occurrences = feed_occurrences(request)
+        if compact:
+            content = b''.join(iter_compact_feed(request, filter_events(request), occurrences=occurrences))
+        else:
+            content = jsonstream.dumps(serialize_events(request, filter_events(request), occurrences))
+        feed_cache.set(cache_key, (etag, last_modified, content))
+    
+    response = HttpResponse(content, content_type='application/json')
+    return set_validators(response, etag, last_modified)
+
+
+def events_ics(request, token):
+    """Flux iCalendar d'un utilisateur, identifié par le jeton de son adresse d'abonnement.
+
+    Mêmes requêtes que le calendrier JSON, sur une fenêtre de ICS_PAST_DAYS
+    jours passés à ICS_FUTURE_DAYS jours à venir (alignée sur le jour). Le
+    corps est diffusé et assemblé à partir des blocs VEVENT en cache (voir
+    core/ics.py) ; l'ETag est gardé dans le cache du flux pour que les
+    interrogations périodiques des clients se règlent par une réponse 304.
+    """
+    access = ics.read_token(token)
+    if access is None:
+        raise Http404
+    # Version des adresses lue avec l'utilisateur : un jeton régénéré depuis le profil n'est plus accepté
+    users = get_user_model().objects.annotate(feed_token_version=Coalesce('feed_token__version', 0))
+    user = get_object_or_404(users, pk=access[0], is_active=True)
+    if user.feed_token_version != access[2]:
+        raise Http404
+    scope = access[1]
+    
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = today - timedelta(days=settings.ICS_PAST_DAYS)
+    end = today + timedelta(days=settings.ICS_FUTURE_DAYS + 1)
+    base_url = request.build_absolute_uri('/').rstrip('/')
+    
+    feed_cache = get_feed_cache()
+    cache_key = f'events_ics:{feed_version()}:{user.pk}:{scope}:{start.date()}:{base_url}'
+    cached = feed_cache.get(cache_key)
+    metrics.inc('cache_requests_total', cache='events_ics', result='miss' if cached is None else 'hit')
+    if cached is None:
+        stats, last_modified = feed_stats(
+            window_events(user, start, end, scope) | window_series(user, start, end, scope)
+        )
+        fingerprint = '|'.join(str(value) for value in (
+            user.pk, scope, start, base_url, ics.organizers_version(), *stats.values(),
+        ))
+        etag = quote_etag(hashlib.md5(fingerprint.encode('utf-8')).hexdigest())
+        feed_cache.set(cache_key, (etag, last_modified))
+    else:
+        etag, last_modified = cached
+    
+    not_modified = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    if not_modified is not None:
+        return set_validators(not_modified, etag, last_modified)
+    
+    chunks = ics.iter_calendar(
+        ics.SCOPES[scope],
+        window_events(user, start, end, scope).order_by('start_datetime', 'id'),
+        window_occurrences(user, start, end, scope),
+        base_url,
+        settings.ICS_FRAGMENT_BATCH_SIZE,
+    )
+    response = StreamingHttpResponse(chunks, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = f'inline; filename="{scope}.ics"'
+    return set_validators(response, etag, last_modified)
+
+
+def events_list(request):
+    """Liste paginée des événements publiés d'une fenêtre, triés par date de début.
+
+    Les séries récurrentes n'y figurent que par leurs occurrences enregistrées
+    (les occurrences calculées n'ont pas de clé pour le curseur).
+
+    Pagination par curseur (voir core/pagination.py) : ``?cursor=`` reprend la
+    réponse précédente à ``next``, avec la même fenêtre et le même filtre. La
+    fenêtre (``start``/``end``) est limitée à EVENTS_MAX_WINDOW_DAYS jours et
+    ``limit`` à EVENTS_API_MAX_PAGE_SIZE.
+    """
+    max_window = timedelta(days=settings.EVENTS_MAX_WINDOW_DAYS)
+    key = None
+    try:
+        limit = int(request.GET.get('limit', settings.EVENTS_API_PAGE_SIZE))
+        if request.GET.get('cursor'):
+            key, (start, end, filter_type) = pagination.decode_cursor(request.GET['cursor'])
+            start, end = pagination.from_microseconds(start), pagination.from_microseconds(end)
+        else:
+            start = parse_datetime_param(request.GET['start']) if 'start' in request.GET else timezone.now()
+            end = parse_datetime_param(request.GET['end']) if 'end' in request.GET else start + max_window
+            filter_type = request.GET.get('filter', 'all')
+    except pagination.InvalidCursor:
+        return JsonResponse({'error': 'Curseur invalide.'}, status=400)
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Paramètre start, end ou limit invalide.'}, status=400)
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    if timezone.is_naive(end):
+        end = timezone.make_aware(end)
+    if not start < end <= start + max_window:
+        return JsonResponse(
+            {'error': f'La fenêtre doit être non vide et couvrir au plus {settings.EVENTS_MAX_WINDOW_DAYS} jours.'},
+            status=400,
+        )
+    limit = max(1, min(limit, settings.EVENTS_API_MAX_PAGE_SIZE))
+    
+    # Événements commençant dans la fenêtre : condition et tri servis par le même index
+    events = apply_filter(
+        request.user,
+        Event.objects.filter(
+            status='published', recurrence__isnull=True, start_datetime__gte=start, start_datetime__lt=end,
+        ),
+        filter_type,
+    ).select_related('organizer')
+    page, has_next = pagination.paginate(events, key, limit)
+    
+    results = []
+    for event in page:
+        results.append({
+            'id': event.id,
+            'title': event.title,
+            'start': event.start_datetime.isoformat(),
+            'end': event.end_datetime.isoformat(),
+            'location': event.location,
+            'organizer': event.organizer.get_full_name() or event.organizer.username,
+            'available_spots': event.max_participants - event.accepted_count,
+            'url': reverse('event_detail', args=[event.id]),
         })
     
-    return JsonResponse(events_data, safe=False)
+    params = [pagination.to_microseconds(start), pagination.to_microseconds(end), filter_type]
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'results': results,
+        'next': pagination.encode_cursor(page[-1], params) if has_next else None,
+    })
+
+
+def set_validators(response, etag, last_modified):
+    """Ajoute les en-têtes ETag et Last-Modified à une réponse"""
+    response['ETag'] = etag
+    # Le navigateur doit toujours revalider (contenu personnalisé par utilisateur)
+    patch_cache_control(response, private=True, no_cache=True)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
 
 
 def event_detail(request, event_id):
     """Vue détaillée d'un événement"""
     event = get_object_or_404(Event, id=event_id, status='published')
     
-    available_spots = event.max_participants - event.current_participants_count()
+    # Série récurrente : page de sa prochaine occurrence
+    if event.is_series:
+        upcoming = recurrence.next_occurrence(event)
+        if upcoming is not None:
+            return redirect('event_occurrence', event_id=event.id, timestamp=int(upcoming.timestamp()))
+    
+    # Validateurs : l'événement, ses participations et l'utilisateur courant
+    stats = event.participations.aggregate(
+        last_participation=Max('updated_at'),
+        participation_count=Count('id'),
+    )
+    dates = [date for date in (event.updated_at, stats['last_participation']) if date]
+    last_modified = max(dates)
+    fingerprint = '|'.join(str(value) for value in (
+        user_bucket(request.user),
+        event.updated_at,
+        stats['last_participation'],
+        stats['participation_count'],
+        event.is_past(),
+    ))
+    etag = quote_etag(hashlib.md5(fingerprint.encode('utf-8')).hexdigest())
+    
+    # Pas de 304 tant que des messages flash attendent d'être affichés
+    if not len(messages.get_messages(request)):
+        not_modified = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()),
+        )
+        if not_modified is not None:
+            return set_validators(not_modified, etag, last_modified)
+    
+    available_spots = event.max_participants - event.accepted_count
     participation_status = None
+    waitlist_position = None
     if request.user.is_authenticated:
         participation = event.participations.filter(participant=request.user).first()
         participation_status = participation.status if participation else None
+        if participation:
+            waitlist_position = registration.waitlist_rank(participation)
     
+    is_organizer = request.user == event.organizer if request.user.is_authenticated else False
     context = {
         'event': event,
         'available_spots': available_spots,
-        'is_organizer': request.user == event.organizer if request.user.is_authenticated else False,
+        'is_organizer': is_organizer,
         'is_participating': participation_status == 'accepted',
         'participation_status': participation_status,
+        'waitlist_position': waitlist_position,
+        'participate_url': reverse('event_participate', args=[event.id]),
     }
+    if is_organizer and event.series_id:
+        context['cancel_occurrence_url'] = reverse(
+            'event_occurrence_cancel', args=[event.series_id, event.occurrence_timestamp],
+        )
+    
+    response = render(request, 'core/event_detail.html', context)
+    return set_validators(response, etag, last_modified)
+
+
+def get_occurrence(event_id, timestamp):
+    """Série publiée et début de l'occurrence demandée (404 si la règle ne la prévoit pas)"""
+    series = get_object_or_404(
+        Event.objects.select_related('organizer'), id=event_id, status='published', recurrence__isnull=False,
+    )
+    start = recurrence.find_occurrence(series, timestamp)
+    if start is None:
+        raise Http404("Cette occurrence n'existe pas.")
+    return series, start
+
+
+def event_occurrence(request, event_id, timestamp):
+    """Occurrence d'une série : page de l'occurrence enregistrée, sinon de l'occurrence calculée"""
+    series, start = get_occurrence(event_id, timestamp)
+    materialized = Event.objects.filter(series=series, occurrence_start=start).first()
+    if materialized is not None:
+        if materialized.status != 'published':
+            raise Http404("Cette occurrence a été annulée.")
+        return redirect('event_detail', event_id=materialized.id)
     
+    # Rien d'enregistré pour cette occurrence : ni inscrits ni liste d'attente
+    event = recurrence.occurrence(series, start)
+    is_organizer = request.user.is_authenticated and request.user.pk == series.organizer_id
+    context = {
+        'event': event,
+        'available_spots': event.max_participants,
+        'is_organizer': is_organizer,
+        'is_participating': False,
+        'participation_status': None,
+        'waitlist_position': None,
+        'participate_url': reverse('event_occurrence_participate', args=[series.id, timestamp]),
+    }
+    if is_organizer:
+        context['cancel_occurrence_url'] = reverse('event_occurrence_cancel', args=[series.id, timestamp])
     return render(request, 'core/event_detail.html', context)
 
 
@@ -162,8 +665,23 @@ def event_create(request):
                 messages.error(request, "La date de fin doit être après la date de début.")
                 return render(request, 'core/event_create.html')
             
-            # Créer l'événement
-            event = Event.objects.create(
+            # Récurrence facultative : une seule ligne pour toute la série
+            recurrence_rule = request.POST.get('recurrence') or None
+            recurrence_interval = int(request.POST.get('recurrence_interval') or 1)
+            recurrence_until = None
+            if recurrence_rule not in (None, *dict(Event.RECURRENCE_CHOICES)) or recurrence_interval < 1:
+                messages.error(request, "Règle de récurrence invalide.")
+                return render(request, 'core/event_create.html')
+            if recurrence_rule and request.POST.get('recurrence_until'):
+                try:
+                    until = datetime.strptime(request.POST['recurrence_until'], '%Y-%m-%d')
+                except ValueError:
+                    messages.error(request, "Format de date invalide.")
+                    return render(request, 'core/event_create.html')
+                # Jour inclus : jusqu'à la fin de la journée
+                recurrence_until = timezone.make_aware(until + timedelta(days=1)) - timedelta(microseconds=1)
+            
+            event = Event(
                 title=title,
                 description=description,
                 location=location,
@@ -171,9 +689,22 @@ def event_create(request):
                 end_datetime=end_datetime,
                 max_participants=max_participants,
                 organizer=request.user,
-                status=status
+                status=status,
+                recurrence=recurrence_rule,
+                recurrence_interval=recurrence_interval,
+                recurrence_until=recurrence_until,
             )
             
+            # Lieu déjà réservé sur ce créneau (sur chacune de ses occurrences pour une série)
+            if status in conflicts.ROOM_STATUSES:
+                taken = conflicts.slots_room_conflicts(location, conflicts.event_slots(event))
+                if taken:
+                    messages.error(request, f"Le lieu « {location} » est déjà réservé sur ce créneau : {conflicts.describe(taken)}.")
+                    return render(request, 'core/event_create.html')
+            
+            # Créer l'événement
+            event.save()
+            
             messages.success(request, f"L'événement '{event.title}' a été créé avec succès!")
             return redirect('calendar')
             
@@ -185,58 +716,121 @@ def event_create(request):
     return render(request, 'core/event_create.html')
 
 
+@login_required
+def event_import(request):
+    """Import en masse d'événements depuis un fichier CSV ou iCalendar (voir core/importing.py)"""
+    context = {'columns': importing.COLUMNS}
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if upload is None:
+            messages.error(request, "Veuillez choisir un fichier CSV ou iCalendar.")
+            return render(request, 'core/event_import.html', context)
+        
+        result = importing.import_events(
+            importing.iter_rows(upload, importing.guess_format(upload.name)),
+            request.user,
+            batch_size=settings.EVENTS_IMPORT_BATCH_SIZE,
+            dry_run=bool(request.POST.get('dry_run')),
+        )
+        if result.created and not request.POST.get('dry_run'):
+            messages.success(request, f"{result.created} événements importés.")
+        elif result.created:
+            messages.info(request, f"{result.created} lignes valides (aucun événement enregistré).")
+        if result.errors:
+            messages.error(request, f"{len(result.errors)} lignes en erreur n'ont pas été importées.")
+        context['errors'] = result.errors[:settings.EVENTS_IMPORT_MAX_REPORTED_ERRORS]
+        context['hidden_errors'] = max(0, len(result.errors) - settings.EVENTS_IMPORT_MAX_REPORTED_ERRORS)
+    
+    return render(request, 'core/event_import.html', context)
+
+
+def add_participation_message(request, event, outcome):
+    """Message du résultat d'une inscription, avec les événements en conflit s'il y en a"""
+    level, text = PARTICIPATION_MESSAGES[outcome]
+    if outcome == registration.CONFLICT:
+        # Relu seulement en cas de refus : l'inscription ne fait qu'un test d'existence
+        conflicting = conflicts.participant_conflicts(
+            request.user, event.start_datetime, event.end_datetime, exclude=event.pk
+        )
+        text = f"{text} {conflicts.describe(conflicting)}."
+    messages.add_message(request, level, text)
+
+
 @login_required
 def event_participate(request, event_id):
     """Permet à un utilisateur de demander/obtenir une participation à un événement"""
-    event = get_object_or_404(Event, id=event_id, status='published')
+    event = get_object_or_404(Event, id=event_id, status='published', recurrence__isnull=True)
 
-    # Refuser si organisateur
-    if event.organizer == request.user:
-        messages.error(request, "Vous êtes l'organisateur de cet événement.")
-        return redirect('event_detail', event_id=event.id)
+    # La place est réservée atomiquement : pas de surréservation en cas d'afflux
+    outcome = registration.register_participant(event, request.user)
+    add_participation_message(request, event, outcome)
 
-    # Refuser si complet ou passé
-    if not event.is_available():
-        messages.error(request, "L'événement n'accepte plus de nouvelles participations.")
-        return redirect('event_detail', event_id=event.id)
+    return redirect('event_detail', event_id=event.id)
 
-    participation, created = Participation.objects.get_or_create(
-        event=event,
-        participant=request.user,
-        defaults={'status': 'accepted'}
-    )
 
-    if not created:
-        if participation.status == 'accepted':
-            messages.info(request, "Vous participez déjà à cet événement.")
-        elif participation.status == 'pending':
-            messages.info(request, "Votre demande de participation est déjà en attente.")
-        elif participation.status == 'rejected':
-            messages.warning(request, "Votre participation a été refusée par l'organisateur.")
-        elif participation.status == 'cancelled':
-            # Reactiver si de la place
-            if event.is_available():
-                participation.status = 'accepted'
-                participation.save(update_fields=['status'])
-                messages.success(request, "Votre participation a été réactivée.")
-            else:
-                messages.error(request, "Plus de places disponibles.")
-        else:
-            messages.info(request, "Statut de participation inchangé.")
-    else:
-        messages.success(request, "Votre participation a été enregistrée.")
+@login_required
+def event_cancel_participation(request, event_id):
+    """Permet à un participant d'annuler sa participation ou de quitter la liste d'attente"""
+    event = get_object_or_404(Event, id=event_id, status='published')
+
+    if request.method == 'POST':
+        outcome = registration.cancel_participation(event, request.user)
+        level, text = PARTICIPATION_MESSAGES[outcome]
+        messages.add_message(request, level, text)
 
     return redirect('event_detail', event_id=event.id)
 
 
+@login_required
+def event_occurrence_participate(request, event_id, timestamp):
+    """Inscription à une occurrence : l'occurrence est enregistrée à la première inscription"""
+    if request.method != 'POST':
+        return redirect('event_occurrence', event_id=event_id, timestamp=timestamp)
+    series, start = get_occurrence(event_id, timestamp)
+    event = recurrence.materialize(series, start)
+    if event.status != 'published':
+        raise Http404("Cette occurrence a été annulée.")
+    
+    outcome = registration.register_participant(event, request.user)
+    add_participation_message(request, event, outcome)
+    
+    return redirect('event_detail', event_id=event.id)
+
+
+@login_required
+def event_occurrence_cancel(request, event_id, timestamp):
+    """Annulation d'une seule occurrence d'une série par son organisateur"""
+    series, start = get_occurrence(event_id, timestamp)
+    if series.organizer_id != request.user.pk:
+        raise Http404("Vous n'êtes pas l'organisateur de cette série.")
+    if request.method != 'POST':
+        return redirect('event_occurrence', event_id=event_id, timestamp=timestamp)
+    
+    event = recurrence.materialize(series, start, status='cancelled')
+    if event.status != 'cancelled':
+        event.status = 'cancelled'
+        event.save()
+    messages.success(request, f"L'occurrence du {timezone.localtime(start):%d/%m/%Y à %H:%M} a été annulée.")
+    return redirect('calendar')
+
+
 def event_qrcode(request, event_id):
-    """Génère un QR code pour l'événement"""
+    """Génère un QR code pour l'événement (PNG par défaut, SVG avec ?format=svg)"""
     if not QRCODE_AVAILABLE:
         messages.error(request, "La génération de QR code n'est pas disponible. Veuillez installer le package 'qrcode'.")
         return redirect('event_detail', event_id=event_id)
     
     event = get_object_or_404(Event, id=event_id, status='published')
     
+    # Format et taille des modules demandés
+    fmt = request.GET.get('format', 'png')
+    if fmt not in qrcodes.CONTENT_TYPES:
+        fmt = 'png'
+    try:
+        box_size = min(max(int(request.GET.get('size', qrcodes.DEFAULT_BOX_SIZE)), 1), qrcodes.MAX_BOX_SIZE)
+    except ValueError:
+        box_size = qrcodes.DEFAULT_BOX_SIZE
+    
     # Construire l'URL complète de l'événement
     if request.is_secure():
         protocol = 'https'
@@ -246,20 +840,205 @@ def event_qrcode(request, event_id):
     host = request.get_host()
     event_url = f"{protocol}://{host}/core/events/{event.id}/"
     
-    # Créer le QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+    # Le contenu ne dépend que de la clé : le navigateur peut le garder longtemps
+    etag = quote_etag(qrcodes.cache_key(event_url, fmt, box_size))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(
+            qrcodes.get_qrcode(event_url, fmt, box_size),
+            content_type=qrcodes.CONTENT_TYPES[fmt],
+        )
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.QRCODE_CACHE_MAX_AGE)
+    return response
+
+
+
+# Types des archives de QR codes (?format=)
+QRCODE_ARCHIVE_TYPES = {
+    'zip': 'application/zip',
+    'pdf': 'application/pdf',
+}
+
+
+def qrcodes_archive_response(request, codes, labels, filename):
+    """Archive ZIP ou PDF (une page par code, avec son libellé) envoyée au fil de la génération"""
+    fmt = request.GET.get('format', 'zip')
+    if fmt not in QRCODE_ARCHIVE_TYPES:
+        return HttpResponseBadRequest("Format d'archive inconnu.")
+    # Pool de processus persistant pour les grandes séries, génération sur place sinon
+    entries = qrcodes.iter_rendered(
+        codes,
+        workers=settings.QRCODE_EXPORT_WORKERS,
+        pool_threshold=settings.QRCODE_EXPORT_POOL_THRESHOLD,
     )
-    qr.add_data(event_url)
-    qr.make(fit=True)
+    chunks = qrcodes.stream_pdf(entries, labels) if fmt == 'pdf' else qrcodes.stream_zip(entries)
+    response = StreamingHttpResponse(chunks, content_type=QRCODE_ARCHIVE_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+@login_required
+def event_qrcodes_archive(request):
+    """Archive ZIP ou PDF des QR codes des événements organisés par l'utilisateur, envoyée en flux"""
+    if not QRCODE_AVAILABLE:
+        messages.error(request, "La génération de QR code n'est pas disponible. Veuillez installer le package 'qrcode'.")
+        return redirect('calendar')
+    
+    events = Event.objects.filter(organizer=request.user, status='published').order_by('start_datetime')
+    event_ids = [int(value) for value in request.GET.getlist('event') if value.isdigit()]
+    if event_ids:
+        events = events.filter(id__in=event_ids)
+    else:
+        events = events.filter(end_datetime__gte=timezone.now())
+    
+    base_url = f"{request.scheme}://{request.get_host()}"
+    codes, labels = [], {}
+    for event_id, title in events.values_list('id', 'title'):
+        name = f"qrcode-event-{event_id}.png"
+        codes.append((name, base_url + reverse('event_detail', args=[event_id])))
+        labels[name] = title
     
-    # Créer l'image
-    img = qr.make_image(fill_color="black", back_color="white")
+    return qrcodes_archive_response(request, codes, labels, "qrcodes-evenements")
+
+
+@login_required
+def event_badge(request, event_id):
+    """QR code de présence personnel du participant accepté"""
+    if not QRCODE_AVAILABLE:
+        messages.error(request, "La génération de QR code n'est pas disponible. Veuillez installer le package 'qrcode'.")
+        return redirect('event_detail', event_id=event_id)
+    
+    participation = get_object_or_404(
+        Participation.objects.select_related('event'),
+        event_id=event_id,
+        event__status='published',
+        participant=request.user,
+        status='accepted',
+    )
+    base_url = f"{request.scheme}://{request.get_host()}"
+    data = checkin.checkin_url(base_url, checkin.participation_token(participation))
+    
+    etag = quote_etag(qrcodes.cache_key(data))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(qrcodes.get_qrcode(data), content_type=qrcodes.CONTENT_TYPES['png'])
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=settings.QRCODE_CACHE_MAX_AGE)
+    return response
+
+
+@login_required
+def event_badges_archive(request, event_id):
+    """Archive ZIP ou PDF des QR codes de présence de tous les participants acceptés"""
+    if not QRCODE_AVAILABLE:
+        messages.error(request, "La génération de QR code n'est pas disponible. Veuillez installer le package 'qrcode'.")
+        return redirect('event_detail', event_id=event_id)
     
-    # Convertir en réponse HTTP
-    response = HttpResponse(content_type="image/png")
-    img.save(response, "PNG")
-    return response
\ No newline at end of file
+    event = get_object_or_404(Event, id=event_id, organizer=request.user)
+    base_url = f"{request.scheme}://{request.get_host()}"
+    participations = event.participations.filter(status='accepted').order_by('id').values_list(
+        'id', 'participant__username'
+    )
+    codes, labels = [], {}
+    for participation_id, username in participations:
+        name = f"badge-{event.id}-{participation_id}-{username}.png"
+        token = checkin.make_token(participation_id, event.id, event.organizer_id)
+        codes.append((name, checkin.checkin_url(base_url, token)))
+        labels[name] = f"{event.title} - {username}"
+    
+    return qrcodes_archive_response(request, codes, labels, f"badges-evenement-{event.id}")
+
+
+def export_response(participations, fmt, filename, title):
+    """Réponse diffusée de l'export des participations (voir core/exports.py)"""
+    chunks = exports.render(participations, fmt, settings.EXPORT_CHUNK_SIZE, title)
+    response = StreamingHttpResponse(chunks, content_type=exports.CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+@login_required
+def event_participations_export(request, event_id):
+    """Export des participations d'un événement (?format=csv ou xlsx), réservé à l'organisateur"""
+    event = get_object_or_404(Event, id=event_id, organizer=request.user)
+    fmt = request.GET.get('format', exports.CSV)
+    if fmt not in exports.CONTENT_TYPES:
+        return HttpResponseBadRequest("Format d'export inconnu.")
+    
+    participations = Participation.objects.filter(event=event).order_by('id')
+    return export_response(participations, fmt, f'participations-evenement-{event.id}', event.title)
+
+
+@login_required
+def participations_export(request):
+    """Export des participations aux événements de l'organisateur débutant entre ``start`` et ``end`` (inclus)"""
+    fmt = request.GET.get('format', exports.CSV)
+    if fmt not in exports.CONTENT_TYPES:
+        return HttpResponseBadRequest("Format d'export inconnu.")
+    try:
+        start = timezone.make_aware(datetime.strptime(request.GET['start'], '%Y-%m-%d'))
+        end = timezone.make_aware(datetime.strptime(request.GET['end'], '%Y-%m-%d') + timedelta(days=1))
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest("Paramètres start et end (AAAA-MM-JJ) obligatoires.")
+    if end <= start:
+        return HttpResponseBadRequest("La date de fin doit être après la date de début.")
+    
+    # Événements de l'organisateur par date (index organisateur, début), puis leurs participations
+    participations = Participation.objects.filter(
+        event__organizer=request.user,
+        event__start_datetime__gte=start,
+        event__start_datetime__lt=end,
+    ).order_by('event__start_datetime', 'event_id', 'id')
+    filename = f"participations-{request.GET['start']}-{request.GET['end']}"
+    return export_response(participations, fmt, filename, "Participations")
+
+
+@login_required
+def organizer_dashboard(request):
+    """Tableau de bord de l'organisateur : présences et absences par événement, semaine et participant"""
+    dashboard = analytics.organizer_dashboard(
+        request.user,
+        weeks=settings.ANALYTICS_WEEKS,
+        top=settings.ANALYTICS_TOP_PARTICIPANTS,
+    )
+    per_event = dashboard['per_event']
+    context = {
+        **dashboard,
+        # Derniers événements terminés et prochains événements
+        'recent_events': [event for event in per_event if event['past']][-settings.ANALYTICS_RECENT_EVENTS:][::-1],
+        'upcoming_events': [event for event in per_event if not event['past']][:settings.ANALYTICS_RECENT_EVENTS],
+    }
+    return render(request, 'core/organizer_dashboard.html', context)
+
+
+# Code HTTP renvoyé à l'application de scan pour chaque résultat
+CHECKIN_STATUS_CODES = {
+    checkin.CHECKED_IN: 200,
+    checkin.ALREADY_CHECKED_IN: 200,
+    checkin.INVALID_TOKEN: 400,
+    checkin.FORBIDDEN: 403,
+    checkin.NOT_REGISTERED: 404,
+    checkin.OUTSIDE_WINDOW: 409,
+}
+
+
+@login_required
+def event_checkin(request, token):
+    """Scan d'un QR code de présence par l'organisateur (idempotent)"""
+    result, participation_id = checkin.record_checkin(token, request.user)
+    metrics.inc('checkins_total', result=result)
+    return JsonResponse(
+        {'result': result, 'participation': participation_id},
+        status=CHECKIN_STATUS_CODES[result],
+    )
+
+
+def metrics_view(request):
+    """Métriques agrégées de tous les workers au format texte Prometheus"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    response = HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    patch_cache_control(response, no_store=True)
+    return response
@@ -0,0 +1,27 @@
+"""Archives ZIP produites au fil de l'envoi.
+
+``zipfile`` écrit dans un ``StreamBuffer`` non positionnable : chaque membre
+est suivi d'un descripteur de données au lieu d'un en-tête réécrit, ce qui
+permet d'envoyer les octets dès qu'ils sont produits (``pop``) sans fichier
+temporaire ni archive complète en mémoire.
+"""
+import io
+
+
+class StreamBuffer(io.RawIOBase):
+    """Flux non positionnable : zipfile y écrit avec des descripteurs de données"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
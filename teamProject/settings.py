@@ -28,6 +28,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.instrumentation.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -40,7 +42,8 @@ ROOT_URLCONF = 'teamProject.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Moteur Django standard, rendu chronométré par l'instrumentation
+        'BACKEND': 'core.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -89,6 +92,120 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# ===== CONFIGURATION DU CACHE =====
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Flux JSON du calendrier, invalidé par numéro de version (voir core/cache.py)
+    'events_feed': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'events-feed',
+        'TIMEOUT': int(os.environ.get('EVENTS_FEED_CACHE_TIMEOUT', 60)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('EVENTS_FEED_CACHE_MAX_ENTRIES', 1000)),
+            'CULL_FREQUENCY': 4,
+        },
+    },
+    # Colonnes des participations du tableau de bord organisateur (voir core/analytics.py)
+    'analytics': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'analytics',
+        'TIMEOUT': int(os.environ.get('ANALYTICS_CACHE_TIMEOUT', 60 * 60 * 24)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('ANALYTICS_CACHE_MAX_ENTRIES', 500)),
+        },
+    },
+    # Blocs VEVENT des flux iCalendar, indexés par date de modification (voir core/ics.py)
+    'ics_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ics-fragments',
+        'TIMEOUT': int(os.environ.get('ICS_FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('ICS_FRAGMENT_CACHE_MAX_ENTRIES', 20000)),
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+# ===== CONFIGURATION DE LA LISTE DES ÉVÉNEMENTS =====
+# Fenêtre maximale couverte par le flux du calendrier et la liste paginée (jours)
+EVENTS_MAX_WINDOW_DAYS = int(os.environ.get('EVENTS_MAX_WINDOW_DAYS', 92))
+# Taille de page par défaut et maximale de la liste paginée (/core/events/list/)
+EVENTS_API_PAGE_SIZE = int(os.environ.get('EVENTS_API_PAGE_SIZE', 50))
+EVENTS_API_MAX_PAGE_SIZE = int(os.environ.get('EVENTS_API_MAX_PAGE_SIZE', 200))
+# Événements lus par requête SQL dans le flux diffusé (?stream=true)
+EVENTS_STREAM_CHUNK_SIZE = int(os.environ.get('EVENTS_STREAM_CHUNK_SIZE', 2000))
+# Fenêtre maximale du flux diffusé (vue annuelle, exports) : sa mémoire ne dépend pas de la fenêtre (jours)
+EVENTS_STREAM_MAX_WINDOW_DAYS = int(os.environ.get('EVENTS_STREAM_MAX_WINDOW_DAYS', 400))
+# Période couverte par les flux d'abonnement iCalendar (jours passés / à venir)
+ICS_PAST_DAYS = int(os.environ.get('ICS_PAST_DAYS', 30))
+ICS_FUTURE_DAYS = int(os.environ.get('ICS_FUTURE_DAYS', 365))
+# Blocs VEVENT lus dans le cache par lecture groupée
+ICS_FRAGMENT_BATCH_SIZE = int(os.environ.get('ICS_FRAGMENT_BATCH_SIZE', 500))
+# Import en masse (/core/events/import/, commande import_events) : lignes par transaction
+EVENTS_IMPORT_BATCH_SIZE = int(os.environ.get('EVENTS_IMPORT_BATCH_SIZE', 1000))
+# Lignes en erreur détaillées sur la page d'import
+EVENTS_IMPORT_MAX_REPORTED_ERRORS = int(os.environ.get('EVENTS_IMPORT_MAX_REPORTED_ERRORS', 100))
+# Série sans date de fin : période sur laquelle ses occurrences sont contrôlées (lieu déjà réservé, jours)
+EVENTS_SERIES_CHECK_DAYS = int(os.environ.get('EVENTS_SERIES_CHECK_DAYS', 365))
+# Participations lues par requête SQL dans les exports CSV / XLSX
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# ===== CONFIGURATION DU TABLEAU DE BORD ORGANISATEUR =====
+# Semaines affichées dans l'évolution des présences
+ANALYTICS_WEEKS = int(os.environ.get('ANALYTICS_WEEKS', 12))
+# Participants listés par nombre d'absences, événements récents / à venir affichés
+ANALYTICS_TOP_PARTICIPANTS = int(os.environ.get('ANALYTICS_TOP_PARTICIPANTS', 10))
+ANALYTICS_RECENT_EVENTS = int(os.environ.get('ANALYTICS_RECENT_EVENTS', 20))
+# Au-delà de ce nombre d'événements modifiés, les colonnes en cache sont relues entièrement
+ANALYTICS_MAX_PARTIAL_REFRESH = int(os.environ.get('ANALYTICS_MAX_PARTIAL_REFRESH', 500))
+
+# ===== CONFIGURATION DES QR CODES =====
+# Nombre de QR codes gardés en mémoire par worker (cache LRU)
+QRCODE_CACHE_SIZE = int(os.environ.get('QRCODE_CACHE_SIZE', 256))
+# Répertoire de stockage partagé entre workers (désactivé si vide)
+QRCODE_CACHE_DIR = os.environ.get('QRCODE_CACHE_DIR') or None
+# Durée de mise en cache côté navigateur (secondes)
+QRCODE_CACHE_MAX_AGE = 60 * 60 * 24 * 30
+# Processus utilisés pour générer les archives de QR codes (0 : dans le worker web)
+QRCODE_EXPORT_WORKERS = int(os.environ.get('QRCODE_EXPORT_WORKERS', 2))
+# En dessous de ce nombre de codes, une archive est générée dans le worker web (avec le cache)
+QRCODE_EXPORT_POOL_THRESHOLD = int(os.environ.get('QRCODE_EXPORT_POOL_THRESHOLD', 200))
+# Ouverture du contrôle d'accès avant le début de l'événement (minutes)
+CHECKIN_OPENS_MINUTES_BEFORE = int(os.environ.get('CHECKIN_OPENS_MINUTES_BEFORE', 60))
+
+# ===== CONFIGURATION DE L'INSTRUMENTATION =====
+# Part des requêtes mesurées (SQL, templates, QR codes) : 0 désactive, 1 mesure tout
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', 0.01))
+# Nombre de requêtes SQL répétées à partir duquel la ligne de log passe en WARNING
+INSTRUMENTATION_DUPLICATE_THRESHOLD = int(os.environ.get('INSTRUMENTATION_DUPLICATE_THRESHOLD', 5))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.instrumentation': {
+            'handlers': ['console'],
+            'level': os.environ.get('INSTRUMENTATION_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# ===== CONFIGURATION DES MÉTRIQUES (/metrics) =====
+# Répertoire partagé par les workers gunicorn (vide : métriques du seul processus qui répond)
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+# Intervalle entre deux écritures de l'instantané d'un worker, par un thread dédié (secondes)
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+# Instantané non réécrit depuis ce délai : processus arrêté, fichier supprimé (secondes)
+METRICS_SNAPSHOT_TTL = float(os.environ.get('METRICS_SNAPSHOT_TTL', 60))
+# Jeton exigé dans l'en-tête "Authorization: Bearer ..." (vide : accès libre)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
 # ===== CONFIGURATION POUR RAILWAY =====
 import dj_database_url
 
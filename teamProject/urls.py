@@ -21,6 +21,8 @@ from users.views import SignUp
 from users.views import Logout_user
 from users.views import Login_user
 from users.views import profile_view
+from users.views import regenerate_feeds
+from core.views import metrics_view
 
 
 urlpatterns = [
@@ -31,4 +33,6 @@ urlpatterns = [
     path('login', Login_user, name='login'),
     path('core/', include('core.urls')),
     path('profil', profile_view, name='profil'),
+    path('profil/abonnements/regenerer', regenerate_feeds, name='regenerate_feeds'),
+    path('metrics', metrics_view, name='metrics'),
 ]
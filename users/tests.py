@@ -1,3 +1,60 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Event, Participation
+
+User = get_user_model()
+
+
+class ProfileViewTests(TestCase):
+    """Tests de la page de profil"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='secret')
+        cls.organizer = User.objects.create_user(username='bob', password='secret')
+
+    def add_events(self, count):
+        now = timezone.now()
+        for i in range(count):
+            start = now + timedelta(days=i + 1)
+            organized = Event.objects.create(
+                title=f'Mon événement {i}', start_datetime=start,
+                end_datetime=start + timedelta(hours=1), organizer=self.user,
+            )
+            other = Event.objects.create(
+                title=f'Événement {i}', start_datetime=start,
+                end_datetime=start + timedelta(hours=1), organizer=self.organizer,
+            )
+            Participation.objects.create(event=other, participant=self.user, status='accepted')
+            Participation.objects.create(event=organized, participant=self.organizer, status='accepted')
+        pending_event = Event.objects.create(
+            title='Atelier', start_datetime=now + timedelta(days=1),
+            end_datetime=now + timedelta(days=1, hours=1), organizer=self.organizer,
+        )
+        Participation.objects.create(event=pending_event, participant=self.user, status='pending')
+
+    def test_stats_are_supplied(self):
+        self.add_events(3)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('profil'))
+        stats = response.context['stats']
+        self.assertEqual(
+            (stats.events_organized, stats.participations, stats.accepted_participations, stats.pending_participations),
+            (3, 4, 3, 1),
+        )
 
-# Create your tests here.
+    def test_query_count_is_fixed(self):
+        self.client.force_login(self.user)
+        self.add_events(1)
+        with self.assertNumQueries(6):
+            self.client.get(reverse('profil'))
+        self.add_events(8)
+        # Session, utilisateur, statistiques (clé primaire), les deux listes à venir,
+        # puis la version des adresses d'abonnement (clé primaire)
+        with self.assertNumQueries(6):
+            self.client.get(reverse('profil'))
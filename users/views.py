@@ -1,10 +1,14 @@
 from django.contrib.auth import authenticate, get_user_model, login, logout
 from django.contrib.auth.models import auth
 from django.shortcuts import redirect, render
+from core import ics
 from core.models import Event, Participation
+from core.stats import get_user_stats
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth.decorators import login_required
+from django.contrib import messages
+from django.views.decorators.http import require_POST
 
 User = get_user_model()
 
@@ -39,36 +43,51 @@ def Login_user(request):
 def profile_view(request):
     """Page de profil principal"""
     user = request.user
+    now = timezone.now()
     
-
+    # Statistiques matérialisées : une lecture par clé primaire
+    stats = get_user_stats(user)
     
-    # Événements à venir organisés
+    # Événements à venir organisés (le nombre d'inscrits est porté par Event.accepted_count)
     upcoming_organized = Event.objects.filter(
         organizer=user,
-        start_datetime__gte=timezone.now()
+        start_datetime__gte=now
     ).order_by('start_datetime')[:5]
     
     # Participations à venir
     upcoming_participations = Participation.objects.filter(
         participant=user,
-        event__start_datetime__gte=timezone.now(),
+        event__start_datetime__gte=now,
         status='accepted'
-    ).select_related('event').order_by('event__start_datetime')[:5]
+    ).select_related('event__organizer').order_by('event__start_datetime')[:5]
     
     # Activité récente
     recent_activity = {
         'last_login': user.last_login,
-        'events_created': Event.objects.filter(organizer=user).count(),
-        'total_participations': Participation.objects.filter(participant=user).count(),
+        'events_created': stats.events_organized,
+        'total_participations': stats.participations,
     }
     
     context = {
         'user_profile': user,
+        'stats': stats,
         'upcoming_organized': upcoming_organized,
         'upcoming_participations': upcoming_participations,
         'recent_activity': recent_activity,
         'is_own_profile': True,
+        'ics_feeds': ics.feed_urls(request, user),
     }
     
     return render(request, 'accounts/profil.html', context)
 
+
+@login_required
+@require_POST
+def regenerate_feeds(request):
+    """Remplace les adresses d'abonnement iCalendar : les anciennes cessent de fonctionner"""
+    ics.regenerate_tokens(request.user)
+    messages.success(
+        request,
+        "Nouvelles adresses d'abonnement générées. Mettez-les à jour dans vos applications de calendrier.",
+    )
+    return redirect('profil')